@@ -0,0 +1,111 @@
+"""本地 DoH/DoT 测试服务器：对所有查询返回固定应答，用于测试加密传输的探测
+
+    openssl req -x509 -newkey rsa:2048 -nodes -days 30 -subj /CN=localhost \\
+        -addext subjectAltName=DNS:localhost,IP:127.0.0.1 \\
+        -keyout stub.key -out stub.crt
+    python benchmarks/encrypted_stub.py --cert stub.crt --key stub.key --delay 5
+
+配置文件中添加（tls_cafile 信任自签名证书）：
+
+    [Main]
+    tls_cafile = stub.crt
+
+    [Ipv4_Stub]
+    stub = 127.0.0.1,,doh=https://localhost:8443/dns-query,dot=localhost:8853
+
+然后运行 python main.py --headless --category Ipv4_Stub --encrypted
+"""
+
+import argparse
+import asyncio
+import ssl
+
+import dns.message
+import dns.rdatatype
+import dns.rrset
+
+
+def answer(wire):
+    """对查询报文生成应答：A 查询返回 127.0.0.1，其他类型返回空应答"""
+    query = dns.message.from_wire(wire)
+    response = dns.message.make_response(query)
+    question = query.question[0]
+    if question.rdtype == dns.rdatatype.A:
+        response.answer.append(
+            dns.rrset.from_text(question.name, 60, "IN", "A", "127.0.0.1")
+        )
+    return response.to_wire()
+
+
+async def serve_dot(reader, writer, delay):
+    try:
+        while True:
+            length = int.from_bytes(await reader.readexactly(2), "big")
+            wire = await reader.readexactly(length)
+            await asyncio.sleep(delay)
+            response = answer(wire)
+            writer.write(len(response).to_bytes(2, "big") + response)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_doh(reader, writer, delay):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            wire = await reader.readexactly(int(headers.get("content-length", 0)))
+            await asyncio.sleep(delay)
+            response = answer(wire)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: application/dns-message\r\n"
+                + f"Content-Length: {len(response)}\r\n\r\n".encode()
+                + response
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="本地 DoH/DoT 测试服务器")
+    parser.add_argument("--cert", required=True, help="证书文件")
+    parser.add_argument("--key", required=True, help="私钥文件")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--doh-port", type=int, default=8443)
+    parser.add_argument("--dot-port", type=int, default=8853)
+    parser.add_argument("--delay", type=float, default=0, help="应答延迟（毫秒）")
+    args = parser.parse_args()
+
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(args.cert, args.key)
+    delay = args.delay / 1000
+    dot = await asyncio.start_server(
+        lambda r, w: serve_dot(r, w, delay), args.host, args.dot_port, ssl=context
+    )
+    doh = await asyncio.start_server(
+        lambda r, w: serve_doh(r, w, delay), args.host, args.doh_port, ssl=context
+    )
+    print(
+        f"DoT: {args.host}:{args.dot_port}  DoH: https://{args.host}:{args.doh_port}/"
+    )
+    async with dot, doh:
+        await asyncio.gather(dot.serve_forever(), doh.serve_forever())
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
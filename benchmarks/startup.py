@@ -0,0 +1,101 @@
+"""启动时间基准测试：导入 main.py 以及显示第一帧的耗时
+
+    python benchmarks/startup.py                # 导入 + 首帧（需要图形界面）
+    python benchmarks/startup.py --import-only  # 只测导入，可在无显示器的机器上运行
+    python benchmarks/startup.py --json --max-import-ms 400
+
+每次测量都在新的解释器进程中进行，避免模块缓存影响结果；第一次运行
+（生成 .pyc）不计入统计。启动时被提前导入的重模块会列出来，并使退出码为1。
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 首帧不需要、应在首次使用时才导入的模块
+HEAVY_MODULES = ("pythoncom", "win32com", "dns", "asyncio", "webbrowser")
+
+# 在子进程中执行的测量代码
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+first_paint = None
+if not {import_only}:
+    root = main.tb.Window(themename="darkly")
+    app = main.DNSTesterApp(root)
+    root.update()
+    first_paint = (time.perf_counter() - started) * 1000
+    root.destroy()
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "first_paint_ms": first_paint,
+    "eager_modules": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure_once(import_only):
+    """在新进程中测量一次，返回结果字典"""
+    code = _CHILD.format(import_only=import_only, heavy=HEAVY_MODULES)
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DNS测试工具启动时间基准测试")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="测量次数")
+    parser.add_argument("--import-only", action="store_true", help="只测量导入时间")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    parser.add_argument(
+        "--max-import-ms", type=float, help="导入时间中位数超过该值时退出码为1"
+    )
+    args = parser.parse_args(argv)
+
+    measure_once(args.import_only)  # 预热：生成 .pyc
+    runs = [measure_once(args.import_only) for _ in range(args.runs)]
+    report = {
+        "runs": args.runs,
+        "import_ms": statistics.median(r["import_ms"] for r in runs),
+        "process_ms": statistics.median(r["process_ms"] for r in runs),
+        "first_paint_ms": None
+        if args.import_only
+        else statistics.median(r["first_paint_ms"] for r in runs),
+        "eager_modules": runs[-1]["eager_modules"],
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"导入 main.py:  {report['import_ms']:.1f} ms")
+        if report["first_paint_ms"] is not None:
+            print(f"导入 + 首帧:   {report['first_paint_ms']:.1f} ms")
+        print(f"进程总耗时:    {report['process_ms']:.1f} ms")
+        if report["eager_modules"]:
+            print(f"启动时提前导入的模块: {', '.join(report['eager_modules'])}")
+
+    if report["eager_modules"]:
+        return 1
+    if args.max_import_ms and report["import_ms"] > args.max_import_ms:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
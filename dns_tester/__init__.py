@@ -0,0 +1,99 @@
+"""DNS服务器测试核心库（不依赖GUI）
+
+    from dns_tester import ProbeSettings, load_category_servers, read_config, run_benchmark
+
+    config = read_config("dns_servers.ini")
+    servers, _ = load_category_servers(config, "Ipv4_Default")
+    results = run_benchmark(servers, ProbeSettings.from_config(config))
+
+子模块在首次访问对应名称时才导入，import dns_tester 本身不会加载 asyncio 和 dnspython。
+"""
+
+import importlib
+
+# 公开名称 -> 所在子模块
+_EXPORTS = {
+    "AdapterSnapshot": "adapters",
+    "ConfigStore": "config",
+    "ForwarderSettings": "config",
+    "ProbeSettings": "config",
+    "parse_address": "addresses",
+    "parse_addresses": "addresses",
+    "ensure_category": "config",
+    "get_categories": "config",
+    "is_ip": "config",
+    "load_category_servers": "config",
+    "read_config": "config",
+    "write_config": "config",
+    "DomainCorpus": "corpus",
+    "HistoryStore": "history",
+    "make_change_watcher": "netwatch",
+    "EncryptedProber": "encrypted",
+    "Forwarder": "forwarder",
+    "make_ssl_context": "encrypted",
+    "import_file": "importer",
+    "Server": "servers",
+    "ServerList": "servers",
+    "LatencySamples": "stats",
+    "FakeSystemBackend": "system_dns",
+    "make_system_backend": "system_dns",
+    "DeadCache": "probe",
+    "ProbeEngine": "probe",
+    "STATUS_FAILED": "probe",
+    "STATUS_SUCCESS": "probe",
+    "make_dead_cache": "benchmark",
+    "make_engine": "benchmark",
+    "rank_servers": "benchmark",
+    "record_results": "benchmark",
+    "run_benchmark": "benchmark",
+}
+
+# 与 _EXPORTS 的键一致（tests/test_package.py 检查）
+__all__ = [
+    "STATUS_FAILED",
+    "STATUS_SUCCESS",
+    "AdapterSnapshot",
+    "ConfigStore",
+    "DeadCache",
+    "DomainCorpus",
+    "EncryptedProber",
+    "FakeSystemBackend",
+    "Forwarder",
+    "ForwarderSettings",
+    "HistoryStore",
+    "LatencySamples",
+    "ProbeEngine",
+    "ProbeSettings",
+    "Server",
+    "ServerList",
+    "ensure_category",
+    "get_categories",
+    "import_file",
+    "is_ip",
+    "load_category_servers",
+    "make_change_watcher",
+    "make_dead_cache",
+    "make_engine",
+    "make_ssl_context",
+    "make_system_backend",
+    "parse_address",
+    "parse_addresses",
+    "rank_servers",
+    "read_config",
+    "record_results",
+    "run_benchmark",
+    "write_config",
+]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
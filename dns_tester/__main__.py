@@ -0,0 +1,7 @@
+"""python -m dns_tester：无界面命令行测试"""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
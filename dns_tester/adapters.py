@@ -0,0 +1,191 @@
+"""网络适配器信息快照：一次查询所有适配器，带短时缓存，在后台线程刷新
+
+适配器列表由系统DNS后端（dns_tester.system_dns.SystemDnsBackend）的
+list_adapters() 提供。
+
+适配器信息为字典：
+    name            友好名称（如"以太网 2"）
+    index           适配器序号
+    mac             MAC地址
+    ipv4_addresses / ipv6_addresses
+    ipv4_gateways / ipv6_gateways
+    dns_servers     当前DNS地址列表（按顺序）
+    dhcp_enabled    是否通过DHCP获取地址
+"""
+
+import threading
+import time
+
+from .addresses import split_by_version
+
+DEFAULT_ADAPTER_TTL = 5.0  # 快照有效期（秒）
+
+
+def wmi_adapters(wmi):
+    """在已连接的 root\\cimv2 命名空间上查询适配器信息"""
+    adapters = wmi.ExecQuery(
+        "SELECT DeviceID, Name, NetConnectionID FROM Win32_NetworkAdapter "
+        "WHERE NetEnabled = True"
+    )
+    adapter_info_map = {}
+    for adapter in adapters:
+        adapter_info_map[str(adapter.DeviceID)] = {
+            "name": adapter.Name,
+            "net_connection_id": adapter.NetConnectionID,  # 友好名称，如"以太网 2"
+        }
+    # 查询启用的网络适配器配置
+    configs = wmi.ExecQuery(
+        "SELECT Index, MACAddress, IPAddress, DefaultIPGateway, "
+        "DNSServerSearchOrder, DHCPEnabled FROM Win32_NetworkAdapterConfiguration "
+        "WHERE IPEnabled = True"
+    )
+    network_info = []
+    for config in configs:
+        adapter_info = adapter_info_map.get(str(config.Index), {})
+        # 优先使用NetConnectionID（友好名称），如果没有则使用Name
+        adapter_name = (
+            adapter_info.get("net_connection_id")
+            or adapter_info.get("name")
+            or "未识别适配器"
+        )
+        ipv4_addresses, ipv6_addresses = split_by_version(
+            list(config.IPAddress) if config.IPAddress else []
+        )
+        ipv4_gateways, ipv6_gateways = split_by_version(
+            list(config.DefaultIPGateway) if config.DefaultIPGateway else []
+        )
+        network_info.append(
+            {
+                "name": adapter_name,
+                "index": config.Index,
+                "mac": config.MACAddress,
+                "ipv4_addresses": ipv4_addresses,
+                "ipv6_addresses": ipv6_addresses,
+                "ipv4_gateways": ipv4_gateways,
+                "ipv6_gateways": ipv6_gateways,
+                "dns_servers": list(config.DNSServerSearchOrder)
+                if config.DNSServerSearchOrder
+                else [],
+                "dhcp_enabled": config.DHCPEnabled,
+            }
+        )
+    return network_info
+
+
+class AdapterSnapshot:
+    """缓存的适配器信息快照
+
+    get() 在快照过期（超过 ttl 秒）或被 invalidate() 后重新查询后端，
+    同时调用的线程共用一次查询。refresh() 在后台线程中取得快照后回调，
+    多次调用合并为一次查询。后端查询失败时返回空列表（不缓存）。
+    """
+
+    def __init__(self, backend, ttl=DEFAULT_ADAPTER_TTL, clock=time.monotonic):
+        self.backend = backend
+        self.ttl = ttl
+        self.clock = clock
+        self._adapters = None
+        self._taken_at = 0.0
+        self._generation = 0  # invalidate() 的次数，查询期间失效的结果不缓存
+        self._lock = threading.Lock()
+        self._query_lock = threading.Lock()
+        self._callbacks = []  # 等待后台刷新结果的回调
+        self._refreshing = False
+
+    def _cached(self):
+        with self._lock:
+            if self._adapters is not None and self.clock() - self._taken_at < self.ttl:
+                return self._adapters
+            return None
+
+    def get(self):
+        """返回适配器信息列表（调用方不应修改）"""
+        adapters = self._cached()
+        if adapters is not None:
+            return adapters
+        with self._query_lock:
+            # 等待其他线程的查询结束后，快照可能已经是新的
+            adapters = self._cached()
+            if adapters is not None:
+                return adapters
+            with self._lock:
+                generation = self._generation
+            try:
+                adapters = self.backend.list_adapters()
+            except Exception as e:
+                print(f"获取网络适配器信息失败: {e}")
+                return []
+            with self._lock:
+                if generation == self._generation:
+                    self._adapters = adapters
+                    self._taken_at = self.clock()
+            return adapters
+
+    def invalidate(self):
+        """丢弃快照（如修改DNS设置后），下次 get() 重新查询"""
+        with self._lock:
+            self._adapters = None
+            self._generation += 1
+
+    def refresh(self, callback, invalidate=False):
+        """在后台线程中取得快照后调用 callback(adapters)"""
+        if invalidate:
+            self.invalidate()
+        with self._lock:
+            # 记下登记时的失效次数，只交给此后开始的查询结果
+            self._callbacks.append((self._generation, callback))
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_worker, daemon=True).start()
+
+    def _refresh_worker(self):
+        while True:
+            with self._lock:
+                generation = self._generation
+            adapters = self.get()
+            with self._lock:
+                # 查询开始后才失效的回调留到下一轮重新查询
+                callbacks = [c for g, c in self._callbacks if g <= generation]
+                self._callbacks = [(g, c) for g, c in self._callbacks if g > generation]
+                if not callbacks and not self._callbacks:
+                    self._refreshing = False
+                    return
+            for callback in callbacks:
+                callback(adapters)
+
+
+def find_adapter(adapters, name):
+    """按名称查找适配器，找不到时返回 None"""
+    for adapter in adapters:
+        if adapter["name"] == name:
+            return adapter
+    return None
+
+
+def local_ipv4(adapters):
+    """第一个非回环、非APIPA的IPv4地址，没有时返回 None"""
+    for adapter in adapters:
+        for ip in adapter["ipv4_addresses"]:
+            if not ip.startswith(("127.", "169.254.")):
+                return ip
+    return None
+
+
+def default_gateway(adapters):
+    """第一个IPv4网关，没有时返回 None"""
+    for adapter in adapters:
+        if adapter["ipv4_gateways"]:
+            return adapter["ipv4_gateways"][0]
+    return None
+
+
+def current_dns(adapters, name=None):
+    """适配器（未指定时为第一个有DNS的适配器）的DNS地址列表"""
+    if name is not None:
+        adapter = find_adapter(adapters, name)
+        return list(adapter["dns_servers"]) if adapter else []
+    for adapter in adapters:
+        if adapter["dns_servers"]:
+            return list(adapter["dns_servers"])
+    return []
@@ -0,0 +1,139 @@
+"""批量解析、校验和分类IP地址"""
+
+import functools
+import ipaddress
+from collections import namedtuple
+
+# 地址范围
+SCOPE_PUBLIC = "public"
+SCOPE_PRIVATE = "private"
+SCOPE_LOOPBACK = "loopback"
+SCOPE_LINK_LOCAL = "link_local"
+SCOPE_MULTICAST = "multicast"
+SCOPE_UNSPECIFIED = "unspecified"
+SCOPE_RESERVED = "reserved"
+
+# 拒绝原因
+REJECT_INVALID = "invalid"  # 不是IP地址
+REJECT_IPV4 = "ipv4"  # IPv6类别中的IPv4地址
+REJECT_IPV6 = "ipv6"  # IPv4类别中的IPv6地址
+
+# 已知的公共任播DNS地址 -> 提供商
+KNOWN_ANYCAST = {
+    "8.8.8.8": "Google",
+    "8.8.4.4": "Google",
+    "2001:4860:4860::8888": "Google",
+    "2001:4860:4860::8844": "Google",
+    "1.1.1.1": "Cloudflare",
+    "1.0.0.1": "Cloudflare",
+    "1.1.1.2": "Cloudflare",
+    "1.0.0.2": "Cloudflare",
+    "1.1.1.3": "Cloudflare",
+    "1.0.0.3": "Cloudflare",
+    "2606:4700:4700::1111": "Cloudflare",
+    "2606:4700:4700::1001": "Cloudflare",
+    "9.9.9.9": "Quad9",
+    "149.112.112.112": "Quad9",
+    "2620:fe::fe": "Quad9",
+    "2620:fe::9": "Quad9",
+    "208.67.222.222": "OpenDNS",
+    "208.67.220.220": "OpenDNS",
+    "2620:119:35::35": "OpenDNS",
+    "2620:119:53::53": "OpenDNS",
+    "223.5.5.5": "Aliyun",
+    "223.6.6.6": "Aliyun",
+    "2400:3200::1": "Aliyun",
+    "2400:3200:baba::1": "Aliyun",
+    "119.29.29.29": "DNSPod",
+    "2402:4e00::": "DNSPod",
+    "114.114.114.114": "114DNS",
+    "114.114.115.115": "114DNS",
+    "94.140.14.14": "AdGuard",
+    "94.140.15.15": "AdGuard",
+}
+
+
+class Address:
+    """一个已校验的IP地址"""
+
+    __slots__ = ("address", "version", "scope", "anycast")
+
+    def __init__(self, address, version, scope, anycast=""):
+        self.address = address  # 规范化后的地址
+        self.version = version  # 4 或 6
+        self.scope = scope  # SCOPE_*
+        self.anycast = anycast  # 已知任播地址的提供商，否则为空
+
+    def __repr__(self):
+        return f"Address({self.address!r}, {self.version}, {self.scope!r})"
+
+
+# 被拒绝的地址：entry 为调用方给出的标识（如服务器名称），field 为字段，reason 为 REJECT_*
+Rejected = namedtuple("Rejected", "entry field address reason")
+
+
+def _scope(ip):
+    if ip.is_unspecified:
+        return SCOPE_UNSPECIFIED
+    if ip.is_loopback:
+        return SCOPE_LOOPBACK
+    if ip.is_link_local:
+        return SCOPE_LINK_LOCAL
+    if ip.is_multicast:
+        return SCOPE_MULTICAST
+    if ip.is_private:
+        return SCOPE_PRIVATE
+    if ip.is_reserved or not ip.is_global:
+        return SCOPE_RESERVED
+    return SCOPE_PUBLIC
+
+
+@functools.lru_cache(maxsize=65536)
+def parse_address(text):
+    """解析一个地址，无效时返回 None（结果会被缓存）"""
+    try:
+        ip = ipaddress.ip_address(text.strip())
+    except (ValueError, AttributeError):
+        return None
+    address = str(ip)
+    return Address(address, ip.version, _scope(ip), KNOWN_ANYCAST.get(address, ""))
+
+
+def check_address(text, version=None):
+    """解析并按版本检查一个地址，返回 (Address, None) 或 (None, 拒绝原因)"""
+    parsed = parse_address(text)
+    if parsed is None:
+        return None, REJECT_INVALID
+    if version is not None and parsed.version != version:
+        return None, REJECT_IPV4 if parsed.version == 4 else REJECT_IPV6
+    return parsed, None
+
+
+def parse_addresses(texts, version=None):
+    """一次解析一组地址
+
+    texts 为地址字符串，或 (标识, 字段, 地址) 三元组；version 为4或6时
+    拒绝另一版本的地址。返回 (Address列表, Rejected列表)，空字符串被忽略。
+    """
+    accepted = []
+    rejected = []
+    for item in texts:
+        entry, field, text = (None, None, item) if isinstance(item, str) else item
+        if not text:
+            continue
+        parsed, reason = check_address(text, version)
+        if parsed is None:
+            rejected.append(Rejected(entry, field, text, reason))
+        else:
+            accepted.append(parsed)
+    return accepted, rejected
+
+
+def split_by_version(texts):
+    """把地址分为 (IPv4列表, IPv6列表)，保持原字符串；无效地址归入IPv4"""
+    ipv4 = []
+    ipv6 = []
+    for text in texts:
+        parsed = parse_address(text) if text else None
+        (ipv6 if parsed is not None and parsed.version == 6 else ipv4).append(text)
+    return ipv4, ipv6
@@ -0,0 +1,62 @@
+"""按探测参数对一组DNS服务器测速并排名"""
+
+from .probe import DeadCache, ProbeEngine, ranking_latency
+
+
+def make_engine(settings, dead_cache=None):
+    """根据探测参数创建探测引擎"""
+    ssl_context = None
+    if settings.encrypted_test and settings.tls_cafile:
+        from .encrypted import make_ssl_context
+
+        ssl_context = make_ssl_context(settings.tls_cafile)
+    return ProbeEngine(
+        max_in_flight=settings.concurrency,
+        timeout=settings.timeout,
+        samples=settings.samples,
+        prescreen_timeout=settings.prescreen_timeout,
+        dead_cache=dead_cache,
+        encrypted=settings.encrypted_test,
+        ssl_context=ssl_context,
+    )
+
+
+def make_dead_cache(settings):
+    """创建在多次测试之间共用的无响应地址缓存"""
+    return DeadCache(settings.dead_ttl)
+
+
+def run_benchmark(servers, settings, corpus=None, on_result=None, dead_cache=None):
+    """测试所有服务器，返回 {名称: 测试结果}
+
+    settings 为 ProbeSettings；开启 workload_test 且域名集不为空时按域名集回放，
+    否则只测试 test_domain。每完成一个服务器即调用 on_result(name, result)。
+    dead_cache 为 make_dead_cache() 的结果时，上次预筛选无响应的地址在过期前直接跳过。
+    """
+    cold_zone = settings.cold_zone if settings.cold_test else None
+    workload = corpus.workload() if settings.workload_test and corpus else None
+    return make_engine(settings, dead_cache).run(
+        servers, settings.test_domain, on_result, cold_zone, workload
+    )
+
+
+def rank_servers(servers, results):
+    """按延迟排序服务器（失败或未测试的排在最后）"""
+    return sorted(servers, key=lambda s: ranking_latency(results.get(s["name"])))
+
+
+def result_domain(settings, corpus=None):
+    """测试结果对应的域名标签（域名集回放时为workload）"""
+    if settings.workload_test and corpus:
+        return "workload"
+    return settings.test_domain
+
+
+def record_results(history, servers, results, settings, corpus=None):
+    """把 run_benchmark 的结果保存到 HistoryStore，返回写入的行数"""
+    return history.record(
+        servers,
+        results,
+        result_domain(settings, corpus),
+        settings.cold_zone if settings.cold_test else None,
+    )
@@ -0,0 +1,606 @@
+"""无界面命令行测试模式
+
+不导入 tkinter / ttkbootstrap / pywin32，也不需要管理员权限，
+可在Linux服务器或定时任务中运行：
+
+    python main.py --headless --category Ipv4_Default --format json
+
+测试后把最快的服务器应用到网络接口（需要管理员/root权限）：
+
+    python main.py --headless --category Ipv4_Default --apply eth0
+
+测试后在本机启动缓存转发器，把查询转发给最快的几个服务器（持续监控时随排名更新）：
+
+    python main.py --headless --category Ipv4_Default --monitor --forward 5353
+"""
+
+import argparse
+import csv
+import json
+import math
+import socket
+import sys
+import time
+
+from .benchmark import rank_servers, record_results, result_domain, run_benchmark
+from .config import (
+    DEFAULT_HISTORY_DAYS,
+    DEFAULT_MONITOR_INTERVAL,
+    DEFAULT_MONITOR_TOP_TIER,
+    RESERVED_SECTIONS,
+    ForwarderSettings,
+    ProbeSettings,
+    category_version,
+    ensure_category,
+    get_categories,
+    load_category_servers,
+    read_config,
+    write_config,
+)
+from .corpus import DomainCorpus
+from .probe import STATUS_SUCCESS
+
+# 输出的字段
+FIELDS = (
+    "rank",
+    "name",
+    "primary",
+    "secondary",
+    "status",
+    "latency",
+    "primary_latency",
+    "primary_p95",
+    "primary_loss",
+    "secondary_latency",
+    "secondary_p95",
+    "secondary_loss",
+    "cold_latency",
+    "doh_latency",
+    "doh_handshake",
+    "dot_latency",
+    "dot_handshake",
+)
+
+# 历史统计输出的字段
+REPORT_FIELDS = ("rank", "name", "p50", "p95", "loss", "runs")
+
+
+def build_parser():
+    """创建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog="main.py --headless", description="DNS服务器延迟测试（无界面模式）"
+    )
+    parser.add_argument("--headless", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument(
+        "-c", "--config", default="dns_servers.ini", help="配置文件路径"
+    )
+    parser.add_argument(
+        "--category", help="要测试的DNS类别，默认为上次在界面中选择的类别"
+    )
+    parser.add_argument(
+        "--list-categories", action="store_true", help="列出所有DNS类别后退出"
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=("text", "json", "csv"),
+        default="text",
+        help="输出格式",
+    )
+    parser.add_argument("-o", "--output", help="输出文件，默认输出到标准输出")
+    parser.add_argument("--domain", help="测试域名，覆盖配置中的 test_domain")
+    parser.add_argument(
+        "--workload", action="store_true", help="按[Domains]域名集回放测试"
+    )
+    parser.add_argument("--cold", action="store_true", help="同时测量冷缓存延迟")
+    parser.add_argument(
+        "--encrypted",
+        action="store_true",
+        help="同时测试服务器配置的DoH/DoT（连接复用，握手耗时单独统计）",
+    )
+    parser.add_argument("--cafile", help="DoH/DoT额外信任的CA证书（如本地测试服务器）")
+    parser.add_argument("--samples", type=int, help="每个地址的采样次数")
+    parser.add_argument("--timeout", type=float, help="单个查询超时时间（秒）")
+    parser.add_argument("--concurrency", type=int, help="同时进行的查询数量上限")
+    parser.add_argument(
+        "--prescreen",
+        type=float,
+        metavar="SECONDS",
+        help="预筛选超时（秒），无响应的地址不再完整测试；0为不预筛选",
+    )
+    parser.add_argument("--history", help="把测试结果追加到该SQLite历史记录文件")
+    parser.add_argument(
+        "--report",
+        type=float,
+        metavar="HOURS",
+        help="不测试，输出历史记录中最近HOURS小时每个服务器的P50/P95（需要--history）",
+    )
+    parser.add_argument(
+        "--monitor", action="store_true", help="持续监控，按自适应间隔反复探测"
+    )
+    parser.add_argument("--interval", type=float, help="持续监控的探测间隔（秒）")
+    parser.add_argument(
+        "--current",
+        action="append",
+        metavar="ADDR",
+        help="当前使用的DNS地址，跌出第一梯队时提醒；默认读取 /etc/resolv.conf",
+    )
+    parser.add_argument(
+        "--import",
+        dest="import_file",
+        metavar="FILE",
+        help="不测试，把CSV/JSON/文本格式的服务器列表导入到--category指定的类别",
+    )
+    parser.add_argument(
+        "--list-adapters",
+        action="store_true",
+        help="列出网络适配器及其当前DNS后退出",
+    )
+    parser.add_argument(
+        "--apply",
+        metavar="ADAPTER",
+        help="测试后把排名第一的可用服务器设置为该网络适配器的DNS",
+    )
+    parser.add_argument(
+        "--revert",
+        metavar="ADAPTER",
+        help="不测试，把该网络适配器的DNS恢复为自动获取",
+    )
+    parser.add_argument(
+        "--forward",
+        nargs="?",
+        const="",
+        metavar="[HOST:]PORT",
+        help="测试后启动本地缓存DNS转发器，转发给排名靠前的服务器，直到被中断",
+    )
+    return parser
+
+
+def _number(value):
+    """把延迟转换为可序列化的数值，无穷大输出为None"""
+    if value is None or value == "∞" or value == math.inf:
+        return None
+    return round(value, 2)
+
+
+def _rows(servers, results):
+    """按延迟排名生成输出行"""
+    rows = []
+    for rank, server in enumerate(rank_servers(servers, results), start=1):
+        result = results.get(server["name"], {})
+        primary_stats = result.get("primary_stats", {})
+        secondary_stats = result.get("secondary_stats", {})
+        cold = result.get("cold", {})
+        rows.append(
+            {
+                "rank": rank,
+                "name": server["name"],
+                "primary": server["primary"],
+                "secondary": server["secondary"],
+                "status": result.get("status", ""),
+                "latency": _number(result.get("latency")),
+                "primary_latency": _number(result.get("primary_latency")),
+                "primary_p95": _number(primary_stats.get("p95")),
+                "primary_loss": _number(primary_stats.get("loss")),
+                "secondary_latency": _number(result.get("secondary_latency")),
+                "secondary_p95": _number(secondary_stats.get("p95")),
+                "secondary_loss": _number(secondary_stats.get("loss")),
+                "cold_latency": _number(cold.get("latency")),
+                "doh_latency": _number(result.get("doh", {}).get("latency")),
+                "doh_handshake": _number(result.get("doh", {}).get("handshake")),
+                "dot_latency": _number(result.get("dot", {}).get("latency")),
+                "dot_handshake": _number(result.get("dot", {}).get("handshake")),
+            }
+        )
+    return rows
+
+
+def _write_text(rows, out):
+    for row in rows:
+        latency = "∞" if row["latency"] is None else f"{row['latency']:.1f}"
+        encrypted = "".join(
+            f"  {transport.upper()} {row[f'{transport}_latency']:.1f} ms"
+            f"（握手 {row[f'{transport}_handshake']:.1f}）"
+            for transport in ("doh", "dot")
+            if row[f"{transport}_latency"] is not None
+        )
+        out.write(
+            f"{row['rank']:>3}. {row['name']:<40} {row['primary']:<24} "
+            f"{latency:>8} ms  {row['status']}{encrypted}\n"
+        )
+
+
+def _write_csv(rows, out):
+    writer = csv.DictWriter(out, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def _write_json(rows, out, meta):
+    json.dump({**meta, "results": rows}, out, ensure_ascii=False, indent=2)
+    out.write("\n")
+
+
+def _write(fmt, rows, out, meta):
+    """按指定格式输出排名"""
+    if fmt == "json":
+        _write_json(rows, out, meta)
+    elif fmt == "csv":
+        _write_csv(rows, out)
+    else:
+        _write_text(rows, out)
+
+
+def _write_report(stats, fmt, out, meta):
+    """输出历史统计，按P95排序"""
+    rows = [
+        {
+            "rank": rank,
+            "name": name,
+            "p50": _number(item["p50"]),
+            "p95": _number(item["p95"]),
+            "loss": _number(item["loss"]),
+            "runs": item["runs"],
+        }
+        for rank, (name, item) in enumerate(
+            sorted(stats.items(), key=lambda e: e[1]["p95"]), start=1
+        )
+    ]
+    if fmt == "json":
+        _write_json(rows, out, meta)
+    elif fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            p50 = "∞" if row["p50"] is None else f"{row['p50']:.1f}"
+            p95 = "∞" if row["p95"] is None else f"{row['p95']:.1f}"
+            out.write(
+                f"{row['rank']:>3}. {row['name']:<40} {p50:>8} / {p95:>8} ms  "
+                f"丢包 {row['loss']:.0f}%  ({row['runs']}次)\n"
+            )
+
+
+def _history(args, config):
+    """打开 --history 指定的历史记录，未指定时返回None"""
+    if not args.history:
+        return None
+    from .history import HistoryStore
+
+    return HistoryStore(
+        args.history,
+        config.getint("Main", "history_days", fallback=DEFAULT_HISTORY_DAYS),
+    )
+
+
+def _report(args, config):
+    """输出历史记录统计"""
+    history = _history(args, config)
+    if history is None:
+        print("--report 需要通过 --history 指定历史记录文件", file=sys.stderr)
+        return 2
+    stats = history.server_stats(args.report)
+    meta = {"host": socket.gethostname(), "hours": args.report}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            _write_report(stats, args.format, out, meta)
+    else:
+        _write_report(stats, args.format, sys.stdout, meta)
+    return 0
+
+
+def _import(args, config):
+    """把服务器列表文件导入到指定类别并保存配置文件"""
+    from .importer import import_file
+
+    category = args.category
+    if not category or category in RESERVED_SECTIONS:
+        print("--import 需要通过 --category 指定DNS类别", file=sys.stderr)
+        return 2
+    ensure_category(config, category)
+    existing, _ = load_category_servers(config, category)
+    try:
+        result = import_file(args.import_file, category_version(category), existing)
+    except (OSError, ValueError) as e:
+        print(f"读取服务器列表失败: {e}", file=sys.stderr)
+        return 1
+    for entry in result.rejected:
+        print(f"已跳过 {entry.address}（{entry.reason}）", file=sys.stderr)
+    for server in result.servers:
+        config.set(category, server.name, server.config_value())
+    write_config(config, args.config)
+    print(
+        f"已导入 {len(result.servers)} 个DNS服务器到 {category}，"
+        f"跳过 {result.duplicates} 个重复地址，过滤 {len(result.rejected)} 个地址",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def _list_adapters(args):
+    """列出网络适配器、地址和当前DNS"""
+    from .system_dns import make_system_backend
+
+    backend = make_system_backend()
+    adapters = backend.list_adapters()
+    if args.format == "json":
+        json.dump(
+            {"backend": backend.name, "adapters": adapters},
+            sys.stdout,
+            ensure_ascii=False,
+            indent=2,
+        )
+        sys.stdout.write("\n")
+        return 0
+    for adapter in adapters:
+        addresses = adapter["ipv4_addresses"] + adapter["ipv6_addresses"]
+        print(
+            f"{adapter['name']:<16} {', '.join(addresses) or '-'}  "
+            f"DNS: {', '.join(adapter['dns_servers']) or '-'}"
+        )
+    return 0
+
+
+def _revert(args):
+    """把网络适配器的DNS恢复为自动获取"""
+    from .system_dns import make_system_backend
+
+    backend = make_system_backend()
+    try:
+        backend.reset_dns(args.revert)
+    except OSError as e:
+        print(f"恢复 {args.revert} 的DNS失败: {e}", file=sys.stderr)
+        return 1
+    print(f"已将 {args.revert} 的DNS恢复为自动获取", file=sys.stderr)
+    return 0
+
+
+def _apply(adapter, servers, results):
+    """把排名第一的可用服务器设置为网络适配器的DNS，并清理系统DNS缓存"""
+    from .system_dns import make_system_backend
+
+    best = next(
+        (
+            server
+            for server in rank_servers(servers, results)
+            if results.get(server["name"], {}).get("status") == STATUS_SUCCESS
+        ),
+        None,
+    )
+    if best is None:
+        print("没有可用的DNS服务器，未修改DNS设置", file=sys.stderr)
+        return 1
+    addresses = [best["primary"]]
+    if best["secondary"]:
+        addresses.append(best["secondary"])
+    backend = make_system_backend()
+    try:
+        backend.set_dns(adapter, addresses)
+    except OSError as e:
+        print(f"设置 {adapter} 的DNS失败: {e}", file=sys.stderr)
+        return 1
+    try:
+        backend.flush_cache()
+    except OSError as e:
+        print(f"清理DNS缓存失败: {e}", file=sys.stderr)
+    print(
+        f"已将 {adapter} 的DNS设置为 {best['name']}（{', '.join(addresses)}）",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def _forwarder_settings(args, config):
+    """读取转发器参数，--forward 的 [HOST:]PORT 优先于配置文件"""
+    settings = ForwarderSettings.from_config(config)
+    if args.forward:
+        host, _, port = args.forward.rpartition(":")
+        settings.host = host.strip("[]") or settings.host
+        settings.port = int(port)
+    return settings
+
+
+def _start_forwarder(args, config):
+    """启动 --forward 指定的本地转发器，失败时返回 None"""
+    from .forwarder import Forwarder
+
+    try:
+        settings = _forwarder_settings(args, config)
+    except ValueError as e:
+        print(f"转发器参数无效: {e}", file=sys.stderr)
+        return None
+    forwarder = Forwarder.from_settings(settings)
+    try:
+        forwarder.start(settings.host, settings.port)
+    except OSError as e:
+        print(
+            f"无法在 {settings.host}:{settings.port} 启动转发器: {e}", file=sys.stderr
+        )
+        return None
+    print(
+        f"转发器已在 {settings.host}:{settings.port} 启动（{settings.mode}）",
+        file=sys.stderr,
+    )
+    return forwarder
+
+
+def _print_forwarder_stats(forwarder):
+    """把转发器的命中率和每个上游的延迟输出到标准错误"""
+    summary = forwarder.stats.summary()
+    print(
+        f"转发 {summary['queries']} 次，缓存命中率 {summary['hit_rate']:.1f}%，"
+        f"失败 {summary['failures']} 次",
+        file=sys.stderr,
+    )
+    for address, item in summary["upstreams"].items():
+        p50 = "-" if item["p50"] is None else f"{item['p50']:.1f}"
+        print(
+            f"  {address:<40} 采用 {item['wins']:>6}  P50 {p50:>8} ms  "
+            f"失败 {item['failures']}",
+            file=sys.stderr,
+        )
+
+
+def _forward(forwarder, servers, results):
+    """把查询转发给测试结果中最快的服务器，直到被中断"""
+    from .forwarder import ranked_upstreams
+
+    forwarder.set_upstreams(ranked_upstreams(servers, results))
+    if not forwarder.upstreams:
+        print("没有可用的DNS服务器，转发器未启动", file=sys.stderr)
+        forwarder.stop()
+        return 1
+    print(f"上游: {', '.join(forwarder.upstreams)}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    forwarder.stop()
+    _print_forwarder_stats(forwarder)
+    return 0
+
+
+def _monitor(args, config, servers, settings, corpus, forwarder=None):
+    """持续监控，每轮输出一行排名，直到被中断"""
+    from .monitor import Monitor
+    from .system_dns import read_resolv_conf
+
+    current = args.current or read_resolv_conf()
+    out = sys.stdout
+    latest = {}  # 每个服务器最近一次的测试结果
+
+    def on_update(results, ranking):
+        if forwarder is not None:
+            from .forwarder import ranked_upstreams
+
+            latest.update(results)
+            forwarder.set_upstreams(ranked_upstreams(servers, latest, ranking))
+        if args.format == "json":
+            json.dump(
+                {
+                    "timestamp": int(time.time()),
+                    "probed": sorted(results),
+                    "ranking": ranking,
+                },
+                out,
+                ensure_ascii=False,
+            )
+            out.write("\n")
+        else:
+            line = (
+                f"{time.strftime('%H:%M:%S')} 探测 {len(results)} 个，"
+                f"排名: {', '.join(ranking[:5])}"
+            )
+            if forwarder is not None:
+                line += f"  缓存命中率 {forwarder.stats.hit_rate:.1f}%"
+            out.write(line + "\n")
+        out.flush()
+
+    monitor = Monitor(
+        servers,
+        settings,
+        corpus,
+        current_dns=lambda: current,
+        on_update=on_update,
+        on_alert=lambda message: print(message, file=sys.stderr, flush=True),
+        interval=args.interval
+        or config.getfloat(
+            "Main", "monitor_interval", fallback=DEFAULT_MONITOR_INTERVAL
+        ),
+        top_tier=config.getint(
+            "Main", "monitor_top_tier", fallback=DEFAULT_MONITOR_TOP_TIER
+        ),
+        history=_history(args, config),
+    )
+    try:
+        monitor.run()
+    except KeyboardInterrupt:
+        pass
+    if forwarder is not None:
+        forwarder.stop()
+        _print_forwarder_stats(forwarder)
+    return 0
+
+
+def main(argv=None):
+    """命令行入口，返回进程退出码"""
+    args = build_parser().parse_args(argv)
+    config = read_config(args.config)
+    if args.report is not None:
+        return _report(args, config)
+    if args.import_file:
+        return _import(args, config)
+    if args.list_adapters:
+        return _list_adapters(args)
+    if args.revert:
+        return _revert(args)
+    categories = get_categories(config)
+    if args.list_categories:
+        print("\n".join(categories))
+        return 0
+    category = args.category or config.get("Main", "last_category", fallback="")
+    if category not in categories:
+        print(f"找不到DNS类别: {category or '(未指定)'}", file=sys.stderr)
+        return 2
+    servers, rejected = load_category_servers(config, category)
+    for entry in rejected:
+        print(
+            f"已过滤 {entry.entry} 的{entry.field}地址 {entry.address}（{entry.reason}）",
+            file=sys.stderr,
+        )
+
+    # 命令行参数优先于配置文件[Main]节
+    try:
+        settings = ProbeSettings.from_config(config)
+    except ValueError as e:
+        print(f"探测参数无效: {e}", file=sys.stderr)
+        return 2
+    settings.concurrency = args.concurrency or settings.concurrency
+    settings.timeout = args.timeout or settings.timeout
+    settings.samples = args.samples or settings.samples
+    if args.prescreen is not None:
+        settings.prescreen_timeout = args.prescreen
+    settings.test_domain = args.domain or settings.test_domain
+    settings.cold_test = args.cold
+    settings.workload_test = args.workload
+    settings.encrypted_test = args.encrypted or settings.encrypted_test
+    settings.tls_cafile = args.cafile or settings.tls_cafile
+    corpus = DomainCorpus.from_config(config) if args.workload else None
+
+    # 先启动转发器，端口被占用时不必等待测试结束
+    forwarder = None
+    if args.forward is not None:
+        forwarder = _start_forwarder(args, config)
+        if forwarder is None:
+            return 1
+    if args.monitor:
+        return _monitor(args, config, servers, settings, corpus, forwarder)
+
+    started = time.time()
+    results = run_benchmark(servers, settings, corpus)
+    history = _history(args, config)
+    if history is not None:
+        record_results(history, servers, results, settings, corpus)
+    rows = _rows(servers, results)
+    meta = {
+        "host": socket.gethostname(),
+        "timestamp": int(started),
+        "duration": round(time.time() - started, 3),
+        "category": category,
+        "domain": result_domain(settings, corpus),
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            _write(args.format, rows, out, meta)
+    else:
+        _write(args.format, rows, sys.stdout, meta)
+    if args.apply:
+        status = _apply(args.apply, servers, results)
+        if status or forwarder is None:
+            return status
+    if forwarder is not None:
+        return _forward(forwarder, servers, results)
+    return 0
@@ -0,0 +1,392 @@
+"""dns_servers.ini 配置解析"""
+
+import configparser
+import contextlib
+import io
+import os
+import stat
+import tempfile
+import threading
+
+from .addresses import Rejected, check_address
+from .corpus import DOMAINS_SECTION
+from .servers import Server, ServerList
+
+# 配置文件中不属于DNS类别的节
+RESERVED_SECTIONS = ("Main", DOMAINS_SECTION)
+
+# [Main]节中探测参数的默认值
+DEFAULT_PROBE_CONCURRENCY = 64  # probe_concurrency
+DEFAULT_PROBE_TIMEOUT = 3.0  # probe_timeout
+DEFAULT_PROBE_SAMPLES = 3  # probe_samples
+DEFAULT_PRESCREEN_TIMEOUT = 1.0  # prescreen_timeout：预筛选超时（秒），0为不预筛选
+DEFAULT_DEAD_TTL = 300.0  # dead_ttl：预筛选无响应的地址在多少秒内直接跳过
+DEFAULT_TEST_DOMAIN = "www.baidu.com"  # test_domain
+DEFAULT_COLD_ZONE = "baidu.com"  # cold_zone
+DEFAULT_HISTORY_DAYS = 30  # history_days：历史记录保留天数
+DEFAULT_MONITOR_INTERVAL = 60.0  # monitor_interval：持续监控的探测间隔（秒）
+DEFAULT_MONITOR_TOP_TIER = 3  # monitor_top_tier：排名前几的服务器视为第一梯队
+DEFAULT_FORWARDER_HOST = "127.0.0.1"  # forwarder_host：本地转发器监听地址
+DEFAULT_FORWARDER_PORT = 53  # forwarder_port：本地转发器端口（UDP和TCP）
+DEFAULT_FORWARDER_UPSTREAMS = 3  # forwarder_upstreams：转发给排名前几的上游地址
+DEFAULT_FORWARDER_MODE = "race"  # forwarder_mode：race 同时发送，round_robin 轮流
+DEFAULT_FORWARDER_TIMEOUT = 2.0  # forwarder_timeout：上游查询超时（秒）
+DEFAULT_FORWARDER_CACHE_SIZE = 10000  # forwarder_cache_size：缓存的应答条数
+
+# 新建默认类别时写入的DNS服务器
+DEFAULT_CATEGORY_SERVERS = {
+    "Ipv4_默认": {
+        "US - Google Public DNS": "8.8.8.8,8.8.4.4,doh=https://dns.google/dns-query,dot=dns.google",
+        "AU - Cloudflare": "1.1.1.1,1.0.0.1,doh=https://cloudflare-dns.com/dns-query,dot=one.one.one.one",
+        "CN - Aliyun": "223.5.5.5,223.6.6.6,doh=https://dns.alidns.com/dns-query,dot=dns.alidns.com",
+    },
+    "Ipv6_默认": {
+        "US - Google Public DNS": "2001:4860:4860::8888,2001:4860:4860::8844",
+        "AU - Cloudflare": "2606:4700:4700::1111,2606:4700:4700::1001",
+    },
+}
+
+
+def is_ip(ip, version=None):
+    """
+    检查是否为有效的IP地址
+    参数:
+        ip: 待检查的IP地址字符串
+        version: 可选，指定IP版本(4或6)，默认检查是否为任意有效IP
+    返回:
+        bool: 符合指定版本则返回True，否则返回False
+    """
+    if not ip:
+        # 空字符串视为有效IPv4(保持原逻辑)
+        return version == 4
+    if version not in (None, 4, 6):
+        # 无效版本参数返回False
+        return False
+    return check_address(ip, version)[0] is not None
+
+
+def new_config_parser():
+    """获取配置解析器"""
+    config = configparser.ConfigParser()
+    config.optionxform = str  # 区分大小写
+    return config
+
+
+def read_config(path):
+    """读取配置文件"""
+    config = new_config_parser()
+    config.read(path, encoding="utf-8")
+    return config
+
+
+def write_config(config, path):
+    """保存配置文件（先写临时文件再改名，避免写到一半留下残缺的配置）"""
+    buffer = io.StringIO()
+    config.write(buffer)
+    replace_file(path, buffer.getvalue())
+
+
+DEFAULT_FILE_MODE = 0o644  # 新建文件的权限（原文件不存在时）
+
+
+def _copy_file_mode(tmp_path, path):
+    """把 path 的权限和所有者复制到临时文件（mkstemp 创建的文件为 0600）"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        os.chmod(tmp_path, DEFAULT_FILE_MODE)
+        return
+    os.chmod(tmp_path, stat.S_IMODE(st.st_mode))
+    if hasattr(os, "chown"):
+        # 非root用户不能修改所有者，此时保持为当前用户
+        with contextlib.suppress(OSError):
+            os.chown(tmp_path, st.st_uid, st.st_gid)
+
+
+def replace_file(path, text, mode_from=None):
+    """把 text 写入临时文件后改名替换 path，保留原文件的权限和所有者
+
+    mode_from 为另一个文件时改用它的权限和所有者（如创建备份文件）。
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        _copy_file_mode(tmp_path, mode_from or path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+class ConfigStore:
+    """启动时读取一次的内存配置
+
+    所有读写都在内存中的 ConfigParser 上进行；修改后标记为脏数据，
+    并在 delay 秒内没有新的修改时由后台定时器统一写回文件。
+    """
+
+    def __init__(self, path, delay=0.5, on_error=None):
+        self.path = path
+        self.delay = delay  # 合并写入的延迟（秒）
+        self.on_error = on_error  # 后台写入失败时调用 on_error(异常)
+        self.config = read_config(path)
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()  # 保证写入文件的顺序与修改顺序一致
+        self._dirty = False
+        self._timer = None
+
+    @property
+    def dirty(self):
+        """是否有尚未写回文件的修改"""
+        return self._dirty
+
+    @contextlib.contextmanager
+    def edit(self):
+        """修改配置：with store.edit() as config: ...，结束后安排写回"""
+        with self._lock:
+            yield self.config
+            self.mark_dirty()
+
+    def section(self, name):
+        """确保节存在"""
+        with self._lock:
+            if not self.config.has_section(name):
+                self.config.add_section(name)
+                self.mark_dirty()
+
+    def set(self, section, option, value):
+        """设置一个选项（节不存在时自动创建），值未变化时不触发写入"""
+        with self._lock:
+            if not self.config.has_section(section):
+                self.config.add_section(section)
+            elif self.config.get(section, option, fallback=None) == value:
+                return
+            self.config.set(section, option, value)
+            self.mark_dirty()
+
+    def mark_dirty(self):
+        """标记为已修改，并重新开始延迟写入计时"""
+        with self._lock:
+            self._dirty = True
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except OSError as e:
+            if self.on_error is not None:
+                self.on_error(e)
+            else:
+                print(f"保存配置文件失败: {e}")
+
+    def flush(self):
+        """立即把未保存的修改写回文件（失败时抛出 OSError，修改仍保留）"""
+        with self._write_lock:
+            # 只在锁内序列化，写文件时不阻塞界面线程的修改
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return False
+                buffer = io.StringIO()
+                self.config.write(buffer)
+                self._dirty = False
+            try:
+                replace_file(self.path, buffer.getvalue())
+            except OSError:
+                with self._lock:
+                    self._dirty = True
+                raise
+            return True
+
+    def reload(self):
+        """写回未保存的修改后重新读取配置文件（如文件被手动修改过）"""
+        self.flush()
+        with self._lock:
+            self.config = read_config(self.path)
+
+
+class ProbeSettings:
+    """[Main]节中的探测参数"""
+
+    __slots__ = (
+        "concurrency",
+        "timeout",
+        "samples",
+        "prescreen_timeout",
+        "dead_ttl",
+        "test_domain",
+        "cold_zone",
+        "cold_test",
+        "workload_test",
+        "encrypted_test",
+        "tls_cafile",
+    )
+
+    def __init__(self):
+        self.concurrency = DEFAULT_PROBE_CONCURRENCY  # 同时进行的查询数量上限
+        self.timeout = DEFAULT_PROBE_TIMEOUT  # 单个查询超时时间（秒）
+        self.samples = DEFAULT_PROBE_SAMPLES  # 每个地址的采样次数
+        self.prescreen_timeout = DEFAULT_PRESCREEN_TIMEOUT  # 预筛选超时（秒）
+        self.dead_ttl = DEFAULT_DEAD_TTL  # 无响应地址的跳过时间（秒）
+        self.test_domain = DEFAULT_TEST_DOMAIN  # 单域名测试的域名
+        self.cold_zone = DEFAULT_COLD_ZONE  # 冷缓存测试区域
+        self.cold_test = False  # 是否同时测量冷缓存延迟
+        self.workload_test = False  # 是否按[Domains]域名集回放测试
+        self.encrypted_test = False  # 是否同时测试DoH/DoT
+        self.tls_cafile = ""  # DoH/DoT额外信任的CA证书（如本地测试服务器）
+
+    @classmethod
+    def from_config(cls, config):
+        """从配置文件读取，数值无效时抛出 ValueError"""
+        settings = cls()
+        settings.concurrency = config.getint(
+            "Main", "probe_concurrency", fallback=settings.concurrency
+        )
+        settings.timeout = config.getfloat(
+            "Main", "probe_timeout", fallback=settings.timeout
+        )
+        settings.samples = config.getint(
+            "Main", "probe_samples", fallback=settings.samples
+        )
+        settings.prescreen_timeout = config.getfloat(
+            "Main", "prescreen_timeout", fallback=settings.prescreen_timeout
+        )
+        settings.dead_ttl = config.getfloat(
+            "Main", "dead_ttl", fallback=settings.dead_ttl
+        )
+        settings.test_domain = config.get(
+            "Main", "test_domain", fallback=settings.test_domain
+        )
+        settings.cold_zone = config.get(
+            "Main", "cold_zone", fallback=settings.cold_zone
+        )
+        settings.cold_test = config.getboolean("Main", "cold_test", fallback=False)
+        settings.workload_test = config.getboolean(
+            "Main", "workload_test", fallback=False
+        )
+        settings.encrypted_test = config.getboolean(
+            "Main", "encrypted_test", fallback=False
+        )
+        settings.tls_cafile = config.get("Main", "tls_cafile", fallback="")
+        return settings
+
+
+class ForwarderSettings:
+    """[Main]节中的本地转发器参数"""
+
+    __slots__ = ("host", "port", "upstreams", "mode", "timeout", "cache_size")
+
+    MODES = ("race", "round_robin")
+
+    def __init__(self):
+        self.host = DEFAULT_FORWARDER_HOST
+        self.port = DEFAULT_FORWARDER_PORT
+        self.upstreams = DEFAULT_FORWARDER_UPSTREAMS  # 使用排名前几的上游地址
+        self.mode = DEFAULT_FORWARDER_MODE
+        self.timeout = DEFAULT_FORWARDER_TIMEOUT
+        self.cache_size = DEFAULT_FORWARDER_CACHE_SIZE
+
+    @classmethod
+    def from_config(cls, config):
+        """从配置文件读取，数值无效时抛出 ValueError"""
+        settings = cls()
+        settings.host = config.get("Main", "forwarder_host", fallback=settings.host)
+        settings.port = config.getint("Main", "forwarder_port", fallback=settings.port)
+        settings.upstreams = config.getint(
+            "Main", "forwarder_upstreams", fallback=settings.upstreams
+        )
+        settings.mode = config.get("Main", "forwarder_mode", fallback=settings.mode)
+        settings.timeout = config.getfloat(
+            "Main", "forwarder_timeout", fallback=settings.timeout
+        )
+        settings.cache_size = config.getint(
+            "Main", "forwarder_cache_size", fallback=settings.cache_size
+        )
+        if settings.mode not in cls.MODES:
+            raise ValueError(f"forwarder_mode 只能是 {' 或 '.join(cls.MODES)}")
+        if settings.upstreams < 1:
+            raise ValueError("forwarder_upstreams 至少为1")
+        return settings
+
+
+def get_categories(config):
+    """按保存的顺序返回配置中的DNS类别"""
+    categories = [
+        section for section in config.sections() if section not in RESERVED_SECTIONS
+    ]
+    saved_order = config.get("Main", "category_order", fallback="").split(",")
+    ordered = [cat for cat in saved_order if cat in categories]
+    return ordered + [cat for cat in categories if cat not in ordered]
+
+
+def ensure_category(config, category):
+    """类别不存在时创建该类别，默认类别会写入默认DNS服务器；返回是否新建"""
+    if category in config.sections():
+        return False
+    config.add_section(category)
+    for name, dns in DEFAULT_CATEGORY_SERVERS.get(category, {}).items():
+        config.set(category, name, dns)
+    return True
+
+
+def category_version(category):
+    """类别的IP版本：Ipv6_开头的类别为6，其余为4"""
+    return 6 if category.startswith("Ipv6_") else 4
+
+
+def load_category_servers(config, category):
+    """解析指定类别的DNS服务器
+
+    返回 (ServerList, Rejected列表)；IPv4类别拒绝IPv6地址，反之亦然，
+    无效地址的原因为 REJECT_INVALID。主DNS被拒绝的服务器不会加载。
+    """
+    servers = ServerList()
+    rejected = []
+    version = category_version(category)
+    for key, value in config.items(category):
+        if not value.strip():
+            continue
+        # 解析格式: name=primary,secondary[,doh=URL][,dot=主机名] 或 name=primary
+        # 忽略其他参数（如True/False标志）
+        dns_parts = []
+        options = {}
+        for part in value.split(","):
+            option, sep, option_value = part.partition("=")
+            if sep and option.strip() in ("doh", "dot"):
+                options[option.strip()] = option_value.strip()
+            else:
+                dns_parts.append(part.strip())
+        addresses = {"primary": dns_parts[0] if dns_parts else "", "secondary": ""}
+        if len(dns_parts) >= 2:
+            addresses["secondary"] = dns_parts[1]
+        for field, text in addresses.items():
+            if not text:
+                continue
+            parsed, reason = check_address(text, version)
+            if parsed is None:
+                rejected.append(Rejected(key, field, text, reason))
+                addresses[field] = ""
+        if addresses["primary"]:  # 只添加有主DNS的服务器
+            servers.add(
+                Server(
+                    key,
+                    addresses["primary"],
+                    addresses["secondary"],
+                    options.get("doh", ""),
+                    options.get("dot", ""),
+                )
+            )
+    return servers, rejected
@@ -0,0 +1,108 @@
+"""加权测试域名集合"""
+
+# 支持的查询类型
+RECORD_TYPES = ("A", "AAAA", "HTTPS", "MX", "TXT")
+
+# 配置文件中保存域名集合的节
+DOMAINS_SECTION = "Domains"
+
+
+def _normalize_hostname(hostname):
+    """规范化主机名，无效时返回空字符串"""
+    hostname = hostname.strip().rstrip(".").lower()
+    if not hostname or len(hostname) > 253 or "." not in hostname:
+        return ""
+    if any(not label or len(label) > 63 for label in hostname.split(".")):
+        return ""
+    return hostname
+
+
+class DomainCorpus:
+    """加权测试域名集合
+
+    配置文件格式（[Domains]节）：
+        www.baidu.com = A:10,AAAA:2
+        qq.com = MX
+    类型省略权重时权重为1，整个值为空时等同于 A:1。
+    """
+
+    def __init__(self):
+        self.entries = {}  # (域名, 类型) -> 权重
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, domain, rdtype="A", weight=1.0):
+        """添加一个查询，已存在时累加权重"""
+        rdtype = rdtype.upper()
+        if rdtype not in RECORD_TYPES:
+            raise ValueError(f"不支持的查询类型: {rdtype}")
+        hostname = _normalize_hostname(domain)
+        if not hostname:
+            raise ValueError(f"无效的域名: {domain}")
+        key = (hostname, rdtype)
+        self.entries[key] = self.entries.get(key, 0.0) + weight
+
+    def clear(self):
+        self.entries.clear()
+
+    @classmethod
+    def from_config(cls, config, section=DOMAINS_SECTION):
+        """从配置文件的[Domains]节加载，无效条目会被跳过"""
+        corpus = cls()
+        if section not in config.sections():
+            return corpus
+        for domain, value in config.items(section):
+            for item in value.split(",") if value.strip() else ["A"]:
+                rdtype, _, weight = item.strip().partition(":")
+                try:
+                    corpus.add(domain, rdtype or "A", float(weight or 1))
+                except ValueError as e:
+                    print(f"跳过测试域名 {domain}: {e}")
+        return corpus
+
+    def write_to_config(self, config, section=DOMAINS_SECTION):
+        """写入配置文件的[Domains]节（覆盖原有内容）"""
+        if section in config.sections():
+            config.remove_section(section)
+        config.add_section(section)
+        by_domain = {}
+        for (domain, rdtype), weight in self.entries.items():
+            by_domain.setdefault(domain, []).append(f"{rdtype}:{weight:g}")
+        for domain, items in by_domain.items():
+            config.set(section, domain, ",".join(items))
+
+    def import_hostnames(self, lines):
+        """导入查询日志中的主机名列表
+
+        每行格式为 "主机名 [类型]"，以#开头的行被忽略；
+        同一主机名每出现一次权重加1。返回 (导入行数, 跳过行数)。
+        """
+        imported = skipped = 0
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split()
+            rdtype = parts[1] if len(parts) > 1 else "A"
+            try:
+                self.add(parts[0], rdtype)
+                imported += 1
+            except ValueError:
+                skipped += 1
+        return imported, skipped
+
+    def trim(self, limit):
+        """只保留权重最高的 limit 个查询"""
+        if len(self.entries) > limit:
+            top = sorted(self.entries.items(), key=lambda e: e[1], reverse=True)
+            self.entries = dict(top[:limit])
+
+    def workload(self):
+        """返回回放用的查询列表 [(域名, 类型, 权重), ...]，按权重降序"""
+        return [
+            (domain, rdtype, weight)
+            for (domain, rdtype), weight in sorted(
+                self.entries.items(), key=lambda e: e[1], reverse=True
+            )
+        ]
@@ -0,0 +1,218 @@
+"""DNS-over-TLS（DoT）和 DNS-over-HTTPS（DoH）探测
+
+每个服务器只建立一次连接，之后的查询都复用该连接（DoT为TCP长连接，
+DoH为HTTP/1.1 keep-alive），握手耗时（TCP连接 + TLS握手）和单次查询延迟分开统计。
+连接的是服务器的主DNS地址，DoT主机名/DoH URL中的主机名只用于证书校验（SNI）。
+"""
+
+import asyncio
+import ssl
+import time
+import urllib.parse
+
+import dns.message
+import dns.rcode
+
+from .probe import INFINITY, STATUS_FAILED, STATUS_SUCCESS
+from .stats import LatencySamples
+
+TRANSPORT_DOH = "doh"
+TRANSPORT_DOT = "dot"
+TRANSPORTS = (TRANSPORT_DOH, TRANSPORT_DOT)
+
+DOT_PORT = 853
+DOH_PORT = 443
+
+_OK_RCODES = (dns.rcode.NOERROR, dns.rcode.NXDOMAIN)
+
+
+def make_ssl_context(cafile=None):
+    """创建校验证书的TLS上下文，cafile 为额外信任的CA证书（如本地测试服务器）"""
+    return ssl.create_default_context(cafile=cafile or None)
+
+
+def _split_host_port(text, default_port):
+    """解析 host 或 host:port（IPv6地址需写成 [addr]:port）"""
+    parsed = urllib.parse.urlsplit(f"//{text}")
+    return parsed.hostname, parsed.port or default_port
+
+
+class _TlsConnection:
+    """一条复用的TLS连接，握手耗时记录在 handshakes 中"""
+
+    def __init__(self, address, hostname, port, ssl_context):
+        self.address = address
+        self.hostname = hostname
+        self.port = port
+        self.ssl_context = ssl_context
+        self.handshakes = []  # 每次建立连接的耗时（毫秒）
+        self._reader = None
+        self._writer = None
+
+    async def _ensure_open(self, timeout):
+        if self._writer is not None and not self._writer.is_closing():
+            return
+        started = time.perf_counter_ns()
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                self.address,
+                self.port,
+                ssl=self.ssl_context,
+                server_hostname=self.hostname,
+            ),
+            timeout,
+        )
+        self.handshakes.append((time.perf_counter_ns() - started) / 1_000_000)
+
+    async def query(self, wire, timeout):
+        """发送一个查询报文，返回 (延迟毫秒, 响应报文)；连接断开时自动重连"""
+        await self._ensure_open(timeout)
+        try:
+            started = time.perf_counter_ns()
+            response = await asyncio.wait_for(self._exchange(wire), timeout)
+        except BaseException:
+            self.close()
+            raise
+        return (time.perf_counter_ns() - started) / 1_000_000, response
+
+    async def _exchange(self, wire):
+        raise NotImplementedError
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._reader = None
+
+
+class DotConnection(_TlsConnection):
+    """DNS-over-TLS（RFC 7858）：报文前加两字节长度"""
+
+    def __init__(self, address, dot, ssl_context):
+        hostname, port = _split_host_port(dot, DOT_PORT)
+        super().__init__(address, hostname, port, ssl_context)
+
+    async def _exchange(self, wire):
+        self._writer.write(len(wire).to_bytes(2, "big") + wire)
+        await self._writer.drain()
+        length = int.from_bytes(await self._reader.readexactly(2), "big")
+        return await self._reader.readexactly(length)
+
+
+class DohConnection(_TlsConnection):
+    """DNS-over-HTTPS（RFC 8484）：HTTP/1.1 POST application/dns-message"""
+
+    def __init__(self, address, doh, ssl_context):
+        url = urllib.parse.urlsplit(doh)
+        super().__init__(address, url.hostname, url.port or DOH_PORT, ssl_context)
+        self.path = url.path or "/"
+        if url.query:
+            self.path += f"?{url.query}"
+        self.host_header = url.netloc
+
+    async def _exchange(self, wire):
+        self._writer.write(
+            (
+                f"POST {self.path} HTTP/1.1\r\n"
+                f"Host: {self.host_header}\r\n"
+                "Content-Type: application/dns-message\r\n"
+                "Accept: application/dns-message\r\n"
+                f"Content-Length: {len(wire)}\r\n\r\n"
+            ).encode()
+            + wire
+        )
+        await self._writer.drain()
+        status_line = await self._reader.readline()
+        parts = status_line.split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith(b"HTTP/"):
+            raise ValueError("无效的HTTP响应")
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await self._read_chunked()
+        else:
+            body = await self._reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        if parts[1] != b"200":
+            raise ValueError(f"HTTP {parts[1].decode('latin-1')}")
+        return body
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self._reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                await self._reader.readline()
+                return b"".join(chunks)
+            chunks.append(await self._reader.readexactly(size))
+            await self._reader.readline()
+
+
+def make_connection(transport, server, ssl_context):
+    """为服务器创建指定传输方式的连接，服务器没有配置该方式时返回 None"""
+    target = server.get(transport)
+    if not target:
+        return None
+    if transport == TRANSPORT_DOT:
+        return DotConnection(server["primary"], target, ssl_context)
+    return DohConnection(server["primary"], target, ssl_context)
+
+
+class EncryptedProber:
+    """在一条复用的连接上依次发送查询，统计握手和查询延迟"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._wire_cache = {}
+
+    def _query_wire(self, domain, rdtype, transport):
+        wire = self._wire_cache.get((domain, rdtype))
+        if wire is None:
+            wire = dns.message.make_query(domain, rdtype).to_wire()[2:]
+            self._wire_cache[(domain, rdtype)] = wire
+        # DoH 建议使用事务ID 0，便于HTTP缓存
+        query_id = 0 if transport == TRANSPORT_DOH else 0x5354
+        return query_id.to_bytes(2, "big") + wire
+
+    async def run(self, connection, transport, queries):
+        """返回 {"latency", "status", "handshake", "stats"}"""
+        samples = LatencySamples()
+        try:
+            for domain, rdtype, weight in queries:
+                wire = self._query_wire(domain, rdtype, transport)
+                try:
+                    latency, response = await connection.query(wire, self.timeout)
+                except (OSError, TimeoutError, ValueError, EOFError):
+                    if not connection.handshakes:
+                        # 无法建立连接时其余查询都计为丢失
+                        for _, _, lost_weight in queries:
+                            samples.add_loss(weight=lost_weight)
+                        break
+                    samples.add_loss(weight=weight)
+                    continue
+                if (
+                    len(response) < 12
+                    or response[:2] != wire[:2]
+                    or not response[2] & 0x80
+                    or response[3] & 0x0F not in _OK_RCODES
+                ):
+                    samples.add_loss(weight=weight)
+                else:
+                    samples.add(latency, weight)
+        finally:
+            connection.close()
+        received = bool(samples.received)
+        return {
+            "latency": samples.median if received else INFINITY,
+            "status": STATUS_SUCCESS if received else STATUS_FAILED,
+            "handshake": connection.handshakes[0]
+            if connection.handshakes
+            else INFINITY,
+            "stats": samples.summary(),
+        }
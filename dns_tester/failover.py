@@ -0,0 +1,144 @@
+"""自动切换：根据滚动统计把最快的DNS服务器应用到网络适配器
+
+通过系统DNS后端（dns_tester.system_dns.SystemDnsBackend）读取和设置DNS，
+测试时可使用 FakeSystemBackend。
+"""
+
+import math
+import time
+
+# 默认参数（可在配置文件Main节中通过 failover_* 覆盖）
+DEFAULT_HYSTERESIS = 0.2  # failover_hysteresis：新服务器至少快20%才切换
+DEFAULT_MIN_GAIN = 5.0  # failover_min_gain：且至少快5毫秒
+DEFAULT_MIN_DWELL = 600.0  # failover_min_dwell：两次切换之间至少间隔（秒）
+DEFAULT_MAX_LOSS = 20.0  # failover_max_loss：丢包率超过该百分比的服务器不作为候选
+DEFAULT_MIN_RUNS = 3  # 至少有几次结果才参与比较
+
+
+class Decision:
+    """一次评估的结论"""
+
+    __slots__ = ("switched", "current", "target", "reason")
+
+    def __init__(self, switched, current, target, reason):
+        self.switched = switched
+        self.current = current  # 当前服务器名称，无法识别时为None
+        self.target = target  # 建议/已切换到的服务器名称
+        self.reason = reason
+
+    def __repr__(self):
+        return (
+            f"Decision(switched={self.switched}, current={self.current!r}, "
+            f"target={self.target!r}, reason={self.reason!r})"
+        )
+
+
+class FailoverPolicy:
+    """带滞回和最短驻留时间的自动切换策略
+
+    stats 为 {服务器名称: RollingStats}（见 dns_tester.monitor）。
+    最快的候选比当前服务器快 hysteresis 比例且至少 min_gain 毫秒，
+    并且距上次切换已过 min_dwell 秒时才切换；当前服务器不可达或丢包率
+    超过 max_loss 时立即切换，不受驻留时间限制。
+    """
+
+    def __init__(
+        self,
+        backend,
+        adapter,
+        hysteresis=DEFAULT_HYSTERESIS,
+        min_gain=DEFAULT_MIN_GAIN,
+        min_dwell=DEFAULT_MIN_DWELL,
+        max_loss=DEFAULT_MAX_LOSS,
+        min_runs=DEFAULT_MIN_RUNS,
+    ):
+        self.backend = backend
+        self.adapter = adapter
+        self.hysteresis = hysteresis
+        self.min_gain = min_gain
+        self.min_dwell = min_dwell
+        self.max_loss = max_loss
+        self.min_runs = min_runs
+        self.last_switch = None  # 上次切换的时间（time.monotonic）
+
+    @classmethod
+    def from_config(cls, backend, adapter, config):
+        """使用配置文件[Main]节中的 failover_* 参数创建，数值无效时抛出 ValueError"""
+        return cls(
+            backend,
+            adapter,
+            hysteresis=config.getfloat(
+                "Main", "failover_hysteresis", fallback=DEFAULT_HYSTERESIS
+            ),
+            min_gain=config.getfloat(
+                "Main", "failover_min_gain", fallback=DEFAULT_MIN_GAIN
+            ),
+            min_dwell=config.getfloat(
+                "Main", "failover_min_dwell", fallback=DEFAULT_MIN_DWELL
+            ),
+            max_loss=config.getfloat(
+                "Main", "failover_max_loss", fallback=DEFAULT_MAX_LOSS
+            ),
+        )
+
+    def _healthy(self, stats):
+        return (
+            stats is not None
+            and stats.runs >= self.min_runs
+            and stats.median != math.inf
+            and stats.loss <= self.max_loss
+        )
+
+    def best(self, servers, stats):
+        """最快的健康服务器名称，没有时返回None"""
+        candidates = [name for name in servers if self._healthy(stats.get(name))]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda name: (stats[name].median, stats[name].loss))
+
+    def current(self, servers):
+        """根据适配器当前的主DNS找出对应的服务器名称"""
+        addresses = self.backend.get_dns(self.adapter)
+        if not addresses:
+            return None
+        for name, server in servers.items():
+            if server["primary"] == addresses[0]:
+                return name
+        return None
+
+    def evaluate(self, servers, stats, now=None):
+        """评估一次，需要时通过后端切换DNS，返回 Decision
+
+        servers 为 {服务器名称: 服务器}。
+        """
+        now = time.monotonic() if now is None else now
+        best = self.best(servers, stats)
+        current = self.current(servers)
+        if best is None:
+            return Decision(False, current, None, "没有可用的候选服务器")
+        if best == current:
+            return Decision(False, current, best, "当前服务器已是最快")
+        current_stats = stats.get(current)
+        if current is not None and self._healthy(current_stats):
+            if self.last_switch is not None and now - self.last_switch < self.min_dwell:
+                return Decision(False, current, best, "未达到最短驻留时间")
+            gain = current_stats.median - stats[best].median
+            if gain < self.min_gain or stats[best].median > current_stats.median * (
+                1 - self.hysteresis
+            ):
+                return Decision(False, current, best, "提升不足，不切换")
+            reason = f"{best} 比 {current} 快 {gain:.1f} ms"
+        elif current is None:
+            reason = "当前DNS不在列表中"
+        else:
+            reason = f"{current} 不可用"
+        server = servers[best]
+        addresses = [server["primary"]]
+        if server["secondary"]:
+            addresses.append(server["secondary"])
+        try:
+            self.backend.set_dns(self.adapter, addresses)
+        except OSError as e:
+            return Decision(False, current, best, f"设置DNS失败: {e}（{reason}）")
+        self.last_switch = now
+        return Decision(True, current, best, reason)
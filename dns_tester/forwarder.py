@@ -0,0 +1,580 @@
+"""本地缓存DNS转发器
+
+在 127.0.0.1 上监听UDP和TCP查询，把缓存未命中的查询转发给当前排名最靠前的
+几个上游地址：race 模式同时发给所有上游、采用最先到达的有效应答，
+round_robin 模式轮流选择第一个上游、超时后依次换下一个。应答按TTL缓存
+（LRU淘汰），并统计缓存命中率和每个上游的延迟。
+
+上游列表由探测结果决定，调用 set_upstreams() 可随时替换（如持续监控每轮结束后）。
+"""
+
+import asyncio
+import secrets
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+
+import dns.exception
+import dns.message
+import dns.rcode
+import dns.rdatatype
+
+from .benchmark import rank_servers
+from .config import (
+    DEFAULT_FORWARDER_CACHE_SIZE,
+    DEFAULT_FORWARDER_MODE,
+    DEFAULT_FORWARDER_TIMEOUT,
+    DEFAULT_FORWARDER_UPSTREAMS,
+)
+from .probe import STATUS_SUCCESS, ResponseProtocol, packed_address
+from .stats import percentile
+
+MODE_RACE = "race"
+MODE_ROUND_ROBIN = "round_robin"
+
+MAX_CACHE_TTL = 86400  # 缓存时间上限（秒）
+UPSTREAM_WINDOW = 100  # 每个上游保留的最近延迟样本数
+_UNUSABLE_RCODES = (dns.rcode.SERVFAIL, dns.rcode.REFUSED)
+
+# 缓存键最后一字节中的查询标志
+EDNS_FLAG = 0x1
+DO_FLAG = 0x2
+CD_FLAG = 0x4
+
+
+def _question(wire):
+    """解析查询报文的问题段，返回 (缓存键, 问题段字节)；不是标准查询时返回 None
+
+    缓存键为小写的域名、查询类型和类别，加上 CD 位、是否带EDNS和 DO 位
+    （DNSSEC查询的应答带有RRSIG和OPT，不能用来回答普通查询，反之亦然）；
+    附加段不是单独一条OPT记录时不缓存，键为 None。问题段字节用于在缓存应答中
+    保留客户端域名的大小写（部分客户端会校验）。
+    """
+    # QR=0、OPCODE=QUERY，且只有一个问题
+    if len(wire) < 17 or wire[2] & 0xF8 or wire[4:6] != b"\x00\x01":
+        return None
+    offset = 12
+    while True:
+        length = wire[offset]
+        if length == 0:
+            offset += 1
+            break
+        if length & 0xC0:
+            return None
+        offset += 1 + length
+        if offset >= len(wire):
+            return None
+    end = offset + 4
+    if end > len(wire):
+        return None
+    question = wire[12:end]
+    additional = int.from_bytes(wire[10:12], "big")
+    if additional == 0:
+        flags = 0
+    elif (
+        additional == 1
+        and wire[6:10] == b"\x00\x00\x00\x00"
+        and wire[end : end + 3] == b"\x00\x00\x29"
+        and len(wire) >= end + 11
+    ):
+        # OPT记录：根域名、类型41、UDP大小、扩展RCODE、版本，随后两字节标志的最高位为DO
+        flags = EDNS_FLAG | (DO_FLAG if wire[end + 7] & 0x80 else 0)
+    else:
+        return None, question
+    if wire[3] & 0x10:
+        flags |= CD_FLAG
+    # 标签长度不超过63，bytes.lower() 只会改变域名中的字母
+    return wire[12:offset].lower() + wire[offset:end] + bytes([flags]), question
+
+
+def _udp_limit(wire, question_end):
+    """客户端可接收的UDP应答长度：有EDNS时为其声明的大小，否则为512"""
+    # OPT记录通常紧跟在问题段之后：根域名、类型41，类别字段即UDP大小
+    if (
+        wire[10:12] != b"\x00\x00"
+        and wire[question_end : question_end + 3] == b"\x00\x00\x29"
+    ):
+        return max(int.from_bytes(wire[question_end + 3 : question_end + 5]), 512)
+    return 512
+
+
+def _truncated(response, question_length):
+    """只保留头部和问题段，并设置TC位"""
+    return (
+        response[:2]
+        + bytes([response[2] | 0x02, response[3]])
+        + b"\x00\x01\x00\x00\x00\x00\x00\x00"
+        + response[12 : 12 + question_length]
+    )
+
+
+def servfail(query, question_length):
+    """根据查询生成SERVFAIL应答"""
+    return (
+        query[:2]
+        + bytes([0x80 | (query[2] & 0x79), 0x80 | dns.rcode.SERVFAIL])
+        + b"\x00\x01\x00\x00\x00\x00\x00\x00"
+        + query[12 : 12 + question_length]
+    )
+
+
+def _cache_ttl(message):
+    """应答的缓存时间（秒），不应缓存时返回0"""
+    rcode = message.rcode()
+    if rcode not in (dns.rcode.NOERROR, dns.rcode.NXDOMAIN):
+        return 0
+    if rcode == dns.rcode.NOERROR and message.answer:
+        return min(min(rrset.ttl for rrset in message.answer), MAX_CACHE_TTL)
+    # 否定应答（NXDOMAIN/NODATA）按SOA的TTL和MINIMUM缓存（RFC 2308）
+    for rrset in message.authority:
+        if rrset.rdtype == dns.rdatatype.SOA:
+            return min(rrset.ttl, rrset[0].minimum, MAX_CACHE_TTL)
+    return 0
+
+
+class AnswerCache:
+    """按TTL过期、LRU淘汰的应答缓存
+
+    条目保存解析后的应答和原始TTL，命中时按已缓存的时间递减TTL后重新编码。
+    """
+
+    def __init__(self, max_entries=DEFAULT_FORWARDER_CACHE_SIZE, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()  # 键 -> (过期时间, 缓存时间, 应答, 原始TTL列表)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """返回应答报文（事务ID和问题段需由调用方替换），未命中或已过期时返回 None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, stored, message, ttls = entry
+        now = self.clock()
+        if now >= expires:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        elapsed = int(now - stored)
+        for rrset, ttl in zip(_rrsets(message), ttls):
+            rrset.ttl = max(ttl - elapsed, 0)
+        return message.to_wire()
+
+    def put(self, key, response):
+        """缓存一条上游应答（报文），不可缓存的应答会被忽略"""
+        if self.max_entries <= 0 or response[2] & 0x02:  # TC位：不完整的应答
+            return
+        try:
+            message = dns.message.from_wire(response)
+        except dns.exception.DNSException:
+            return
+        ttl = _cache_ttl(message)
+        if ttl <= 0:
+            return
+        now = self.clock()
+        ttls = [rrset.ttl for rrset in _rrsets(message)]
+        self._entries[key] = (now + ttl, now, message, ttls)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+def _rrsets(message):
+    return [*message.answer, *message.authority, *message.additional]
+
+
+class UpstreamStats:
+    """单个上游地址的计数"""
+
+    __slots__ = ("queries", "answers", "wins", "failures", "latencies")
+
+    def __init__(self):
+        self.queries = 0  # 发出的查询数
+        self.answers = 0  # 收到的有效应答数
+        self.wins = 0  # 被采用的应答数（race 模式中最先到达）
+        self.failures = 0  # 超时或出错次数
+        self.latencies = deque(maxlen=UPSTREAM_WINDOW)
+
+    def summary(self):
+        """计数和最近延迟的中位数、P95（毫秒，没有样本时为 None）"""
+        values = sorted(self.latencies)
+        return {
+            "queries": self.queries,
+            "answers": self.answers,
+            "wins": self.wins,
+            "failures": self.failures,
+            "p50": round(percentile(values, 0.5), 2) if values else None,
+            "p95": round(percentile(values, 0.95), 2) if values else None,
+        }
+
+
+class ForwarderStats:
+    """转发器计数：查询数、缓存命中和每个上游的统计"""
+
+    def __init__(self):
+        self.queries = 0
+        self.hits = 0
+        self.failures = 0  # 所有上游都没有可用应答，返回了SERVFAIL
+        self.upstreams = {}  # 地址 -> UpstreamStats
+
+    @property
+    def hit_rate(self):
+        """缓存命中率（%）"""
+        return self.hits * 100 / self.queries if self.queries else 0.0
+
+    def upstream(self, address):
+        stats = self.upstreams.get(address)
+        if stats is None:
+            stats = self.upstreams[address] = UpstreamStats()
+        return stats
+
+    def summary(self):
+        return {
+            "queries": self.queries,
+            "hits": self.hits,
+            "hit_rate": round(self.hit_rate, 1),
+            "failures": self.failures,
+            "upstreams": {
+                address: stats.summary()
+                for address, stats in list(self.upstreams.items())
+            },
+        }
+
+
+class _ServerProtocol(asyncio.DatagramProtocol):
+    """UDP监听：每个查询交给转发器处理"""
+
+    def __init__(self, forwarder):
+        self.forwarder = forwarder
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.forwarder._spawn(self._answer(data, addr))
+
+    async def _answer(self, data, addr):
+        response = await self.forwarder.resolve(data, udp=True)
+        if response is not None and not self.transport.is_closing():
+            self.transport.sendto(response, addr)
+
+
+class Forwarder:
+    """本地缓存DNS转发器
+
+    upstreams 为按排名排列的上游地址，只使用前 top_k 个。start() 在后台线程中
+    运行事件循环并开始监听；也可以在已有的事件循环中 await serve()。
+    """
+
+    def __init__(
+        self,
+        upstreams=(),
+        top_k=DEFAULT_FORWARDER_UPSTREAMS,
+        mode=DEFAULT_FORWARDER_MODE,
+        timeout=DEFAULT_FORWARDER_TIMEOUT,
+        cache_size=DEFAULT_FORWARDER_CACHE_SIZE,
+    ):
+        self.top_k = top_k
+        self.mode = mode
+        self.timeout = timeout
+        self.cache = AnswerCache(cache_size)
+        self.stats = ForwarderStats()
+        self.upstreams = ()
+        self.set_upstreams(upstreams)
+        self._rotation = 0
+        self._pending = {}  # (上游地址, 事务ID) -> Future
+        self._transports = {}  # 地址族 -> 连接上游的UDP套接字
+        self._servers = []  # 监听的UDP传输和TCP服务器
+        self._tasks = set()
+        self._loop = None
+        self._thread = None
+
+    @classmethod
+    def from_settings(cls, settings, upstreams=()):
+        """根据 ForwarderSettings 创建"""
+        return cls(
+            upstreams,
+            top_k=settings.upstreams,
+            mode=settings.mode,
+            timeout=settings.timeout,
+            cache_size=settings.cache_size,
+        )
+
+    def set_upstreams(self, addresses):
+        """替换上游地址（按排名排列，可在任意线程调用）"""
+        self.upstreams = tuple(dict.fromkeys(a for a in addresses if a))[: self.top_k]
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def resolve(self, query, udp=False):
+        """处理一个查询报文，返回应答报文；无法解析的报文返回 None"""
+        parsed = _question(query)
+        if parsed is None:
+            return None
+        key, question = parsed
+        self.stats.queries += 1
+        response = self.cache.get(key) if key is not None else None
+        if response is not None:
+            self.stats.hits += 1
+        else:
+            response = await self._forward(query)
+            if response is None:
+                self.stats.failures += 1
+                return servfail(query, len(question))
+            if key is not None:
+                self.cache.put(key, response)
+        # 换回客户端的事务ID和问题段（域名大小写）
+        response = (
+            query[:2] + response[2:12] + question + response[12 + len(question) :]
+        )
+        if udp and len(response) > _udp_limit(query, 12 + len(question)):
+            return _truncated(response, len(question))
+        return response
+
+    async def _forward(self, query):
+        upstreams = self.upstreams
+        if not upstreams:
+            return None
+        if self.mode == MODE_ROUND_ROBIN:
+            return await self._round_robin(upstreams, query)
+        return await self._race(upstreams, query)
+
+    async def _round_robin(self, upstreams, query):
+        """轮流从不同的上游开始，超时或不可用时依次换下一个
+
+        所有上游共用 timeout：每个上游最多等待剩余时间在剩余上游间平均分配的一份，
+        前面的上游提前应答时省下的时间留给后面的，客户端最多等待 timeout
+        而不是 上游数×timeout。
+        """
+        start = self._rotation % len(upstreams)
+        self._rotation += 1
+        order = upstreams[start:] + upstreams[:start]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        fallback = None
+        for position, address in enumerate(order):
+            share = (deadline - loop.time()) / (len(order) - position)
+            response = await self._ask(address, query, timeout=share)
+            if response is None:
+                continue
+            if response[3] & 0x0F not in _UNUSABLE_RCODES:
+                self.stats.upstream(address).wins += 1
+                return response
+            fallback = response
+        return fallback
+
+    async def _race(self, upstreams, query):
+        """同时询问所有上游，采用最先到达的可用应答"""
+        tasks = [
+            asyncio.ensure_future(self._ask(address, query, tagged=True))
+            for address in upstreams
+        ]
+        fallback = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                address, response = await next_done
+                if response is None:
+                    continue
+                if response[3] & 0x0F not in _UNUSABLE_RCODES:
+                    self.stats.upstream(address).wins += 1
+                    return response
+                fallback = response
+            return fallback
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _ask(self, address, query, tagged=False, timeout=None):
+        """向一个上游发送查询（UDP，被截断时改用TCP），失败时返回 None
+
+        tagged 为 True 时返回 (上游地址, 应答)；timeout 默认为 self.timeout。
+        """
+        response = await self._ask_upstream(
+            address, query, self.timeout if timeout is None else timeout
+        )
+        return (address, response) if tagged else response
+
+    async def _ask_upstream(self, address, query, timeout):
+        stats = self.stats.upstream(address)
+        stats.queries += 1
+        started = time.perf_counter_ns()
+        try:
+            # UDP查询和截断后的TCP重试共用 timeout
+            async with asyncio.timeout(timeout):
+                response = await self._ask_udp(address, query)
+                if response[2] & 0x02:
+                    response = await self._ask_tcp(address, query)
+        except asyncio.CancelledError:
+            raise
+        except (OSError, TimeoutError, ValueError, asyncio.IncompleteReadError):
+            stats.failures += 1
+            return None
+        stats.answers += 1
+        stats.latencies.append((time.perf_counter_ns() - started) / 1_000_000)
+        return response
+
+    async def _upstream_transport(self, family):
+        transport = self._transports.get(family)
+        if transport is None:
+            loop = asyncio.get_running_loop()
+            local_addr = ("::", 0) if family == socket.AF_INET6 else ("0.0.0.0", 0)
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: ResponseProtocol(self._pending),
+                local_addr=local_addr,
+                family=family,
+            )
+            self._transports[family] = transport
+        return transport
+
+    async def _ask_udp(self, address, query):
+        family = socket.AF_INET6 if ":" in address else socket.AF_INET
+        transport = await self._upstream_transport(family)
+        packed = packed_address(address)
+        # 上游查询使用随机事务ID，降低缓存投毒的风险
+        while True:
+            query_id = secrets.randbits(16)
+            key = (packed, query_id)
+            if key not in self._pending:
+                break
+        waiter = asyncio.get_running_loop().create_future()
+        self._pending[key] = waiter
+        try:
+            transport.sendto(query_id.to_bytes(2, "big") + query[2:], (address, 53))
+            _, response = await asyncio.wait_for(waiter, self.timeout)
+        finally:
+            self._pending.pop(key, None)
+        if not response[2] & 0x80 or response[12:16] != query[12:16]:
+            raise ValueError("无效的DNS响应")
+        return response
+
+    async def _ask_tcp(self, address, query):
+        reader, writer = await asyncio.open_connection(address, 53)
+        try:
+            writer.write(len(query).to_bytes(2, "big") + query)
+            await writer.drain()
+            length = int.from_bytes(await reader.readexactly(2), "big")
+            response = await reader.readexactly(length)
+        finally:
+            writer.close()
+        if response[:2] != query[:2]:
+            raise ValueError("无效的DNS响应")
+        return response
+
+    async def _serve_tcp_client(self, reader, writer):
+        try:
+            while True:
+                length = int.from_bytes(await reader.readexactly(2), "big")
+                query = await reader.readexactly(length)
+                response = await self.resolve(query)
+                if response is None:
+                    break
+                writer.write(len(response).to_bytes(2, "big") + response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        """开始监听UDP和TCP（端口被占用或没有权限时抛出 OSError）"""
+        loop = asyncio.get_running_loop()
+        udp, _ = await loop.create_datagram_endpoint(
+            lambda: _ServerProtocol(self), local_addr=(host, port)
+        )
+        self._servers.append(udp)
+        try:
+            tcp = await asyncio.start_server(self._serve_tcp_client, host, port)
+        except OSError:
+            udp.close()
+            raise
+        self._servers.append(tcp)
+
+    def _close(self):
+        for server in self._servers:
+            server.close()
+        self._servers.clear()
+        for transport in self._transports.values():
+            transport.close()
+        self._transports.clear()
+        for task in list(self._tasks):
+            task.cancel()
+
+    def start(self, host, port):
+        """在后台线程中运行转发器，监听失败时抛出 OSError"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        started = threading.Event()
+        errors = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            self._loop = loop
+            try:
+                loop.run_until_complete(self.serve(host, port))
+            except OSError as e:
+                errors.append(e)
+                started.set()
+                loop.close()
+                return
+            started.set()
+            try:
+                loop.run_forever()
+            finally:
+                self._close()
+                loop.run_until_complete(asyncio.sleep(0))
+                loop.close()
+
+        self._thread = threading.Thread(target=run, name="dns-forwarder", daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            self._thread = None
+            raise errors[0]
+
+    def stop(self):
+        """停止后台线程中的转发器"""
+        loop = self._loop
+        if loop is not None and self._thread is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(timeout=2)
+        self._thread = None
+        self._loop = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+
+def ranked_upstreams(servers, results, ranking=None):
+    """按排名列出可用的上游地址（每个服务器的主DNS在前，备用DNS在后）
+
+    ranking 为按排名排列的服务器名称（如持续监控的滚动排名），
+    未指定时按 results 中的测试结果排名。
+    """
+    if ranking is None:
+        ordered = [
+            server
+            for server in rank_servers(servers, results)
+            if results.get(server["name"], {}).get("status") == STATUS_SUCCESS
+        ]
+    else:
+        by_name = {server["name"]: server for server in servers}
+        ordered = [by_name[name] for name in ranking if name in by_name]
+    addresses = []
+    for server in ordered:
+        result = results.get(server["name"], {})
+        for field in ("primary", "secondary"):
+            # 单独测试失败的地址不作为上游
+            if server[field] and result.get(f"{field}_status") == STATUS_SUCCESS:
+                addresses.append(server[field])
+    return addresses
@@ -0,0 +1,157 @@
+"""DNS测试结果历史记录（SQLite）"""
+
+import math
+import sqlite3
+import time
+from contextlib import closing
+
+from .config import DEFAULT_HISTORY_DAYS
+from .stats import percentile
+
+# 结果类型
+KIND_WARM = "warm"
+KIND_COLD = "cold"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    ts REAL NOT NULL,
+    server TEXT NOT NULL,
+    address TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    latency REAL,
+    p95 REAL,
+    loss REAL
+);
+CREATE INDEX IF NOT EXISTS results_server_ts ON results (server, ts);
+CREATE INDEX IF NOT EXISTS results_ts ON results (ts);
+"""
+
+
+def _finite(value):
+    """无穷大或非数值的延迟保存为NULL"""
+    if isinstance(value, (int, float)) and math.isfinite(value):
+        return float(value)
+    return None
+
+
+def _rows(timestamp, server, domain, kind, result):
+    """把一个服务器的测试结果转换为每个地址一行"""
+    stats = result.get("primary_stats", {})
+    yield (
+        timestamp,
+        server["name"],
+        server["primary"],
+        domain,
+        kind,
+        _finite(result.get("primary_latency")),
+        _finite(stats.get("p95")),
+        stats.get("loss"),
+    )
+    if server["secondary"] and "secondary_latency" in result:
+        stats = result.get("secondary_stats", {})
+        yield (
+            timestamp,
+            server["name"],
+            server["secondary"],
+            domain,
+            kind,
+            _finite(result.get("secondary_latency")),
+            _finite(stats.get("p95")),
+            stats.get("loss"),
+        )
+
+
+class HistoryStore:
+    """按 (服务器, 地址, 域名, 时间) 追加保存测试结果
+
+    每个地址每次测试保存一行（中位数延迟、P95、丢包率），超过保留天数的记录
+    在写入时自动清理。每次操作使用独立的连接，可以在任意线程中调用。
+    """
+
+    def __init__(self, path, retention_days=DEFAULT_HISTORY_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def record(self, servers, results, domain, cold_zone=None, timestamp=None):
+        """保存一次测试的结果，返回写入的行数
+
+        domain 为单域名测试的域名（域名集回放时为 "workload"），
+        cold_zone 不为空时同时保存 result["cold"] 中的冷缓存结果。
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        rows = []
+        for server in servers:
+            result = results.get(server["name"])
+            if not result:
+                continue
+            rows.extend(_rows(timestamp, server, domain, KIND_WARM, result))
+            if cold_zone and "cold" in result:
+                rows.extend(
+                    _rows(timestamp, server, cold_zone, KIND_COLD, result["cold"])
+                )
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            conn.execute(
+                "DELETE FROM results WHERE ts < ?",
+                (timestamp - self.retention_days * 86400,),
+            )
+        return len(rows)
+
+    def server_stats(self, since_hours=24, kind=KIND_WARM, now=None):
+        """统计最近 since_hours 小时内每个服务器的延迟
+
+        返回 {服务器: {"p50", "p95", "loss", "runs"}}，延迟按每次测试的中位数计算，
+        loss 为各次测试丢包率的平均值。
+        """
+        since = (time.time() if now is None else now) - since_hours * 3600
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "SELECT server, latency, loss FROM results "
+                "WHERE ts >= ? AND kind = ? ORDER BY server",
+                (since, kind),
+            )
+            return _summarize(cursor, lambda row: row[0])
+
+    def hourly_stats(self, server, since_hours=24 * 7, kind=KIND_WARM, now=None):
+        """按一天中的小时（本地时间0-23）统计某个服务器的延迟，用于发现高峰时段变慢
+
+        返回 {小时: {"p50", "p95", "loss", "runs"}}。
+        """
+        since = (time.time() if now is None else now) - since_hours * 3600
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "SELECT CAST(strftime('%H', ts, 'unixepoch', 'localtime') AS INTEGER), "
+                "latency, loss FROM results "
+                "WHERE server = ? AND ts >= ? AND kind = ? ORDER BY 1",
+                (server, since, kind),
+            )
+            return _summarize(cursor, lambda row: row[0])
+
+
+def _summarize(rows, key):
+    """把 (分组, 延迟, 丢包率) 行汇总为每组的统计"""
+    groups = {}
+    for row in rows:
+        latencies, losses = groups.setdefault(key(row), ([], []))
+        if row[1] is not None:
+            latencies.append(row[1])
+        if row[2] is not None:
+            losses.append(row[2])
+    summary = {}
+    for group, (latencies, losses) in groups.items():
+        latencies.sort()
+        summary[group] = {
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "loss": math.fsum(losses) / len(losses) if losses else 100.0,
+            "runs": max(len(latencies), len(losses)),
+        }
+    return summary
@@ -0,0 +1,183 @@
+"""从CSV/JSON/文本文件批量导入公共DNS服务器列表
+
+支持的格式：
+    CSV    public-dns.info 的 nameservers.csv（ip_address,name,as_org,country_code,...），
+           或任意包含 ip/ip_address/address 列的表格
+    JSON   地址字符串或对象的数组、{名称: 地址} 对象；.jsonl/.ndjson 为每行一个对象
+    文本   每行一个或两个地址，其余文字作为名称，# 之后为注释
+
+文件逐行读取（.json 除外），按地址去重；同名（或同一运营商）的地址两两配对为主/备用DNS。
+"""
+
+import csv
+import json
+import os
+
+from .addresses import Rejected, check_address
+from .servers import Server, ServerList
+
+# 表格和JSON对象中可能的列名，按优先级排列
+ADDRESS_KEYS = ("ip_address", "ip", "address", "nameserver", "server")
+NAME_KEYS = ("name", "provider", "as_org", "organization", "hostname")
+COUNTRY_KEYS = ("country_code", "country")
+
+
+class ImportResult:
+    """导入结果"""
+
+    __slots__ = ("servers", "duplicates", "rejected")
+
+    def __init__(self):
+        self.servers = ServerList()  # 新的服务器（不含已有的地址）
+        self.duplicates = 0  # 重复（或类别中已存在）的地址数
+        self.rejected = []  # Rejected 列表
+
+
+def _first(record, keys):
+    for key in keys:
+        value = record.get(key)
+        if value:
+            return str(value).strip()
+    return ""
+
+
+def _label(record):
+    """表格行或JSON对象 -> 服务器名称（可能为空）"""
+    name = _first(record, NAME_KEYS).rstrip(".")
+    country = _first(record, COUNTRY_KEYS).upper()
+    if name and country:
+        return f"{country} - {name}"
+    return name
+
+
+def _from_record(record):
+    if isinstance(record, str):
+        yield "", record.strip()
+        return
+    if not isinstance(record, dict):
+        return
+    address = _first(record, ADDRESS_KEYS)
+    if address:
+        yield _label(record), address
+
+
+def _read_csv(f):
+    reader = csv.DictReader(f)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    try:
+        for row in reader:
+            yield from _from_record(row)
+    except csv.Error as e:
+        raise ValueError(f"CSV格式错误: {e}") from e
+
+
+def _read_json(f):
+    data = json.load(f)
+    if isinstance(data, dict):
+        # {名称: "主,备用"} 或 {名称: [地址, ...]}
+        for name, value in data.items():
+            addresses = value.split(",") if isinstance(value, str) else value
+            if isinstance(addresses, list):
+                for address in addresses[:2]:
+                    yield name, str(address).strip()
+        return
+    if isinstance(data, list):
+        for record in data:
+            yield from _from_record(record)
+
+
+def _read_json_lines(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            try:
+                yield from _from_record(json.loads(line))
+            except json.JSONDecodeError:
+                yield "", line
+
+
+def _read_text(f):
+    for line in f:
+        line = line.split("#", 1)[0].replace(",", " ").strip()
+        if not line:
+            continue
+        addresses = []
+        words = []
+        for token in line.split():
+            (addresses if check_address(token)[0] else words).append(token)
+        if not addresses:
+            # 无效地址也要报告
+            yield "", words[0]
+            continue
+        name = " ".join(words)
+        for address in addresses[:2]:
+            yield name, address
+
+
+def read_resolver_file(path):
+    """逐条读取服务器列表文件，生成 (名称, 地址)；名称可能为空"""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding="utf-8-sig", errors="replace", newline="") as f:
+        if extension == ".csv":
+            yield from _read_csv(f)
+        elif extension == ".json":
+            yield from _read_json(f)
+        elif extension in (".jsonl", ".ndjson"):
+            yield from _read_json_lines(f)
+        else:
+            yield from _read_text(f)
+
+
+def _unique_name(name, names):
+    # 配置文件中名称是选项名，不能包含分隔符 = 和 :，也不能以注释符或 [ 开头
+    name = name.replace("=", "-").replace(":", "-").lstrip("#;[ ") or "DNS"
+    candidate = name
+    number = 2
+    while candidate in names:
+        candidate = f"{name} #{number}"
+        number += 1
+    names.add(candidate)
+    return candidate
+
+
+def build_servers(records, version, existing=()):
+    """把 (名称, 地址) 记录去重、校验并配对为服务器
+
+    version 为类别的IP版本（4或6）；existing 为类别中已有的服务器，
+    它们的地址视为重复，名称不会被占用。
+    """
+    result = ImportResult()
+    seen = set()
+    names = set()
+    for server in existing:
+        names.add(server["name"])
+        for address in (server["primary"], server["secondary"]):
+            parsed, _ = check_address(address) if address else (None, None)
+            if parsed is not None:
+                seen.add(parsed.address)
+    groups = {}  # 名称 -> 地址列表（保持首次出现的顺序）
+    for name, text in records:
+        if not text:
+            continue
+        parsed, reason = check_address(text, version)
+        if parsed is None:
+            result.rejected.append(Rejected(name or None, "address", text, reason))
+            continue
+        if parsed.address in seen:
+            result.duplicates += 1
+            continue
+        seen.add(parsed.address)
+        groups.setdefault(name or parsed.address, []).append(parsed.address)
+    for name, addresses in groups.items():
+        # 同名的地址两两配对
+        for i in range(0, len(addresses), 2):
+            primary = addresses[i]
+            secondary = addresses[i + 1] if i + 1 < len(addresses) else ""
+            result.servers.add(Server(_unique_name(name, names), primary, secondary))
+    return result
+
+
+def import_file(path, version, existing=()):
+    """读取服务器列表文件，返回 ImportResult（读取失败时抛出 OSError/ValueError）"""
+    return build_servers(read_resolver_file(path), version, existing)
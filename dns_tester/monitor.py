@@ -0,0 +1,316 @@
+"""持续监控：自适应调度的周期性探测"""
+
+import heapq
+import math
+import threading
+import time
+from collections import deque
+
+from .benchmark import record_results, run_benchmark
+from .config import DEFAULT_MONITOR_INTERVAL, DEFAULT_MONITOR_TOP_TIER
+from .probe import INFINITY, ranking_latency
+from .stats import percentile
+
+DEFAULT_WINDOW = 20  # 每个服务器保留的最近结果数
+
+
+class RollingStats:
+    """单个服务器最近 window 次探测的延迟，失败记为无穷大"""
+
+    __slots__ = ("latencies",)
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.latencies = deque(maxlen=window)
+
+    def add(self, latency):
+        self.latencies.append(latency)
+
+    @property
+    def runs(self):
+        return len(self.latencies)
+
+    @property
+    def loss(self):
+        """失败次数百分比"""
+        if not self.latencies:
+            return 100.0
+        lost = sum(1 for v in self.latencies if v == INFINITY)
+        return lost * 100 / len(self.latencies)
+
+    @property
+    def median(self):
+        """成功结果的中位数，全部失败时为无穷大"""
+        return percentile(sorted(v for v in self.latencies if v != INFINITY), 0.5)
+
+    @property
+    def jitter(self):
+        """成功结果的标准差"""
+        values = [v for v in self.latencies if v != INFINITY]
+        if len(values) < 2:
+            return 0.0
+        mean = math.fsum(values) / len(values)
+        return math.sqrt(math.fsum((v - mean) ** 2 for v in values) / len(values))
+
+    def is_dead(self, recent=3):
+        """最近 recent 次全部失败"""
+        if not self.latencies:
+            return False
+        tail = list(self.latencies)[-recent:]
+        return all(v == INFINITY for v in tail)
+
+    def is_unstable(self, jitter_ratio=0.5):
+        """有丢包，或抖动超过中位数的 jitter_ratio 倍"""
+        if self.is_dead():
+            return False
+        median = self.median
+        return self.loss > 0 or (
+            median != INFINITY and self.jitter > median * jitter_ratio
+        )
+
+
+class AdaptiveScheduler:
+    """按到期时间调度服务器的探测
+
+    不稳定的服务器以 min_interval 探测，第一梯队以 base_interval 探测，
+    其余稳定的服务器每次把间隔加倍直到 max_interval，不可达的直接使用 max_interval。
+    """
+
+    def __init__(
+        self,
+        base_interval=DEFAULT_MONITOR_INTERVAL,
+        min_interval=None,
+        max_interval=None,
+    ):
+        self.base_interval = base_interval
+        self.min_interval = min_interval or base_interval / 4
+        self.max_interval = max_interval or base_interval * 10
+        self._heap = []  # (到期时间, 名称)，过期条目在弹出时跳过
+        self._due = {}  # 名称 -> 到期时间
+        self._intervals = {}  # 名称 -> 当前间隔
+
+    def __contains__(self, name):
+        return name in self._due
+
+    def add(self, name, now):
+        """加入一个服务器，立即到期"""
+        if name not in self._due:
+            self._intervals[name] = self.base_interval
+            self._push(name, now)
+
+    def remove(self, name):
+        self._due.pop(name, None)
+        self._intervals.pop(name, None)
+
+    def _push(self, name, due):
+        self._due[name] = due
+        heapq.heappush(self._heap, (due, name))
+
+    def pop_due(self, now):
+        """取出所有已到期的服务器"""
+        names = []
+        while self._heap and self._heap[0][0] <= now:
+            due, name = heapq.heappop(self._heap)
+            if self._due.get(name) == due:
+                del self._due[name]
+                names.append(name)
+        return names
+
+    def next_due(self):
+        """最近的到期时间，没有服务器时返回None"""
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def interval(self, name):
+        return self._intervals.get(name, self.base_interval)
+
+    def defer(self, name, now):
+        """探测出错时按 min_interval 重新安排，间隔保持不变"""
+        self._push(name, now + self.min_interval)
+
+    def reschedule(self, name, now, stats, top_tier):
+        """根据滚动统计和是否处于第一梯队安排下一次探测，返回间隔"""
+        if stats.is_dead():
+            interval = self.max_interval
+        elif stats.is_unstable():
+            interval = self.min_interval
+        elif top_tier:
+            interval = self.base_interval
+        else:
+            interval = min(self.interval(name) * 2, self.max_interval)
+        self._intervals[name] = interval
+        self._push(name, now + interval)
+        return interval
+
+
+class Monitor:
+    """在后台周期性探测一组服务器
+
+    每轮只探测已到期的服务器，结果进入每个服务器的 RollingStats（最多保留
+    window 次），按滚动中位数排名。current_dns() 返回当前系统使用的DNS地址，
+    其对应的服务器跌出前 top_tier 名时调用一次 on_alert(message)，
+    回到第一梯队后才会再次提醒。on_update(results, ranking) 在每轮结束后调用。
+    policy 为 FailoverPolicy 时每轮结束后评估一次自动切换，结论传给 on_decision。
+    """
+
+    def __init__(
+        self,
+        servers,
+        settings,
+        corpus=None,
+        current_dns=None,
+        on_update=None,
+        on_alert=None,
+        interval=DEFAULT_MONITOR_INTERVAL,
+        top_tier=DEFAULT_MONITOR_TOP_TIER,
+        window=DEFAULT_WINDOW,
+        history=None,
+        policy=None,
+        on_decision=None,
+    ):
+        self.settings = settings
+        self.corpus = corpus
+        self.current_dns = current_dns
+        self.on_update = on_update
+        self.on_alert = on_alert
+        self.top_tier = top_tier
+        self.window = window
+        self.history = history
+        self.policy = policy
+        self.on_decision = on_decision
+        self.scheduler = AdaptiveScheduler(interval)
+        self.stats = {}
+        self.servers = {}
+        self._alerted = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.update_servers(servers)
+
+    def update_servers(self, servers, now=None):
+        """替换监控的服务器列表（如切换类别、添加或删除服务器），已有的滚动统计会保留"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.servers = {server["name"]: server for server in servers}
+            for name in list(self.stats):
+                if name not in self.servers:
+                    del self.stats[name]
+                    self.scheduler.remove(name)
+            for name in self.servers:
+                self.stats.setdefault(name, RollingStats(self.window))
+                self.scheduler.add(name, now)
+
+    def ranking(self):
+        """按滚动中位数排名的服务器名称（不可达的排在最后）"""
+        with self._lock:
+            return sorted(
+                (name for name, stats in self.stats.items() if stats.runs),
+                key=lambda name: (self.stats[name].median, self.stats[name].loss),
+            )
+
+    def run_once(self, now=None):
+        """探测所有到期的服务器，返回本轮的测试结果"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            due = [
+                self.servers[name]
+                for name in self.scheduler.pop_due(now)
+                if name in self.servers
+            ]
+        if not due:
+            return {}
+        try:
+            results = run_benchmark(due, self.settings, self.corpus)
+        except Exception:
+            # 已取出的服务器要重新安排，否则出错一次后就不再被探测
+            with self._lock:
+                for server in due:
+                    if server["name"] in self.servers:
+                        self.scheduler.defer(server["name"], now)
+            raise
+        if self.history is not None:
+            record_results(self.history, due, results, self.settings, self.corpus)
+        with self._lock:
+            for name, result in results.items():
+                if name in self.stats:
+                    self.stats[name].add(ranking_latency(result))
+        ranking = self.ranking()
+        top = set(ranking[: self.top_tier])
+        with self._lock:
+            for server in due:
+                name = server["name"]
+                if name in self.servers:
+                    self.scheduler.reschedule(name, now, self.stats[name], name in top)
+        if self.on_update:
+            self.on_update(results, ranking)
+        self._check_current(ranking)
+        self._evaluate_policy()
+        return results
+
+    def _evaluate_policy(self):
+        """评估自动切换策略"""
+        policy = self.policy
+        if policy is None:
+            return
+        with self._lock:
+            servers = dict(self.servers)
+            stats = dict(self.stats)
+        decision = policy.evaluate(servers, stats)
+        if self.on_decision:
+            self.on_decision(decision)
+
+    def _check_current(self, ranking):
+        """当前DNS跌出第一梯队时提醒"""
+        if not self.current_dns or not ranking:
+            return
+        addresses = {address for address in self.current_dns() if address}
+        with self._lock:
+            current = [
+                name
+                for name, server in self.servers.items()
+                if server["primary"] in addresses or server["secondary"] in addresses
+            ]
+        ranked = [name for name in current if name in ranking]
+        if not ranked:
+            return
+        name = min(ranked, key=ranking.index)
+        rank = ranking.index(name)
+        if rank < self.top_tier:
+            self._alerted = False
+        elif not self._alerted:
+            self._alerted = True
+            if self.on_alert:
+                self.on_alert(
+                    f"当前DNS {name} 已跌出前{self.top_tier}名（第{rank + 1}名），"
+                    f"当前最快: {ranking[0]}"
+                )
+
+    def run(self):
+        """循环探测直到 stop() 被调用"""
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                # 单次回调或探测出错不应结束整个监控
+                print(f"监控探测失败: {e}")
+            with self._lock:
+                next_due = self.scheduler.next_due()
+            delay = 1.0 if next_due is None else next_due - time.monotonic()
+            self._stop.wait(max(delay, 0.1))
+
+    def start(self):
+        """在后台线程中开始监控"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return bool(
+            self._thread and self._thread.is_alive() and not self._stop.is_set()
+        )
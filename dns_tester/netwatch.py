@@ -0,0 +1,218 @@
+"""网络变化通知：适配器、地址或DNS设置改变时回调，不轮询
+
+    Windows  WMI __InstanceModificationEvent（Win32_NetworkAdapterConfiguration）
+    Linux    rtnetlink（链路、地址、路由变化）和 inotify（resolv.conf 被改写或替换）
+
+回调在监视线程中以 callback(原因) 调用，一次变化可能触发多次回调，
+调用方应自行合并。
+"""
+
+import os
+import platform
+import select
+import socket
+import threading
+
+REASON_ADAPTER = "adapter"  # 适配器配置（地址、网关、DNS）改变
+REASON_LINK = "link"  # 链路、地址或路由改变
+REASON_RESOLV_CONF = "resolv_conf"  # resolv.conf 改变
+
+RESOLV_CONF = "/etc/resolv.conf"
+
+# WMI 事件查询；Win32_NetworkAdapterConfiguration 没有事件提供程序，
+# 由WMI服务按 WITHIN 间隔在服务端检测变化
+WMI_EVENT_QUERY = (
+    "SELECT * FROM __InstanceModificationEvent WITHIN 2 "
+    "WHERE TargetInstance ISA 'Win32_NetworkAdapterConfiguration'"
+)
+WMI_WAIT_MS = 1000  # NextEvent 的等待时间，用于及时响应 stop()
+WBEM_E_TIMED_OUT = -2147209215  # 0x80043001
+
+# rtnetlink 多播组
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
+RTMGRP_IPV6_ROUTE = 0x400
+
+# inotify
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+
+class ChangeWatcher:
+    """网络变化监视器接口"""
+
+    def __init__(self):
+        self.callback = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self, callback):
+        """开始在后台线程中监视，变化时调用 callback(原因)"""
+        self.callback = callback
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _notify(self, reason):
+        if self.callback is not None and not self._stop.is_set():
+            self.callback(reason)
+
+    def _run(self):
+        raise NotImplementedError
+
+
+class FakeChangeWatcher(ChangeWatcher):
+    """手动触发的监视器，用于测试"""
+
+    def start(self, callback):
+        self.callback = callback
+        self._stop.clear()
+
+    def fire(self, reason=REASON_ADAPTER):
+        self._notify(reason)
+
+
+class WmiChangeWatcher(ChangeWatcher):
+    """等待WMI的适配器配置修改事件（独立线程，不占用 WmiSession）"""
+
+    def _run(self):
+        import pythoncom
+        import pywintypes
+        import win32com.client
+
+        pythoncom.CoInitialize()
+        try:
+            wmi = win32com.client.GetObject("winmgmts:\\\\.\\root\\cimv2")
+            events = wmi.ExecNotificationQuery(WMI_EVENT_QUERY)
+            while not self._stop.is_set():
+                try:
+                    events.NextEvent(WMI_WAIT_MS)
+                except pywintypes.com_error as e:
+                    excepinfo = e.args[2] if len(e.args) > 2 else None
+                    scode = excepinfo[5] if excepinfo else e.args[0]
+                    if WBEM_E_TIMED_OUT in (scode, e.args[0]):
+                        continue
+                    raise
+                self._notify(REASON_ADAPTER)
+        except Exception as e:
+            print(f"网络变化监视已停止: {e}")
+        finally:
+            pythoncom.CoUninitialize()
+
+
+def _inotify_add_watches(paths):
+    """为 paths 所在的目录创建 inotify 监视，返回 (fd, 关心的文件名集合)"""
+    import ctypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+    names = set()
+    mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    for path in paths:
+        # resolv.conf 常被整体替换，监视所在目录而不是文件本身
+        directory, name = os.path.split(path)
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) >= 0:
+            names.add(os.fsencode(name))
+    return fd, names
+
+
+def _inotify_names(data):
+    """解析 inotify 事件，生成文件名"""
+    offset = 0
+    while offset + 16 <= len(data):
+        length = int.from_bytes(data[offset + 12 : offset + 16], "little")
+        yield data[offset + 16 : offset + 16 + length].rstrip(b"\0")
+        offset += 16 + length
+
+
+class LinuxChangeWatcher(ChangeWatcher):
+    """监听 rtnetlink 多播和 resolv.conf 所在目录的 inotify 事件"""
+
+    def __init__(self, resolv_conf=RESOLV_CONF):
+        super().__init__()
+        # 符号链接（如指向 systemd-resolved 的 stub-resolv.conf）两端都监视
+        self.paths = {os.path.abspath(resolv_conf), os.path.realpath(resolv_conf)}
+        self._wakeup = None
+
+    def stop(self):
+        super().stop()
+        # 监视线程可能正在退出并清空 _wakeup，先取到局部变量
+        waker = self._wakeup
+        if waker is not None:
+            try:
+                waker.send(b"\0")
+            except OSError:
+                # 已被监视线程关闭
+                pass
+
+    def _run(self):
+        netlink = None
+        inotify_fd = -1
+        wakeup, waker = socket.socketpair()
+        self._wakeup = waker
+        try:
+            try:
+                netlink = socket.socket(
+                    socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE
+                )
+                netlink.bind(
+                    (
+                        0,
+                        RTMGRP_LINK
+                        | RTMGRP_IPV4_IFADDR
+                        | RTMGRP_IPV4_ROUTE
+                        | RTMGRP_IPV6_IFADDR
+                        | RTMGRP_IPV6_ROUTE,
+                    )
+                )
+            except OSError as e:
+                print(f"无法监听netlink: {e}")
+                netlink = None
+            try:
+                inotify_fd, names = _inotify_add_watches(self.paths)
+            except (OSError, AttributeError) as e:
+                print(f"无法监视 resolv.conf: {e}")
+                names = set()
+            sources = [wakeup]
+            if netlink is not None:
+                sources.append(netlink)
+            if inotify_fd >= 0:
+                sources.append(inotify_fd)
+            while not self._stop.is_set():
+                ready, _, _ = select.select(sources, [], [])
+                if netlink is not None and netlink in ready:
+                    netlink.recv(65536)
+                    self._notify(REASON_LINK)
+                if inotify_fd >= 0 and inotify_fd in ready:
+                    data = os.read(inotify_fd, 65536)
+                    if names.intersection(_inotify_names(data)):
+                        self._notify(REASON_RESOLV_CONF)
+        finally:
+            self._wakeup = None
+            waker.close()
+            wakeup.close()
+            if netlink is not None:
+                netlink.close()
+            if inotify_fd >= 0:
+                os.close(inotify_fd)
+
+
+def make_change_watcher():
+    """当前系统的网络变化监视器，不支持时返回 None"""
+    system = platform.system()
+    if system == "Windows":
+        return WmiChangeWatcher()
+    if system == "Linux":
+        return LinuxChangeWatcher()
+    return None
@@ -0,0 +1,500 @@
+"""异步DNS探测引擎"""
+
+import asyncio
+import itertools
+import secrets
+import socket
+import time
+
+import dns.message
+import dns.rcode
+
+from .stats import LatencySamples
+
+# 探测状态
+STATUS_SUCCESS = "成功"
+STATUS_FAILED = "失败"
+
+INFINITY = float("inf")
+
+# Windows DNS客户端在主DNS无响应多久后查询备用DNS（毫秒）
+FAILOVER_DELAY_MS = 1000.0
+# 所有DNS都无响应时，客户端放弃解析前等待的总时间（毫秒）
+UNRESOLVED_PENALTY_MS = 10000.0
+
+# 视为解析器正常工作的响应码
+_OK_RCODES = (dns.rcode.NOERROR, dns.rcode.NXDOMAIN)
+
+# 冷缓存查询的随机标签长度（十六进制字符数）
+_NONCE_LENGTH = 12
+
+
+def pair_latency(
+    latency_primary, loss_primary, latency_secondary=None, loss_secondary=None
+):
+    """模拟Windows DNS客户端的主备切换，返回一对DNS的期望解析延迟（毫秒）
+
+    客户端先查询主DNS，FAILOVER_DELAY_MS 内没有响应再同时等待备用DNS，
+    先到的响应生效；两个都没有响应时计为 UNRESOLVED_PENALTY_MS。
+    loss_* 为丢包率（%）；没有可用地址时返回 INFINITY。
+    """
+    primary_ok = 1 - loss_primary / 100
+    if latency_secondary is None:
+        secondary_ok = 0.0
+    else:
+        secondary_ok = 1 - loss_secondary / 100
+    if primary_ok <= 0 and secondary_ok <= 0:
+        return INFINITY
+    # 主DNS无响应时的期望延迟
+    fallback = UNRESOLVED_PENALTY_MS
+    if secondary_ok > 0:
+        fallback = (
+            secondary_ok * (FAILOVER_DELAY_MS + latency_secondary)
+            + (1 - secondary_ok) * UNRESOLVED_PENALTY_MS
+        )
+    if primary_ok <= 0:
+        return fallback
+    # 主DNS响应慢于切换时间时，备用DNS的响应可能先到
+    answered = latency_primary
+    if secondary_ok > 0:
+        answered = min(latency_primary, FAILOVER_DELAY_MS + latency_secondary)
+    return primary_ok * answered + (1 - primary_ok) * fallback
+
+
+def _loss(status, stats):
+    if stats is not None:
+        return stats["loss"]
+    return 0.0 if status == STATUS_SUCCESS else 100.0
+
+
+def make_result(
+    latency_primary,
+    status_primary,
+    latency_secondary=None,
+    status_secondary=None,
+    primary_stats=None,
+    secondary_stats=None,
+):
+    """根据主备DNS的探测结果生成测试结果字典
+
+    latency_* 为各地址的中位数延迟，*_stats 为 LatencySamples.summary() 的统计；
+    没有备用DNS时 latency_secondary 为 None，结果中不包含 secondary_* 字段。
+    latency 为 pair_latency() 计算的这对DNS的期望解析延迟，用于排名。
+    """
+    has_secondary = latency_secondary is not None
+    expected = pair_latency(
+        latency_primary,
+        _loss(status_primary, primary_stats),
+        latency_secondary,
+        _loss(status_secondary, secondary_stats) if has_secondary else None,
+    )
+    result = {
+        "latency": round(expected, 2) if expected != INFINITY else "∞",
+        "status": STATUS_SUCCESS
+        if STATUS_SUCCESS in (status_primary, status_secondary)
+        else STATUS_FAILED,
+        "primary_latency": latency_primary,
+        "primary_status": status_primary,
+    }
+    if has_secondary:
+        result["secondary_latency"] = latency_secondary
+        result["secondary_status"] = status_secondary
+    if primary_stats is not None:
+        result["primary_stats"] = primary_stats
+    if secondary_stats is not None:
+        result["secondary_stats"] = secondary_stats
+    return result
+
+
+def ranking_latency(result):
+    """排名用的延迟：测试失败或未测试的排在最后"""
+    if not result or result.get("status") != STATUS_SUCCESS:
+        return INFINITY
+    return result["latency"]
+
+
+class ResponseProtocol(asyncio.DatagramProtocol):
+    """把收到的DNS响应按 (来源地址, 事务ID) 分发给等待中的查询
+
+    pending 为 {(packed_address(地址), 事务ID): Future}，收到响应时
+    Future 的结果为 (接收时间 perf_counter_ns, 响应报文)。
+    """
+
+    def __init__(self, pending):
+        self.pending = pending
+
+    def datagram_received(self, data, addr):
+        received_ns = time.perf_counter_ns()
+        if len(data) < 12:
+            return
+        key = (packed_address(addr[0]), data[0] << 8 | data[1])
+        waiter = self.pending.get(key)
+        if waiter is not None and not waiter.done():
+            waiter.set_result((received_ns, data))
+
+    def error_received(self, exc):
+        # 未连接的UDP套接字无法区分是哪个地址出错，交给超时处理
+        pass
+
+
+_packed_cache = {}
+
+
+def packed_address(address):
+    """返回地址的二进制形式，用于统一IPv6地址的不同写法"""
+    packed = _packed_cache.get(address)
+    if packed is None:
+        family = socket.AF_INET6 if ":" in address else socket.AF_INET
+        packed = socket.inet_pton(family, address.split("%", 1)[0])
+        _packed_cache[address] = packed
+    return packed
+
+
+class UdpProber:
+    """直接通过UDP发送预编码的DNS查询
+
+    查询报文只编码一次，每次探测仅替换事务ID；每个地址族共用一个
+    非阻塞UDP套接字，延迟只统计从发送到收到响应的时间。
+    nonce=True 时在域名前加一个每次都不同的随机标签，用于测量缓存未命中的延迟。
+    """
+
+    def __init__(self):
+        self._wire_cache = {}
+        self._transports = {}
+        self._pending = {}
+        self._ids = itertools.count(1)
+
+    def _query_wire(self, domain, rdtype, nonce=False):
+        """获取预编码的查询报文（不含事务ID）"""
+        key = (domain, rdtype, nonce)
+        body = self._wire_cache.get(key)
+        if body is None:
+            qname = f"{'0' * _NONCE_LENGTH}.{domain}" if nonce else domain
+            body = dns.message.make_query(qname, rdtype).to_wire()[2:]
+            self._wire_cache[key] = body
+        if nonce:
+            # 问题段从第10字节开始，首字节为标签长度，随后即随机标签
+            nonce_label = secrets.token_hex(_NONCE_LENGTH // 2).encode()
+            body = body[:11] + nonce_label + body[11 + _NONCE_LENGTH :]
+        return body
+
+    async def _transport(self, family):
+        """获取指定地址族的共享UDP套接字"""
+        transport = self._transports.get(family)
+        if transport is None:
+            loop = asyncio.get_running_loop()
+            local_addr = ("::", 0) if family == socket.AF_INET6 else ("0.0.0.0", 0)
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: ResponseProtocol(self._pending),
+                local_addr=local_addr,
+                family=family,
+            )
+            self._transports[family] = transport
+        return transport
+
+    async def query(self, address, domain, timeout, rdtype="A", nonce=False):
+        """发送一次查询，返回 (延迟毫秒, 响应码)；超时抛出 TimeoutError"""
+        family = socket.AF_INET6 if ":" in address else socket.AF_INET
+        transport = await self._transport(family)
+        body = self._query_wire(domain, rdtype, nonce)
+        query_id = next(self._ids) & 0xFFFF
+        key = (packed_address(address), query_id)
+        waiter = asyncio.get_running_loop().create_future()
+        self._pending[key] = waiter
+        try:
+            sent_ns = time.perf_counter_ns()
+            transport.sendto(query_id.to_bytes(2, "big") + body, (address, 53))
+            received_ns, data = await asyncio.wait_for(waiter, timeout)
+        finally:
+            self._pending.pop(key, None)
+        # 校验响应标志位和问题段，rcode位于第4字节低4位
+        if not data[2] & 0x80 or data[12 : len(body) + 2] != body[10:]:
+            raise ValueError("无效的DNS响应")
+        return (received_ns - sent_ns) / 1_000_000, data[3] & 0x0F
+
+    def close(self):
+        """关闭所有套接字"""
+        for transport in self._transports.values():
+            transport.close()
+        self._transports.clear()
+
+
+class DeadCache:
+    """预筛选时没有响应的地址，在 ttl 秒内的测试中直接视为不可达"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._expires = {}  # 地址 -> 过期时间（time.monotonic）
+
+    def __len__(self):
+        return len(self._expires)
+
+    def is_dead(self, address, now=None):
+        expires = self._expires.get(address)
+        if expires is None:
+            return False
+        if (time.monotonic() if now is None else now) >= expires:
+            self._expires.pop(address, None)
+            return False
+        return True
+
+    def mark_dead(self, address, now=None):
+        if self.ttl > 0:
+            now = time.monotonic() if now is None else now
+            self._expires[address] = now + self.ttl
+
+    def mark_alive(self, address):
+        self._expires.pop(address, None)
+
+    def clear(self):
+        self._expires.clear()
+
+
+def _samples_status(samples):
+    """根据样本计算 (中位数延迟, 状态)"""
+    if not samples.received:
+        return INFINITY, STATUS_FAILED
+    return samples.median, STATUS_SUCCESS
+
+
+class ProbeEngine:
+    """并发探测DNS服务器
+
+    所有主/备DNS的查询同时发出，由信号量限制同时进行的查询数量，
+    每个查询都有独立的超时时间，结果按完成顺序回调。
+    samples 大于1时每个地址采集多个样本，按中位数排名；
+    提供 workload 时改为逐条回放其中的加权查询，按加权中位数排名。
+    prescreen_timeout 大于0（且小于 timeout）时，先用该超时向每个地址发送一次查询，
+    没有响应的地址不再进行完整测试，并记入 dead_cache。
+    encrypted 为True时，配置了 doh/dot 的服务器还会通过加密传输测试，
+    结果保存在 result["doh"] / result["dot"] 中（见 dns_tester.encrypted）。
+    """
+
+    def __init__(
+        self,
+        max_in_flight=64,
+        timeout=3.0,
+        samples=1,
+        prescreen_timeout=0,
+        dead_cache=None,
+        encrypted=False,
+        ssl_context=None,
+    ):
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.samples = max(1, samples)
+        self.prescreen_timeout = prescreen_timeout
+        self.dead_cache = dead_cache
+        self.encrypted = encrypted  # 是否同时测试服务器配置的DoH/DoT
+        self.ssl_context = ssl_context
+
+    def _queries(self, domain):
+        """单域名测试的查询列表：同一域名重复 samples 次"""
+        return [(domain, "A", 1.0)] * self.samples
+
+    async def probe(self, prober, address, domain, semaphore, nonce=False, rdtype="A"):
+        """探测单个DNS地址，返回 (延迟毫秒, 状态)"""
+        async with semaphore:
+            try:
+                latency, rcode = await prober.query(
+                    address, domain, self.timeout, rdtype, nonce
+                )
+            except Exception:
+                return INFINITY, STATUS_FAILED
+        if rcode not in _OK_RCODES:
+            return INFINITY, STATUS_FAILED
+        return latency, STATUS_SUCCESS
+
+    async def screen(self, prober, address, query, semaphore):
+        """预筛选：用短超时发送一次查询，返回地址是否有响应"""
+        domain, rdtype, _ = query
+        async with semaphore:
+            try:
+                await prober.query(address, domain, self.prescreen_timeout, rdtype)
+                alive = True
+            except Exception:
+                alive = False
+        if self.dead_cache is not None:
+            if alive:
+                self.dead_cache.mark_alive(address)
+            else:
+                self.dead_cache.mark_dead(address)
+        return alive
+
+    def _start_screens(self, prober, servers, query, semaphore):
+        """为所有地址启动预筛选，返回 {地址: Future[是否有响应]}"""
+        if not 0 < self.prescreen_timeout < self.timeout:
+            return None
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        screens = {}
+        for server in servers:
+            for address in (server["primary"], server["secondary"]):
+                if not address or address in screens:
+                    continue
+                if self.dead_cache is not None and self.dead_cache.is_dead(
+                    address, now
+                ):
+                    screens[address] = loop.create_future()
+                    screens[address].set_result(False)
+                else:
+                    screens[address] = asyncio.ensure_future(
+                        self.screen(prober, address, query, semaphore)
+                    )
+        return screens
+
+    async def sample(
+        self, prober, address, queries, semaphore, nonce=False, screens=None
+    ):
+        """对单个DNS地址依次发送 queries 中的查询，返回 LatencySamples
+
+        每个查询单独计入成功或丢失，偶尔丢包不影响其余样本。预筛选没有响应的
+        地址视为不可达，所有查询直接计为丢失，避免占用多倍的超时时间。
+        """
+        samples = LatencySamples()
+        # 预筛选由多个探测共用，取消备用DNS的探测时不能取消它
+        if screens is not None and not await asyncio.shield(screens[address]):
+            for _, _, lost_weight in queries:
+                samples.add_loss(weight=lost_weight)
+            return samples
+        for domain, rdtype, weight in queries:
+            latency, status = await self.probe(
+                prober, address, domain, semaphore, nonce, rdtype
+            )
+            if status == STATUS_SUCCESS:
+                samples.add(latency, weight)
+            else:
+                samples.add_loss(weight=weight)
+        return samples
+
+    async def probe_server(
+        self, prober, server, queries, semaphore, cold_zone=None, screens=None
+    ):
+        """探测一个服务器，cold_zone 不为空时同时测量冷缓存延迟"""
+        extra = {}
+        if cold_zone:
+            extra["cold"] = self.probe_pair(
+                prober,
+                server,
+                self._queries(cold_zone),
+                semaphore,
+                nonce=True,
+                screens=screens,
+            )
+        if self.encrypted:
+            extra.update(self._encrypted_probes(server, queries, semaphore))
+        if not extra:
+            return server["name"], await self.probe_pair(
+                prober, server, queries, semaphore, screens=screens
+            )
+        result, *extra_results = await asyncio.gather(
+            self.probe_pair(prober, server, queries, semaphore, screens=screens),
+            *extra.values(),
+        )
+        result.update(zip(extra, extra_results))
+        return server["name"], result
+
+    def _encrypted_probes(self, server, queries, semaphore):
+        """服务器配置的每种加密传输的探测协程 {传输方式: 协程}"""
+        from .encrypted import (
+            TRANSPORTS,
+            EncryptedProber,
+            make_connection,
+            make_ssl_context,
+        )
+
+        if self.ssl_context is None:
+            self.ssl_context = make_ssl_context()
+        prober = EncryptedProber(self.timeout)
+
+        async def probe(transport, connection):
+            # 一个连接的所有查询依次进行，只占用一个并发名额
+            async with semaphore:
+                return await prober.run(connection, transport, queries)
+
+        probes = {}
+        for transport in TRANSPORTS:
+            connection = make_connection(transport, server, self.ssl_context)
+            if connection is not None:
+                probes[transport] = probe(transport, connection)
+        return probes
+
+    async def probe_pair(
+        self, prober, server, queries, semaphore, nonce=False, screens=None
+    ):
+        """同时探测一个服务器的主DNS和备用DNS"""
+        primary_task = asyncio.ensure_future(
+            self.sample(prober, server["primary"], queries, semaphore, nonce, screens)
+        )
+        secondary_task = None
+        if server["secondary"]:
+            secondary_task = asyncio.ensure_future(
+                self.sample(
+                    prober, server["secondary"], queries, semaphore, nonce, screens
+                )
+            )
+        primary_samples = await primary_task
+        latency_primary, status_primary = _samples_status(primary_samples)
+        if secondary_task is None:
+            return make_result(
+                latency_primary,
+                status_primary,
+                primary_stats=primary_samples.summary(),
+            )
+        secondary_samples = await secondary_task
+        latency_secondary, status_secondary = _samples_status(secondary_samples)
+        return make_result(
+            latency_primary,
+            status_primary,
+            latency_secondary,
+            status_secondary,
+            primary_samples.summary(),
+            secondary_samples.summary(),
+        )
+
+    async def sweep(
+        self, servers, domain, on_result=None, cold_zone=None, workload=None
+    ):
+        """并发探测所有服务器，每完成一个即调用 on_result(name, result)
+
+        cold_zone 不为空时，每个服务器额外查询该区域下的随机子域名，
+        冷缓存结果保存在 result["cold"] 中。
+        workload 为 [(域名, 类型, 权重), ...] 时用它代替 domain 进行回放测试。
+        """
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        prober = UdpProber()
+        queries = workload or self._queries(domain)
+        screens = self._start_screens(prober, servers, queries[0], semaphore)
+        tasks = [
+            self.probe_server(prober, server, queries, semaphore, cold_zone, screens)
+            for server in servers
+        ]
+        results = {}
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                name, result = await next_done
+                results[name] = result
+                if on_result:
+                    on_result(name, result)
+        finally:
+            if screens:
+                # 等待没有被使用的预筛选（如主DNS正常时的备用DNS）结束
+                await asyncio.gather(*screens.values(), return_exceptions=True)
+            prober.close()
+        return results
+
+    def run(self, servers, domain, on_result=None, cold_zone=None, workload=None):
+        """在当前线程中运行一次完整的探测"""
+        return asyncio.run(self.sweep(servers, domain, on_result, cold_zone, workload))
+
+    def probe_once(self, address, domain):
+        """同步探测单个DNS地址，返回 (延迟毫秒, 状态)"""
+
+        async def _probe():
+            prober = UdpProber()
+            try:
+                return await self.probe(prober, address, domain, asyncio.Semaphore())
+            finally:
+                prober.close()
+
+        return asyncio.run(_probe())
@@ -0,0 +1,129 @@
+"""DNS服务器记录和按名称建立索引的服务器集合"""
+
+
+class Server:
+    """一个DNS服务器（名称、主DNS、备用DNS，以及可选的DoH URL和DoT主机名）
+
+    支持 server["name"] 形式的访问，可以直接传给接受服务器字典的函数。
+    """
+
+    __slots__ = ("name", "primary", "secondary", "doh", "dot")
+
+    def __init__(self, name, primary, secondary="", doh="", dot=""):
+        self.name = name
+        self.primary = primary
+        self.secondary = secondary
+        self.doh = doh  # DNS-over-HTTPS URL，如 https://cloudflare-dns.com/dns-query
+        self.dot = dot  # DNS-over-TLS 主机名（可带 :端口），如 one.one.one.one
+
+    @classmethod
+    def from_dict(cls, data):
+        """从 {"name", "primary", "secondary", "doh", "dot"} 字典创建"""
+        return cls(
+            data["name"],
+            data["primary"],
+            data.get("secondary", ""),
+            data.get("doh", ""),
+            data.get("dot", ""),
+        )
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __repr__(self):
+        return f"Server({self.name!r}, {self.primary!r}, {self.secondary!r})"
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def config_value(self):
+        """配置文件中的值：primary[,secondary][,doh=URL][,dot=主机名]"""
+        parts = [self.primary]
+        if self.secondary or self.doh or self.dot:
+            parts.append(self.secondary)
+        if self.doh:
+            parts.append(f"doh={self.doh}")
+        if self.dot:
+            parts.append(f"dot={self.dot}")
+        return ",".join(parts)
+
+
+def as_server(server):
+    """把服务器字典转换为 Server，已经是 Server 时原样返回"""
+    return server if isinstance(server, Server) else Server.from_dict(server)
+
+
+class ServerList:
+    """保持顺序、按名称建立索引的服务器集合
+
+    名称唯一：添加同名服务器时原位替换。按位置访问和迭代与列表相同，
+    按名称查找为O(1)，批量删除/提取只遍历一次集合。
+    """
+
+    __slots__ = ("_servers", "_index")
+
+    def __init__(self, servers=()):
+        self._servers = []
+        self._index = {}  # 名称 -> 位置
+        for server in servers:
+            self.add(server)
+
+    def __len__(self):
+        return len(self._servers)
+
+    def __iter__(self):
+        return iter(self._servers)
+
+    def __getitem__(self, position):
+        return self._servers[position]
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __repr__(self):
+        return f"ServerList({self._servers!r})"
+
+    def get(self, name, default=None):
+        """按名称查找服务器"""
+        position = self._index.get(name)
+        return default if position is None else self._servers[position]
+
+    def names(self):
+        return list(self._index)
+
+    def add(self, server):
+        """添加服务器（接受 Server 或字典），同名时原位替换；返回添加的 Server"""
+        server = as_server(server)
+        position = self._index.get(server.name)
+        if position is None:
+            self._index[server.name] = len(self._servers)
+            self._servers.append(server)
+        else:
+            self._servers[position] = server
+        return server
+
+    def remove(self, names):
+        """删除指定名称的服务器，返回按原顺序排列的被删除的服务器"""
+        names = {name for name in names if name in self._index}
+        if not names:
+            return []
+        removed = []
+        kept = []
+        for server in self._servers:
+            (removed if server.name in names else kept).append(server)
+        self._servers = kept
+        self._reindex()
+        return removed
+
+    def sort(self, key, reverse=False):
+        """原地排序（稳定排序）"""
+        self._servers.sort(key=key, reverse=reverse)
+        self._reindex()
+
+    def _reindex(self):
+        self._index = {server.name: i for i, server in enumerate(self._servers)}
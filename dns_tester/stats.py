@@ -0,0 +1,115 @@
+"""延迟样本统计"""
+
+import math
+from array import array
+
+
+def percentile(sorted_values, fraction):
+    """对已排序的序列做线性插值求分位数"""
+    if not sorted_values:
+        return math.inf
+    position = (len(sorted_values) - 1) * fraction
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return sorted_values[lower]
+    weight = position - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+def weighted_percentile(pairs, fraction):
+    """对按值排序的 (值, 权重) 序列求加权分位数"""
+    if not pairs:
+        return math.inf
+    target = math.fsum(weight for _, weight in pairs) * fraction
+    cumulative = 0.0
+    for value, weight in pairs:
+        cumulative += weight
+        if cumulative >= target:
+            return value
+    return pairs[-1][0]
+
+
+class LatencySamples:
+    """单个DNS地址的延迟样本
+
+    成功样本及其权重存放在紧凑的 array('d') 中，丢失的样本只累计权重。
+    所有权重相同（单域名多次采样）时按普通分位数计算，否则按加权分位数计算。
+    """
+
+    __slots__ = ("samples", "weights", "sent", "lost_weight")
+
+    def __init__(self):
+        self.samples = array("d")
+        self.weights = array("d")
+        self.sent = 0
+        self.lost_weight = 0.0
+
+    def add(self, latency, weight=1.0):
+        """记录一次成功的样本（毫秒）"""
+        self.sent += 1
+        self.samples.append(latency)
+        self.weights.append(weight)
+
+    def add_loss(self, count=1, weight=1.0):
+        """记录丢失（超时或错误）的样本"""
+        self.sent += count
+        self.lost_weight += weight * count
+
+    @property
+    def received(self):
+        return len(self.samples)
+
+    @property
+    def loss(self):
+        """丢包率（按权重计算的百分比）"""
+        total = math.fsum(self.weights) + self.lost_weight
+        if not self.sent or not total:
+            return 100.0
+        return self.lost_weight * 100 / total
+
+    def _is_weighted(self):
+        return bool(self.weights) and min(self.weights) != max(self.weights)
+
+    @property
+    def median(self):
+        if self._is_weighted():
+            return weighted_percentile(sorted(zip(self.samples, self.weights)), 0.5)
+        return percentile(sorted(self.samples), 0.5)
+
+    def summary(self):
+        """返回 min/p50/p95/mean/stddev/loss 统计"""
+        if not self.samples:
+            return {
+                "min": math.inf,
+                "p50": math.inf,
+                "p95": math.inf,
+                "mean": math.inf,
+                "stddev": 0.0,
+                "loss": self.loss,
+                "samples": self.sent,
+            }
+        total_weight = math.fsum(self.weights)
+        mean = math.fsum(v * w for v, w in zip(self.samples, self.weights))
+        mean /= total_weight
+        variance = math.fsum(
+            w * (v - mean) ** 2 for v, w in zip(self.samples, self.weights)
+        )
+        variance /= total_weight
+        if self._is_weighted():
+            pairs = sorted(zip(self.samples, self.weights))
+            p50 = weighted_percentile(pairs, 0.5)
+            p95 = weighted_percentile(pairs, 0.95)
+        else:
+            values = sorted(self.samples)
+            p50 = percentile(values, 0.5)
+            p95 = percentile(values, 0.95)
+        return {
+            "min": min(self.samples),
+            "p50": p50,
+            "p95": p95,
+            "mean": mean,
+            "stddev": math.sqrt(variance),
+            "loss": self.loss,
+            "samples": self.sent,
+        }
@@ -0,0 +1,458 @@
+"""系统DNS配置后端：列出适配器、读取/设置DNS、清理缓存、恢复自动获取
+
+    Windows  WMI（Win32_NetworkAdapterConfiguration.SetDNSServerSearchOrder、
+             MSFT_DNSClientCache.ClearCache），在 WmiSession 工作线程中执行
+    Linux    systemd-resolved 运行时使用 resolvectl，否则直接改写 /etc/resolv.conf；
+             适配器信息来自 iproute2（ip -j）
+
+后端的方法都会阻塞，界面中应在后台线程调用。修改DNS通常需要管理员/root权限。
+"""
+
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+
+from .adapters import current_dns, wmi_adapters
+from .config import replace_file
+from .wmi_session import NAMESPACE_CIMV2, NAMESPACE_STANDARD_CIMV2, WmiSession
+
+RESOLV_CONF = "/etc/resolv.conf"
+RESOLV_CONF_BACKUP_SUFFIX = ".dns-tester"  # 第一次改写前保存的原始 resolv.conf
+RESOLVED_RUN_DIR = "/run/systemd/resolve"  # systemd-resolved 运行时存在
+COMMAND_TIMEOUT = 10.0  # 外部命令超时时间（秒）
+
+
+class SystemDnsBackend:
+    """系统DNS配置后端接口
+
+    AdapterSnapshot 通过 list_adapters() 读取适配器信息，
+    FailoverPolicy 通过 get_dns()/set_dns() 读取和切换DNS。
+    """
+
+    name = ""
+    supported = True  # 是否可以修改DNS设置
+
+    def list_adapters(self):
+        """返回启用的网络适配器信息列表（见 dns_tester.adapters），失败时抛出异常"""
+        raise NotImplementedError
+
+    def get_dns(self, adapter):
+        """返回适配器当前的DNS地址列表"""
+        return current_dns(self.list_adapters(), adapter)
+
+    def set_dns(self, adapter, servers):
+        """把适配器的DNS设置为 servers（按顺序）并返回True，失败时抛出 OSError"""
+        raise NotImplementedError
+
+    def reset_dns(self, adapter):
+        """恢复适配器的DNS为自动获取（DHCP/网络管理器提供）并返回True，失败时抛出 OSError"""
+        raise NotImplementedError
+
+    def flush_cache(self):
+        """清理系统DNS缓存并返回True，系统没有DNS缓存时返回False，失败时抛出 OSError"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放后端占用的资源（如WMI工作线程）"""
+
+
+class FakeSystemBackend(SystemDnsBackend):
+    """保存在内存中的后端，用于在任意系统上测试快照缓存和切换策略"""
+
+    name = "fake"
+
+    def __init__(self, adapters=None):
+        self.adapters = [dict(adapter) for adapter in adapters or []]
+        self.queries = 0  # list_adapters 被调用的次数
+        self.calls = []  # 每次 set_dns 的 (适配器, 地址列表)
+        self.fail = False  # 为True时查询和修改都抛出 OSError
+        self.flushed = 0  # flush_cache 被调用的次数
+
+    @classmethod
+    def with_dns(cls, dns):
+        """按 {适配器名称: DNS地址列表} 创建只有DNS信息的适配器"""
+        return cls(
+            {
+                "name": name,
+                "index": index,
+                "mac": "",
+                "ipv4_addresses": [],
+                "ipv6_addresses": [],
+                "ipv4_gateways": [],
+                "ipv6_gateways": [],
+                "dns_servers": list(servers),
+                "dhcp_enabled": False,
+            }
+            for index, (name, servers) in enumerate(dns.items())
+        )
+
+    def list_adapters(self):
+        self.queries += 1
+        if self.fail:
+            raise OSError("模拟的查询失败")
+        return [dict(adapter) for adapter in self.adapters]
+
+    def get_dns(self, adapter):
+        for item in self.adapters:
+            if item["name"] == adapter:
+                return list(item["dns_servers"])
+        return []
+
+    def _adapter(self, adapter):
+        if self.fail:
+            raise OSError("模拟的修改失败")
+        for item in self.adapters:
+            if item["name"] == adapter:
+                return item
+        raise OSError(f"未找到网络适配器: {adapter}")
+
+    def set_dns(self, adapter, servers):
+        self.calls.append((adapter, list(servers)))
+        item = self._adapter(adapter)
+        item["dns_servers"] = list(servers)
+        item["dhcp_enabled"] = False
+        return True
+
+    def reset_dns(self, adapter):
+        item = self._adapter(adapter)
+        item["dns_servers"] = []
+        item["dhcp_enabled"] = True
+        return True
+
+    def flush_cache(self):
+        self.flushed += 1
+        if self.fail:
+            raise OSError("模拟的清理失败")
+        return True
+
+
+class UnsupportedBackend(SystemDnsBackend):
+    """不支持的系统：没有适配器，所有修改都失败"""
+
+    name = "unsupported"
+    supported = False
+
+    def list_adapters(self):
+        return []
+
+    def set_dns(self, adapter, servers):
+        raise OSError(f"不支持在 {platform.system()} 上设置DNS")
+
+    def reset_dns(self, adapter):
+        return self.set_dns(adapter, [])
+
+    def flush_cache(self):
+        return False
+
+
+class WmiSystemBackend(SystemDnsBackend):
+    """Windows：通过WMI读取和修改适配器配置"""
+
+    name = "wmi"
+
+    def __init__(self, session=None):
+        self.session = session or WmiSession()
+
+    def list_adapters(self):
+        try:
+            return self.session.call(
+                lambda session: wmi_adapters(session.namespace(NAMESPACE_CIMV2))
+            )
+        except ImportError:
+            # 非Windows系统（没有pywin32）
+            return []
+
+    def set_dns(self, adapter, servers):
+        return self._modify(_wmi_set_dns, adapter, list(servers), False)
+
+    def reset_dns(self, adapter):
+        return self._modify(_wmi_set_dns, adapter, None, True)
+
+    def flush_cache(self):
+        return self._modify(_wmi_flush_cache)
+
+    def _modify(self, func, *args):
+        """在WMI工作线程中执行修改，COM错误和缺少pywin32都转换为 OSError"""
+        try:
+            return self.session.call(func, *args)
+        except OSError:
+            raise
+        except Exception as e:
+            raise OSError(f"WMI调用失败: {e}") from e
+
+    def close(self):
+        self.session.stop()
+
+
+def _wmi_flush_cache(session):
+    # 网络客户端命名空间中的DNS客户端缓存对象
+    wmi = session.namespace(NAMESPACE_STANDARD_CIMV2)
+    dns_clients = wmi.ExecQuery("SELECT * FROM MSFT_DNSClientCache")
+    cleared = False
+    for client in dns_clients:
+        result = client.ClearCache()
+        # 检查结果 (0表示成功)
+        if result != 0:
+            raise OSError(f"WMI执行失败，错误代码: {result}")
+        cleared = True
+    return cleared
+
+
+def _wmi_set_dns(session, adapter_name, dns_servers, enable_dhcp):
+    """在WMI工作线程中设置DNS服务器（enable_dhcp 为True时恢复自动获取）"""
+    wmi = session.namespace(NAMESPACE_CIMV2)
+    configs = wmi.ExecQuery(
+        "SELECT * FROM Win32_NetworkAdapterConfiguration WHERE IPEnabled = True"
+    )
+    # 网络适配器的名称用于匹配配置
+    adapters = wmi.ExecQuery(
+        "SELECT * FROM Win32_NetworkAdapter WHERE NetEnabled = True"
+    )
+    adapter_map = {
+        str(adapter.DeviceID): (adapter.NetConnectionID or "", adapter.Name or "")
+        for adapter in adapters
+    }
+    target_config = None
+    for config in configs:
+        # 优先匹配NetConnectionID（友好名称），然后匹配Name
+        friendly_name, full_name = adapter_map.get(str(config.Index), ("", ""))
+        if (
+            friendly_name == adapter_name
+            or full_name == adapter_name
+            or adapter_name in friendly_name
+            or adapter_name in full_name
+        ):
+            target_config = config
+            break
+    if target_config is None:
+        raise OSError(f"未找到网络适配器: {adapter_name}")
+    if not enable_dhcp and not dns_servers:
+        raise OSError("DNS服务器列表为空")
+
+    # DNSServerSearchOrder 为空时恢复自动获取
+    params = target_config.Methods_(
+        "SetDNSServerSearchOrder"
+    ).InParameters.SpawnInstance_()
+    params.DNSServerSearchOrder = None if enable_dhcp else list(dns_servers)
+    result = target_config.ExecMethod_("SetDNSServerSearchOrder", params)
+    error_code = result.Properties_("ReturnValue").Value
+    # 0 表示成功，1 表示成功但需要重启
+    if error_code not in (0, 1):
+        action = "DHCP DNS" if enable_dhcp else "静态DNS"
+        raise OSError(f"WMI设置{action}失败，错误代码: {error_code}")
+    return True
+
+
+def _run(args):
+    """运行外部命令，返回 CompletedProcess；命令不存在或超时时抛出 OSError"""
+    try:
+        return subprocess.run(
+            args,
+            capture_output=True,
+            text=True,
+            timeout=COMMAND_TIMEOUT,
+            check=False,
+        )
+    except subprocess.TimeoutExpired as e:
+        raise OSError(f"{args[0]} 超时") from e
+
+
+def _run_ok(args):
+    """运行修改系统设置的命令，成功返回True，失败时抛出带命令输出的 OSError"""
+    try:
+        completed = _run(args)
+    except OSError as e:
+        raise OSError(f"执行 {' '.join(args)} 失败: {e}") from e
+    if completed.returncode != 0:
+        raise OSError(f"执行 {' '.join(args)} 失败: {completed.stderr.strip()}")
+    return True
+
+
+def _ip_json(*args):
+    completed = _run(["ip", "-j", *args])
+    if completed.returncode != 0:
+        raise OSError(completed.stderr.strip() or "ip 命令失败")
+    return json.loads(completed.stdout or "[]")
+
+
+def linux_adapters(dns_for):
+    """用 iproute2 列出已启用的非回环网络接口
+
+    dns_for(接口名) 返回该接口的DNS地址列表。网关取默认路由，
+    有动态（DHCP/SLAAC）地址的接口视为自动获取。
+    """
+    gateways = {}
+    for family in ("-4", "-6"):
+        for route in _ip_json(family, "route", "show", "default"):
+            if route.get("gateway") and route.get("dev"):
+                gateways.setdefault(route["dev"], []).append(route["gateway"])
+    adapters = []
+    for link in _ip_json("addr", "show", "up"):
+        flags = link.get("flags", [])
+        if "LOOPBACK" in flags or "UP" not in flags:
+            continue
+        name = link["ifname"]
+        addr_info = link.get("addr_info", [])
+        link_gateways = gateways.get(name, [])
+        adapters.append(
+            {
+                "name": name,
+                "index": link.get("ifindex"),
+                "mac": link.get("address", ""),
+                "ipv4_addresses": [
+                    a["local"] for a in addr_info if a.get("family") == "inet"
+                ],
+                "ipv6_addresses": [
+                    a["local"] for a in addr_info if a.get("family") == "inet6"
+                ],
+                "ipv4_gateways": [g for g in link_gateways if ":" not in g],
+                "ipv6_gateways": [g for g in link_gateways if ":" in g],
+                "dns_servers": dns_for(name),
+                "dhcp_enabled": any(a.get("dynamic") for a in addr_info),
+            }
+        )
+    return adapters
+
+
+def read_resolv_conf(path=RESOLV_CONF):
+    """读取 resolv.conf 中的 nameserver 地址"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [
+                line.split()[1]
+                for line in f
+                if line.startswith("nameserver") and len(line.split()) > 1
+            ]
+    except OSError:
+        return []
+
+
+# resolvectl dns 的输出："Global: 1.1.1.1" 和 "Link 2 (eth0): 192.168.1.1 fe80::1%eth0"
+_RESOLVECTL_LINE = re.compile(
+    r"^(?:Link \d+ \((?P<link>[^)]+)\)|Global):(?P<servers>.*)$"
+)
+
+
+def parse_resolvectl_dns(text):
+    """解析 resolvectl dns 的输出，返回 (全局DNS列表, {接口名: DNS列表})"""
+    global_servers = []
+    links = {}
+    for line in text.splitlines():
+        match = _RESOLVECTL_LINE.match(line.strip())
+        if not match:
+            continue
+        # 去掉 DoT 服务器名（#name）
+        servers = [token.split("#", 1)[0] for token in match["servers"].split()]
+        if match["link"] is None:
+            global_servers = servers
+        else:
+            links[match["link"]] = servers
+    return global_servers, links
+
+
+class ResolvectlBackend(SystemDnsBackend):
+    """Linux（systemd-resolved）：通过 resolvectl 设置每个接口的DNS
+
+    resolvectl 的设置只在运行时有效，网络管理器重新配置接口或重启后会被覆盖。
+    """
+
+    name = "resolvectl"
+
+    def list_adapters(self):
+        completed = _run(["resolvectl", "dns"])
+        global_servers, links = parse_resolvectl_dns(completed.stdout)
+        return linux_adapters(lambda name: links.get(name) or list(global_servers))
+
+    def set_dns(self, adapter, servers):
+        return _run_ok(["resolvectl", "dns", adapter, *servers])
+
+    def reset_dns(self, adapter):
+        return _run_ok(["resolvectl", "revert", adapter])
+
+    def flush_cache(self):
+        return _run_ok(["resolvectl", "flush-caches"])
+
+
+class ResolvConfBackend(SystemDnsBackend):
+    """Linux（没有 systemd-resolved）：直接改写 resolv.conf
+
+    resolv.conf 对所有接口生效，因此每个适配器的DNS相同。第一次改写前
+    把原文件保存为 resolv.conf.dns-tester，恢复自动获取时再换回来。
+    """
+
+    name = "resolv.conf"
+
+    def __init__(self, path=RESOLV_CONF):
+        self.path = path
+
+    @property
+    def backup_path(self):
+        return self.path + RESOLV_CONF_BACKUP_SUFFIX
+
+    def list_adapters(self):
+        servers = read_resolv_conf(self.path)
+        return linux_adapters(lambda name: list(servers))
+
+    def set_dns(self, adapter, servers):
+        # 符号链接（如由网络管理器生成）时改写链接指向的文件
+        path = os.path.realpath(self.path)
+        try:
+            with open(path, encoding="utf-8") as f:
+                original = f.read()
+        except FileNotFoundError:
+            original = ""
+        except OSError as e:
+            raise OSError(f"读取 {self.path} 失败: {e}") from e
+        # 保留 search/options 等其他行，nameserver 写在原来第一个 nameserver 的位置
+        lines = []
+        inserted = False
+        for line in original.splitlines():
+            if line.startswith("nameserver"):
+                if not inserted:
+                    lines.extend(f"nameserver {server}" for server in servers)
+                    inserted = True
+                continue
+            lines.append(line)
+        if not inserted:
+            lines.extend(f"nameserver {server}" for server in servers)
+        try:
+            if not os.path.exists(self.backup_path):
+                replace_file(self.backup_path, original, mode_from=path)
+            replace_file(path, "\n".join(lines) + "\n")
+        except OSError as e:
+            raise OSError(f"写入 {self.path} 失败: {e}") from e
+        return True
+
+    def reset_dns(self, adapter):
+        if not os.path.exists(self.backup_path):
+            raise OSError(f"没有可恢复的 {self.path} 备份")
+        try:
+            with open(self.backup_path, encoding="utf-8") as f:
+                original = f.read()
+            # 写回内容而不是把备份改名过去，保留 resolv.conf 现有的权限
+            replace_file(os.path.realpath(self.path), original)
+            os.remove(self.backup_path)
+        except OSError as e:
+            raise OSError(f"恢复 {self.path} 失败: {e}") from e
+        return True
+
+    def flush_cache(self):
+        # glibc 解析器本身没有缓存，只有运行了 nscd 时才需要清理
+        if shutil.which("nscd"):
+            return _run_ok(["nscd", "--invalidate=hosts"])
+        return False
+
+
+def make_system_backend(session=None):
+    """当前系统的DNS配置后端"""
+    system = platform.system()
+    if system == "Windows":
+        return WmiSystemBackend(session)
+    if system == "Linux":
+        if shutil.which("resolvectl") and os.path.isdir(RESOLVED_RUN_DIR):
+            return ResolvectlBackend()
+        return ResolvConfBackend()
+    return UnsupportedBackend()
@@ -0,0 +1,103 @@
+"""长期运行的WMI工作线程
+
+COM只在工作线程中初始化一次，到 root\\cimv2 和 root\\StandardCimv2 的连接
+在首次使用时建立并一直保留。其他线程通过 submit() 提交操作，得到
+concurrent.futures.Future；操作在工作线程中按提交顺序依次执行。
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+
+NAMESPACE_CIMV2 = "root\\cimv2"
+NAMESPACE_STANDARD_CIMV2 = "root\\StandardCimv2"
+
+
+class WmiSession:
+    """在专用线程中执行WMI操作
+
+    提交的函数以 (session, *args) 调用，在其中通过 session.namespace(名称)
+    取得已连接的命名空间。函数抛出异常时丢弃已有的连接，下次重新连接。
+    """
+
+    def __init__(self, name="wmi-session"):
+        self.name = name
+        self._queue = queue.Queue()
+        self._namespaces = {}  # 命名空间名称 -> SWbemServices（只在工作线程中访问）
+        self._locator = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, func, *args):
+        """提交一个操作，返回 Future"""
+        future = Future()
+        self._ensure_thread()
+        self._queue.put((future, func, args))
+        return future
+
+    def call(self, func, *args, timeout=None):
+        """提交一个操作并等待结果"""
+        return self.submit(func, *args).result(timeout)
+
+    def stop(self):
+        """处理完已提交的操作后结束工作线程"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+
+    def namespace(self, name=NAMESPACE_CIMV2):
+        """已连接的WMI命名空间（只能在提交的函数中调用）"""
+        services = self._namespaces.get(name)
+        if services is None:
+            if self._locator is None:
+                import win32com.client
+
+                self._locator = win32com.client.Dispatch("WbemScripting.SWbemLocator")
+            services = self._locator.ConnectServer(".", name)
+            self._namespaces[name] = services
+        return services
+
+    def _run(self):
+        try:
+            import pythoncom
+        except ImportError as e:
+            pythoncom = None
+            init_error = e
+        else:
+            pythoncom.CoInitialize()
+            init_error = None
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                future, func, args = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if init_error is not None:
+                    future.set_exception(init_error)
+                    continue
+                try:
+                    result = func(self, *args)
+                except BaseException as e:
+                    # 连接可能已经失效（如WMI服务重启），下次重新连接
+                    self._namespaces.clear()
+                    self._locator = None
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+        finally:
+            self._namespaces.clear()
+            self._locator = None
+            if pythoncom is not None:
+                pythoncom.CoUninitialize()
@@ -1,20 +1,52 @@
-import tkinter as tk
-from tkinter import messagebox
+import sys
+
+if __name__ == "__main__" and "--headless" in sys.argv:
+    # 无界面模式：不导入tkinter/ttkbootstrap/pywin32，也不需要管理员权限
+    from dns_tester.cli import main as headless_main
+
+    sys.exit(headless_main(sys.argv[1:]))
+
+import tkinter as tk  # noqa: E402
+from tkinter import filedialog, messagebox
 import ttkbootstrap as tb
 from ttkbootstrap.constants import PRIMARY, SECONDARY, SUCCESS, DANGER, WARNING, INFO
-import dns.resolver
 import time
 import threading
 import configparser
 import platform
 import ctypes
-import pythoncom
-import win32com.client
+import importlib
 import os
-import sys
 import socket
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import webbrowser
+
+# pywin32、webbrowser 和探测引擎（asyncio/dnspython）在首次使用时才导入，
+# 窗口显示后再由后台线程预加载，见 DNSTesterApp._preload_modules
+from dns_tester.adapters import (
+    AdapterSnapshot,
+    current_dns,
+    default_gateway,
+    local_ipv4,
+)
+from dns_tester.addresses import REJECT_INVALID
+from dns_tester.config import (
+    DEFAULT_HISTORY_DAYS,
+    DEFAULT_MONITOR_INTERVAL,
+    DEFAULT_MONITOR_TOP_TIER,
+    RESERVED_SECTIONS,
+    ConfigStore,
+    ForwarderSettings,
+    ProbeSettings,
+    category_version,
+    ensure_category,
+    get_categories,
+    load_category_servers,
+)
+from dns_tester.corpus import DomainCorpus
+from dns_tester.netwatch import make_change_watcher
+from dns_tester.servers import Server, ServerList
+from dns_tester.system_dns import make_system_backend
 
 
 # 应用程序常量
@@ -22,8 +54,21 @@ class AppConfig:
     WINDOW_TITLE = "DNS服务器测试工具"
     WINDOW_SIZE = (980, 500)
     CONFIG_FILE = "dns_servers.ini"
+    HISTORY_FILE = "dns_history.db"  # 测试结果历史记录（SQLite）
+    # 配置文件中不属于DNS类别的节
+    RESERVED_SECTIONS = RESERVED_SECTIONS
     FONT_FAMILY = "Microsoft YaHei"
 
+    # 探测参数见 dns_tester.config.ProbeSettings（配置文件Main节）
+    # 窗口显示后在后台预加载的模块
+    PRELOAD_MODULES = ("dns_tester.benchmark", "pythoncom", "win32com.client")
+    WORKLOAD_MAX_ITEMS = 100  # 从查询日志导入时保留的最大查询数
+    UI_FLUSH_MS = 80  # 测试结果合并刷新到列表的间隔（毫秒）
+    NETWORK_CHANGE_MS = 300  # 网络变化通知合并后刷新适配器信息的间隔（毫秒）
+    ROW_HEIGHT = 30  # 列表行高（像素）
+    VIRTUAL_BUFFER = 10  # 列表在可见行之外额外创建的条目数
+    SORTABLE_COLUMNS = ("name", "primary", "secondary", "status")
+
     # 主题选项
     THEMES = [
         "Cyborg",
@@ -79,6 +124,178 @@ class AppConfig:
     }
 
 
+class VirtualTreeview:
+    """只为可见行（加少量缓冲行）创建条目的Treeview
+
+    rows 为完整的数据列表，render(row, index) 返回 (显示值, 标签)，
+    key(row) 返回行的唯一标识。条目数量固定，滚动时复用条目并替换内容，
+    选中状态按 key 记录，因此滚出可见区域的选中行不会丢失。
+    """
+
+    def __init__(self, tree, scrollbar, render, key, buffer=AppConfig.VIRTUAL_BUFFER):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.render = render
+        self.key = key
+        self.buffer = buffer
+        self.rows = []
+        self.offset = 0  # 第一个条目显示的行号
+        self.visible = 1  # 可见行数
+        self.items = []  # 复用的条目ID
+        self.item_rows = {}  # 已显示的条目ID -> 行号
+        self.selected = set()  # 选中行的 key
+        tree.configure(yscrollcommand=self._on_tree_scroll)
+        scrollbar.configure(command=self.yview)
+        tree.bind("<Configure>", self._on_configure, add="+")
+        tree.bind("<MouseWheel>", self._on_mousewheel, add="+")
+        tree.bind("<Button-4>", lambda e: self._scroll_event(-3), add="+")
+        tree.bind("<Button-5>", lambda e: self._scroll_event(3), add="+")
+        tree.bind("<Up>", self._on_up, add="+")
+        tree.bind("<ButtonPress-1>", self._on_press, add="+")
+        tree.bind("<<TreeviewSelect>>", lambda e: self._sync_selection(), add="+")
+
+    def __len__(self):
+        return len(self.rows)
+
+    def set_rows(self, rows):
+        """替换全部数据并刷新可见行"""
+        self._sync_selection()
+        self.rows = rows
+        keys = {self.key(row) for row in rows}
+        self.selected &= keys
+        self._render()
+
+    def refresh(self, keys=None):
+        """重新生成可见行的内容，keys 不为空时只刷新这些行"""
+        for item, index in self.item_rows.items():
+            row = self.rows[index]
+            if keys is None or self.key(row) in keys:
+                values, tag = self.render(row, index)
+                self.tree.item(item, values=values, tags=(tag,))
+
+    def row_for_item(self, item):
+        index = self.item_rows.get(item)
+        return None if index is None else self.rows[index]
+
+    def selected_rows(self):
+        """按显示顺序返回所有选中的行（包括滚出可见区域的）"""
+        self._sync_selection()
+        return [row for row in self.rows if self.key(row) in self.selected]
+
+    def select_item(self, item):
+        """只选中指定条目"""
+        row = self.row_for_item(item)
+        self.selected = {self.key(row)} if row is not None else set()
+        self.tree.selection_set(item)
+        self.tree.focus(item)
+
+    def scroll(self, delta):
+        """滚动 delta 行"""
+        self._sync_selection()
+        offset = max(0, min(self.offset + delta, len(self.rows) - self.visible))
+        if offset != self.offset:
+            focus_row = self.row_for_item(self.tree.focus())
+            self.offset = offset
+            self._render()
+            if focus_row is not None:
+                focus_key = self.key(focus_row)
+                for item, index in self.item_rows.items():
+                    if self.key(self.rows[index]) == focus_key:
+                        self.tree.focus(item)
+                        break
+
+    def yview(self, *args):
+        """滚动条命令"""
+        if args[0] == "moveto":
+            self.scroll(round(float(args[1]) * len(self.rows)) - self.offset)
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.scroll(int(args[1]) * step)
+
+    def _render(self):
+        """把 rows[offset:] 填入复用的条目"""
+        self.offset = max(0, min(self.offset, len(self.rows) - self.visible))
+        count = min(self.visible + self.buffer, len(self.rows) - self.offset)
+        while len(self.items) < count:
+            self.items.append(self.tree.insert("", tk.END))
+        self.item_rows = {}
+        selection = []
+        for position, item in enumerate(self.items):
+            if position >= count:
+                self.tree.detach(item)
+                continue
+            index = self.offset + position
+            row = self.rows[index]
+            values, tag = self.render(row, index)
+            self.tree.item(item, values=values, tags=(tag,))
+            self.tree.move(item, "", position)
+            self.item_rows[item] = index
+            if self.key(row) in self.selected:
+                selection.append(item)
+        self.tree.selection_set(selection)
+        self.tree.yview_moveto(0)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self.rows)
+        if total <= self.visible:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(
+                self.offset / total, (self.offset + self.visible) / total
+            )
+
+    def _sync_selection(self):
+        """把可见条目的选中状态同步到 selected"""
+        shown = {self.key(self.rows[index]) for index in self.item_rows.values()}
+        chosen = {
+            self.key(self.rows[self.item_rows[item]])
+            for item in self.tree.selection()
+            if item in self.item_rows
+        }
+        self.selected = (self.selected - shown) | chosen
+
+    def _on_tree_scroll(self, first, last):
+        """键盘移动到缓冲行时Treeview会自行滚动，把它换算为数据偏移"""
+        first = float(first)
+        if first > 0 and self.item_rows:
+            self.scroll(round(first * len(self.item_rows)))
+        else:
+            self._update_scrollbar()
+
+    def _on_configure(self, event):
+        rowheight = int(
+            tb.Style().lookup("Treeview", "rowheight") or AppConfig.ROW_HEIGHT
+        )
+        # 减去表头占用的一行
+        visible = max(1, event.height // rowheight - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self._render()
+
+    def _on_mousewheel(self, event):
+        return self._scroll_event(-3 if event.delta > 0 else 3)
+
+    def _scroll_event(self, delta):
+        self.scroll(delta)
+        return "break"
+
+    def _on_up(self, event):
+        """在第一行按上方向键时向上滚动一行"""
+        if self.offset > 0 and self.items and self.tree.focus() == self.items[0]:
+            self.scroll(-1)
+            self.select_item(self.items[0])
+            return "break"
+        return None
+
+    def _on_press(self, event):
+        # 不按Ctrl/Shift单击行时，取消滚出可见区域的选中行
+        if self.tree.identify_region(event.x, event.y) != "heading" and not (
+            event.state & 0x0005
+        ):
+            self.selected.clear()
+
+
 class DNSTesterApp:
     def __init__(self, root):
         self.root = root
@@ -96,18 +313,91 @@ class DNSTesterApp:
 
     def _init_data(self):
         """初始化数据结构"""
-        self.dns_servers = []
+        self.dns_servers = ServerList()
         self.test_results = {}
         self.network_connections = []
         self.current_ip = ""
         self.dns_categories = []
         self.current_category = "Ipv4_默认"
+        # 配置文件只在启动时读取一次，之后的修改在内存中进行并延迟写回
+        self.config_store = ConfigStore(
+            AppConfig.CONFIG_FILE, on_error=self._on_config_save_error
+        )
+        self.probe_settings = ProbeSettings()
+        self.domain_corpus = DomainCorpus()
+        self.history = None  # 首次保存结果时在测试线程中创建
+        self.dead_cache = None  # 预筛选无响应的地址，首次测试时创建
+        # 网络适配器信息快照：IP、网关、DNS显示和网络设备列表共用一次WMI查询
+        # 系统DNS配置后端（Windows为WMI，COM只在WMI工作线程中初始化一次；
+        # Linux为resolvectl或resolv.conf），修改操作在单独的后台线程中依次执行
+        self.dns_backend = make_system_backend()
+        self.dns_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="dns-backend"
+        )
+        self.adapter_snapshot = AdapterSnapshot(self.dns_backend)
+        self.change_watcher = None  # 网络变化监视器，窗口显示后启动
+        self._network_change_scheduled = False
+        self.history_days = DEFAULT_HISTORY_DAYS
+        self.monitor = None  # 持续监控（dns_tester.monitor.Monitor）
+        self.monitor_interval = DEFAULT_MONITOR_INTERVAL
+        self.monitor_top_tier = DEFAULT_MONITOR_TOP_TIER
+        self.forwarder = None  # 本地缓存转发器（dns_tester.forwarder.Forwarder）
+        self.show_latency_p95 = False  # 延迟列是否显示 P50/P95
+        # 列表视图的排序列（None时按 dns_servers 的顺序），以及等待合并刷新的行
+        self.sort_column = None
+        self.sort_reverse = False
+        self._pending_rows = set()
+        self._pending_status = None
+        self._flush_scheduled = False
+        self._ui_lock = threading.Lock()
 
     def _load_initial_data(self):
         """加载初始数据"""
         self.load_default_config()
         self.load_theme_preference()
         self.load_network_connections()
+        self.root.after_idle(
+            lambda: threading.Thread(target=self._preload_modules, daemon=True).start()
+        )
+        self.root.after_idle(self._start_change_watcher)
+
+    def _start_change_watcher(self):
+        """监视网络适配器和DNS设置的变化，变化时立即刷新显示"""
+        self.change_watcher = make_change_watcher()
+        if self.change_watcher is not None:
+            self.change_watcher.start(self._on_network_changed)
+
+    def _on_network_changed(self, reason):
+        """网络变化通知（在监视线程中调用），在 NETWORK_CHANGE_MS 内合并为一次刷新"""
+        self.adapter_snapshot.invalidate()
+        # 网络恢复后之前无响应的地址可能已经可达
+        if self.dead_cache is not None:
+            self.dead_cache.clear()
+        with self._ui_lock:
+            if self._network_change_scheduled:
+                return
+            self._network_change_scheduled = True
+        self.root.after(AppConfig.NETWORK_CHANGE_MS, self._apply_network_change)
+
+    def _apply_network_change(self):
+        with self._ui_lock:
+            self._network_change_scheduled = False
+
+        def worker():
+            connections = self.get_network_connections()
+            self.root.after(
+                0, lambda: self._update_network_combo(connections, announce=False)
+            )
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _preload_modules(self):
+        """后台预加载首帧不需要的模块，避免第一次测试或设置DNS时卡顿"""
+        for name in AppConfig.PRELOAD_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                print(f"预加载模块 {name} 失败: {e}")
 
     def create_widgets(self):
         """创建所有UI组件"""
@@ -148,6 +438,12 @@ class DNSTesterApp:
         self._create_category_controls(category_frame)
         # 主题选择
         self._create_theme_controls(category_frame)
+        # 冷缓存测试开关
+        self._create_cold_test_controls(category_frame)
+        # 加密DNS测试开关
+        self._create_encrypted_test_controls(category_frame)
+        # 持续监控和自动切换开关
+        self._create_monitor_controls(category_frame)
 
     def _create_network_device_controls(self, parent):
         """创建网络设备控制组件"""
@@ -177,6 +473,9 @@ class DNSTesterApp:
         tb.Button(
             parent, text="管理分类", command=self.manage_categories, bootstyle=SECONDARY
         ).pack(side=tk.LEFT, padx=5)
+        tb.Button(
+            parent, text="测试域名", command=self.manage_domains, bootstyle=SECONDARY
+        ).pack(side=tk.LEFT, padx=5)
 
     def _create_theme_controls(self, parent):
         """创建主题控制组件"""
@@ -192,12 +491,62 @@ class DNSTesterApp:
         self.theme_combo.pack(side=tk.LEFT, padx=(0, 5))
         self.theme_combo.bind("<<ComboboxSelected>>", self.on_theme_changed)
 
+    def _create_cold_test_controls(self, parent):
+        """创建冷缓存测试开关"""
+        self.cold_test_var = tk.BooleanVar(value=False)
+        tb.Checkbutton(
+            parent,
+            text="冷缓存测试",
+            variable=self.cold_test_var,
+            command=self.on_cold_test_changed,
+            bootstyle="round-toggle",
+        ).pack(side=tk.LEFT, padx=(15, 5))
+
+    def _create_encrypted_test_controls(self, parent):
+        """创建加密DNS（DoH/DoT）测试开关"""
+        self.encrypted_test_var = tk.BooleanVar(value=False)
+        tb.Checkbutton(
+            parent,
+            text="加密DNS测试",
+            variable=self.encrypted_test_var,
+            command=self.on_encrypted_test_changed,
+            bootstyle="round-toggle",
+        ).pack(side=tk.LEFT, padx=(15, 5))
+
+    def _create_monitor_controls(self, parent):
+        """创建持续监控开关"""
+        self.monitor_var = tk.BooleanVar(value=False)
+        tb.Checkbutton(
+            parent,
+            text="持续监控",
+            variable=self.monitor_var,
+            command=self.on_monitor_changed,
+            bootstyle="round-toggle",
+        ).pack(side=tk.LEFT, padx=(15, 5))
+        self.failover_var = tk.BooleanVar(value=False)
+        tb.Checkbutton(
+            parent,
+            text="自动切换",
+            variable=self.failover_var,
+            command=self.on_failover_changed,
+            bootstyle="round-toggle",
+        ).pack(side=tk.LEFT, padx=(15, 5))
+        self.forwarder_var = tk.BooleanVar(value=False)
+        tb.Checkbutton(
+            parent,
+            text="本地转发",
+            variable=self.forwarder_var,
+            command=self.on_forwarder_changed,
+            bootstyle="round-toggle",
+        ).pack(side=tk.LEFT, padx=(15, 5))
+
     def _create_button_frame(self):
         """创建按钮区域"""
         button_frame = tb.Frame(self.root)
         button_frame.pack(fill=tk.X, padx=5, pady=5)
         buttons = [
             ("添加DNS", self.add_dns, SUCCESS),
+            ("批量导入", self.import_dns, SUCCESS),
             ("删除选中", self.remove_dns, DANGER),
             ("开始测试", self.start_test, PRIMARY),
             ("清理DNS缓存", self.clear_dns_cache, INFO),
@@ -224,6 +573,15 @@ class DNSTesterApp:
         self.status_bar.pack(side=tk.LEFT, padx=10, pady=5)
         # 右侧GitHub链接
         self._create_github_link(status_frame)
+        # 列表筛选（名称或地址）
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", self.on_filter_changed)
+        tb.Entry(status_frame, textvariable=self.filter_var, width=20).pack(
+            side=tk.RIGHT, padx=(0, 10), pady=5
+        )
+        tb.Label(status_frame, text="筛选:", bootstyle=SECONDARY).pack(
+            side=tk.RIGHT, padx=(10, 5)
+        )
 
     def _create_github_link(self, parent):
         """创建GitHub链接"""
@@ -240,7 +598,15 @@ class DNSTesterApp:
         tree_frame = tb.Frame(self.root)
         tree_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=(5, 0))
         # 创建Treeview
-        columns = ("name", "primary", "secondary", "latency", "status")
+        columns = (
+            "name",
+            "primary",
+            "secondary",
+            "latency",
+            "status",
+            "cold_latency",
+            "encrypted_latency",
+        )
         self.tree = tb.Treeview(
             tree_frame, columns=columns, show="headings", bootstyle=INFO, height=30
         )
@@ -256,7 +622,7 @@ class DNSTesterApp:
             "Treeview",
             relief="solid",
             borderwidth=1,
-            rowheight=30,
+            rowheight=AppConfig.ROW_HEIGHT,
         )
         style.configure("Treeview.Heading", relief="solid", borderwidth=1)
         self.tree.configure(style="Treeview")
@@ -269,8 +635,12 @@ class DNSTesterApp:
             ("secondary", "备用DNS", 150, tk.W),
             ("latency", "延迟(ms)", 80, tk.CENTER),
             ("status", "状态", 60, tk.CENTER),
+            ("cold_latency", "冷缓存(ms)", 80, tk.CENTER),
+            ("encrypted_latency", "DoH | DoT(ms)", 160, tk.CENTER),
         ]
+        self._column_headings = {}
         for col_id, heading, width, anchor in column_configs:
+            self._column_headings[col_id] = heading
             self.tree.heading(col_id, text=heading)
             self.tree.column(
                 col_id,
@@ -278,13 +648,94 @@ class DNSTesterApp:
                 anchor=anchor,
                 minwidth=width if anchor == tk.CENTER else 100,
             )
+        # 点击延迟列标题切换 中位数 / P50/P95 显示，点击其他列标题排序
+        self.tree.heading("latency", command=self.toggle_latency_display)
+        for col_id in AppConfig.SORTABLE_COLUMNS:
+            self.tree.heading(col_id, command=lambda c=col_id: self.sort_by(c))
+        self._update_display_columns()
+
+    def _update_display_columns(self):
+        """冷缓存测试、加密DNS测试开启时才显示对应的列"""
+        display_columns = ["name", "primary", "secondary", "latency"]
+        if self.cold_test_var.get():
+            display_columns.append("cold_latency")
+        if self.encrypted_test_var.get():
+            display_columns.append("encrypted_latency")
+        display_columns.append("status")
+        self.tree.configure(displaycolumns=display_columns)
+
+    def on_cold_test_changed(self):
+        """冷缓存测试开关改变时的回调"""
+        self.probe_settings.cold_test = self.cold_test_var.get()
+        self._update_display_columns()
+        self.save_cold_test_preference()
+
+    def on_encrypted_test_changed(self):
+        """加密DNS测试开关改变时的回调"""
+        self.probe_settings.encrypted_test = self.encrypted_test_var.get()
+        self._update_display_columns()
+        self.save_encrypted_test_preference()
+
+    def toggle_latency_display(self):
+        """切换延迟列的显示方式"""
+        self.show_latency_p95 = not self.show_latency_p95
+        heading = "P50/P95(ms)" if self.show_latency_p95 else "延迟(ms)"
+        self.tree.heading("latency", text=heading)
+        self.update_treeview()
 
     def _setup_treeview_scrollbar(self, parent):
-        """设置Treeview滚动条"""
-        scrollbar = tb.Scrollbar(parent, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        """设置Treeview滚动条，列表只为可见行创建条目"""
+        scrollbar = tb.Scrollbar(parent, orient=tk.VERTICAL)
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree_view = VirtualTreeview(
+            self.tree, scrollbar, self._tree_row, key=lambda server: server.name
+        )
+
+    def sort_by(self, column):
+        """点击列标题排序，再次点击同一列时倒序，第三次恢复原顺序"""
+        if self.sort_column != column:
+            self.sort_column, self.sort_reverse = column, False
+        elif not self.sort_reverse:
+            self.sort_reverse = True
+        else:
+            self.sort_column = None
+        for col_id in AppConfig.SORTABLE_COLUMNS:
+            heading = self._column_headings[col_id]
+            if col_id == self.sort_column:
+                heading += " ▼" if self.sort_reverse else " ▲"
+            self.tree.heading(col_id, text=heading)
+        self.update_treeview()
+
+    def on_filter_changed(self, *args):
+        """筛选条件改变时的回调"""
+        self.update_treeview()
+
+    def _view_rows(self):
+        """按筛选条件和排序列生成列表显示的服务器"""
+        rows = self.dns_servers
+        text = self.filter_var.get().strip().lower()
+        if text:
+            rows = [
+                server
+                for server in rows
+                if text in server.name.lower()
+                or text in server.primary
+                or text in server.secondary
+            ]
+        if self.sort_column == "status":
+            rows = sorted(
+                rows,
+                key=lambda s: self.test_results.get(s.name, {}).get("status", "~"),
+                reverse=self.sort_reverse,
+            )
+        elif self.sort_column:
+            rows = sorted(
+                rows,
+                key=lambda s: getattr(s, self.sort_column).lower(),
+                reverse=self.sort_reverse,
+            )
+        return rows
 
     def _setup_treeview_events(self):
         """设置Treeview事件"""
@@ -295,6 +746,8 @@ class DNSTesterApp:
     def open_github(self, event):
         """打开GitHub链接"""
         try:
+            import webbrowser
+
             webbrowser.open("https://github.com/pcoof/dns-tester")
             self.show_notification("已在浏览器中打开GitHub页面", INFO)
         except Exception as e:
@@ -347,110 +800,6 @@ class DNSTesterApp:
         """判断主题是否为深色主题"""
         return theme_name.lower() in AppConfig.DARK_THEMES
 
-    @staticmethod
-    def _is_ip(ip, version=None):
-        """
-        检查是否为有效的IP地址
-        参数:
-            ip: 待检查的IP地址字符串
-            version: 可选，指定IP版本(4或6)，默认检查是否为任意有效IP
-        返回:
-            bool: 符合指定版本则返回True，否则返回False
-        """
-
-        # 内部IPv4检查逻辑
-        def check_ipv4():
-            if not ip:
-                return True  # 空字符串视为有效IPv4(保持原逻辑)
-            try:
-                parts = ip.split(".")
-                return len(parts) == 4 and all(0 <= int(part) <= 255 for part in parts)
-            except (ValueError, AttributeError):
-                return False
-
-        # 内部IPv6检查逻辑
-        def check_ipv6():
-            if not ip:
-                return False  # 空字符串视为无效IPv6(保持原逻辑)
-            try:
-                socket.inet_pton(socket.AF_INET6, ip)
-                return True
-            except (socket.error, AttributeError):
-                return False
-
-        # 根据版本参数返回对应检查结果
-        if version == 4:
-            return check_ipv4()
-        elif version == 6:
-            return check_ipv6()
-        elif version is None:
-            # 检查是否为任意有效IP(空字符串返回False)
-            if not ip:
-                return False
-            return check_ipv4() or check_ipv6()
-        else:
-            # 无效版本参数返回False
-            return False
-
-    def _get_network_adapters_info(self):
-        """获取网络适配器信息"""
-        try:
-            pythoncom.CoInitialize()
-            wmi = win32com.client.GetObject("winmgmts:\\\\.\\root\\cimv2")
-            if not wmi:
-                return []
-            adapters = wmi.ExecQuery(
-                "SELECT * FROM Win32_NetworkAdapter WHERE NetEnabled = True"
-            )
-            adapter_info_map = {}
-            for adapter in adapters:
-                adapter_info_map[str(adapter.DeviceID)] = {
-                    "name": adapter.Name,
-                    "net_connection_id": adapter.NetConnectionID,  # 这是友好名称，如"以太网 2"
-                }
-            # 查询启用的网络适配器配置
-            configs = wmi.ExecQuery(
-                "SELECT * FROM Win32_NetworkAdapterConfiguration WHERE IPEnabled = True"
-            )
-            network_info = []
-            for config in configs:
-                adapter_info = adapter_info_map.get(str(config.Index), {})
-                # 优先使用NetConnectionID（友好名称），如果没有则使用Name
-                adapter_name = (
-                    adapter_info.get("net_connection_id")
-                    or adapter_info.get("name")
-                    or "未识别适配器"
-                )
-                # 分离IPv4和IPv6地址
-                ip_addresses = list(config.IPAddress) if config.IPAddress else []
-                ipv4_addresses = [ip for ip in ip_addresses if not self._is_ip(ip, 6)]
-                ipv6_addresses = [ip for ip in ip_addresses if self._is_ip(ip, 6)]
-                # 分离IPv4和IPv6网关
-                gateways = (
-                    list(config.DefaultIPGateway) if config.DefaultIPGateway else []
-                )
-                ipv4_gateways = [gw for gw in gateways if not self._is_ip(gw, 6)]
-                ipv6_gateways = [gw for gw in gateways if self._is_ip(gw, 6)]
-                info = {
-                    "name": adapter_name,
-                    "index": config.Index,
-                    "mac": config.MACAddress,
-                    "ipv4_addresses": ipv4_addresses,
-                    "ipv6_addresses": ipv6_addresses,
-                    "ipv4_gateways": ipv4_gateways,
-                    "ipv6_gateways": ipv6_gateways,
-                    "dns_servers": list(config.DNSServerSearchOrder)
-                    if config.DNSServerSearchOrder
-                    else [],
-                    "dhcp_enabled": config.DHCPEnabled,
-                }
-                network_info.append(info)
-            return network_info
-        except Exception:
-            return []
-        finally:
-            pythoncom.CoUninitialize()
-
     def center_window(self, window, width, height):
         """将窗口居中显示在屏幕上"""
         # 获取屏幕宽度和高度
@@ -466,10 +815,18 @@ class DNSTesterApp:
         """窗口关闭时的处理"""
         try:
             print("程序正在关闭，保存配置...")
+            if self.monitor is not None:
+                self.monitor.stop()
+            if self.forwarder is not None:
+                self.forwarder.stop()
+            if self.change_watcher is not None:
+                self.change_watcher.stop()
+            self.dns_backend.close()
             # 保存当前配置
             self.auto_save_current_category()
             # 保存当前选择的类别
             self.auto_save_selection()
+            self.config_store.flush()
             print("配置保存完成，程序退出")
         except Exception as e:
             print(f"关闭时保存配置失败: {e}")
@@ -515,18 +872,12 @@ class DNSTesterApp:
             # 如果正在显示通知，更新保存的原始状态
             self._original_status = message
 
-    def get_local_ip(self):
+    def get_local_ip(self, adapters):
         """获取本机局域网IP地址"""
+        ip = local_ipv4(adapters)
+        if ip:
+            return ip
         try:
-            # 使用WMI获取网络适配器信息
-            adapters = self._get_network_adapters_info()
-            for adapter in adapters:
-                if adapter["ipv4_addresses"]:
-                    for ip in adapter["ipv4_addresses"]:
-                        # 排除回环地址和APIPA地址
-                        if not ip.startswith(("127.", "169.254.")):
-                            return ip
-
             # 备选方案：使用socket方法
             with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
                 s.connect(("8.8.8.8", 80))
@@ -541,35 +892,14 @@ class DNSTesterApp:
             except Exception:
                 return "无法获取"
 
-    def get_default_gateway(self):
-        """获取默认网关地址"""
-        try:
-            # 使用WMI获取网络适配器信息
-            adapters = self._get_network_adapters_info()
-            for adapter in adapters:
-                if adapter["ipv4_gateways"]:
-                    # 返回第一个IPv4网关
-                    return adapter["ipv4_gateways"][0]
-        except Exception as e:
-            print(f"获取默认网关失败: {e}")
-        return "无法获取"
-
-    def get_current_dns_servers(self):
-        """获取当前系统DNS服务器"""
-        try:
-            # 使用WMI获取网络适配器信息
-            adapters = self._get_network_adapters_info()
-            for adapter in adapters:
-                if adapter["dns_servers"]:
-                    # 返回前两个DNS服务器
-                    dns_list = adapter["dns_servers"][:2]
-                    # 确保返回两个元素
-                    if len(dns_list) == 1:
-                        dns_list.append("未设置")
-                    return dns_list
-        except Exception as e:
-            print(f"获取当前DNS服务器失败: {e}")
-        return ["无法获取", ""]
+    def get_current_dns_servers(self, adapters):
+        """获取当前系统DNS服务器（主DNS, 备用DNS）"""
+        dns_list = current_dns(adapters)[:2]
+        if not dns_list:
+            return ["无法获取", ""]
+        if len(dns_list) == 1:
+            dns_list.append("未设置")
+        return dns_list
 
     def load_default_config(self):
         """加载默认配置"""
@@ -586,22 +916,22 @@ class DNSTesterApp:
         self.category_combo["values"] = self.dns_categories
         self.category_combo.set(self.current_category)
 
-        self.dns_servers = AppConfig.DEFAULT_IPV4_SERVERS.copy()
+        self.dns_servers = ServerList(AppConfig.DEFAULT_IPV4_SERVERS)
         self.update_treeview()
         self.show_notification("已加载默认DNS配置", INFO)
 
     def load_config(self):
         """加载配置文件"""
-        config = self._get_config_parser()
+        config = self.config_store.config
         try:
-            config.read(AppConfig.CONFIG_FILE, encoding="utf-8")
             categories = self._get_categories_from_config(config)
 
             if not categories:
-                self._create_default_categories(config)
+                self._create_default_categories()
                 categories = ["Ipv4_默认", "Ipv6_默认"]
 
             self._load_category_order(config, categories)
+            self._load_probe_settings(config)
             self._load_last_selection()
             self._update_category_combo()
             self.load_category_dns(self.current_category)
@@ -609,34 +939,28 @@ class DNSTesterApp:
         except Exception as e:
             self.show_notification(f"自动加载配置失败: {str(e)}", DANGER)
 
-    def _get_config_parser(self):
-        """获取配置解析器"""
-        config = configparser.ConfigParser()
-        config.optionxform = str  # 区分大小写
-        return config
-
     def _get_categories_from_config(self, config):
         """从配置中获取类别列表"""
-        return [section for section in config.sections() if section != "Main"]
+        return get_categories(config)
 
-    def _create_default_categories(self, config):
+    def _create_default_categories(self):
         """创建默认类别"""
-        for category in ["Ipv4_默认", "Ipv6_默认"]:
-            config.add_section(category)
-
-        # 添加默认IPv4服务器
-        for server in AppConfig.DEFAULT_IPV4_SERVERS[:3]:  # 只添加前3个
-            config.set(
-                "Ipv4_默认",
-                server["name"],
-                f"{server['primary']},{server['secondary']}",
-            )
+        with self.config_store.edit() as config:
+            for category in ["Ipv4_默认", "Ipv6_默认"]:
+                config.add_section(category)
+
+            # 添加默认IPv4服务器
+            for server in AppConfig.DEFAULT_IPV4_SERVERS[:3]:  # 只添加前3个
+                config.set(
+                    "Ipv4_默认",
+                    server["name"],
+                    f"{server['primary']},{server['secondary']}",
+                )
 
-        # 添加默认IPv6服务器
-        for name, dns in AppConfig.DEFAULT_IPV6_SERVERS.items():
-            config.set("Ipv6_默认", name, dns)
+            # 添加默认IPv6服务器
+            for name, dns in AppConfig.DEFAULT_IPV6_SERVERS.items():
+                config.set("Ipv6_默认", name, dns)
 
-        self._save_config_file(config)
         self.show_notification("已创建默认DNS分类", SUCCESS)
 
     def _load_category_order(self, config, categories):
@@ -651,6 +975,32 @@ class DNSTesterApp:
         else:
             self.dns_categories = categories
 
+    def _load_probe_settings(self, config):
+        """加载探测引擎参数"""
+        try:
+            self.probe_settings = ProbeSettings.from_config(config)
+        except (ValueError, configparser.Error) as e:
+            print(f"加载探测参数失败: {e}")
+        self.cold_test_var.set(self.probe_settings.cold_test)
+        self.encrypted_test_var.set(self.probe_settings.encrypted_test)
+        self._update_display_columns()
+        self.domain_corpus = DomainCorpus.from_config(config)
+        try:
+            self.history_days = config.getint(
+                "Main", "history_days", fallback=DEFAULT_HISTORY_DAYS
+            )
+        except ValueError as e:
+            print(f"加载历史记录保留天数失败: {e}")
+        try:
+            self.monitor_interval = config.getfloat(
+                "Main", "monitor_interval", fallback=DEFAULT_MONITOR_INTERVAL
+            )
+            self.monitor_top_tier = config.getint(
+                "Main", "monitor_top_tier", fallback=DEFAULT_MONITOR_TOP_TIER
+            )
+        except ValueError as e:
+            print(f"加载持续监控参数失败: {e}")
+
     def _load_last_selection(self):
         """加载上次选择的类别"""
         self.load_last_selection()
@@ -663,102 +1013,32 @@ class DNSTesterApp:
             self.category_combo["values"] = self.dns_categories
             self.category_combo.set(self.current_category)
 
-    def _save_config_file(self, config):
-        """保存配置文件"""
-        with open(AppConfig.CONFIG_FILE, "w", encoding="utf-8") as f:
-            config.write(f)
+    def _on_config_save_error(self, e):
+        """后台写入配置文件失败（在写入线程中调用）"""
+        if isinstance(e, PermissionError):
+            self.root.after(0, lambda: self._handle_permission_error(e))
+        else:
+            self.root.after(0, lambda: self._handle_save_error(e))
 
     def load_category_dns(self, category):
         """加载指定类别的DNS服务器"""
-        config = self._get_config_parser()
         try:
-            config.read("dns_servers.ini", encoding="utf-8")
-            self.dns_servers = []
-            # 如果类别不存在，创建该类别
-            if category not in config.sections():
-                config.add_section(category)
-                # 如果是默认类别，添加一些默认DNS服务器
-                if category == "Ipv4_默认":
-                    default_servers = {
-                        "US - Google Public DNS": "8.8.8.8,8.8.4.4",
-                        "AU - Cloudflare": "1.1.1.1,1.0.0.1",
-                        "CN - Aliyun": "223.5.5.5,223.6.6.6",
-                    }
-                    for name, dns in default_servers.items():
-                        config.set(category, name, dns)
-                elif category == "Ipv6_默认":
-                    default_servers = {
-                        "US - Google Public DNS": "2001:4860:4860::8888,2001:4860:4860::8844",
-                        "AU - Cloudflare": "2606:4700:4700::1111,2606:4700:4700::1001",
-                    }
-                    for name, dns in default_servers.items():
-                        config.set(category, name, dns)
-                # 保存配置文件
-                self._save_config_file(config)
+            # 如果类别不存在，创建该类别（默认类别会添加一些默认DNS服务器）
+            if not self.config_store.config.has_section(category):
+                with self.config_store.edit() as config:
+                    ensure_category(config, category)
                 self.show_notification(f"已创建类别: {category}", SUCCESS)
-            # 判断是IPv4还是IPv6类别
-            is_ipv6_category = category.startswith("Ipv6_")
-            filtered_addresses = []
-            # 解析新格式的DNS配置
-            for key, value in config.items(category):
-                if not value.strip():
-                    continue
-                # 解析格式: name=primary,secondary[,other] 或 name=primary
-                dns_parts = value.split(",")
-                if len(dns_parts) >= 2:
-                    primary = dns_parts[0].strip()
-                    secondary = dns_parts[1].strip()
-                    # 忽略第三个及以后的参数（如True/False标志）
-                elif len(dns_parts) == 1:
-                    primary = dns_parts[0].strip()
-                    secondary = ""
-                else:
-                    continue
-                # 过滤掉非IP地址的参数（如"True", "False"等）
-                if primary and not DNSTesterApp._is_ip(primary):
-                    continue
-                # 验证备用DNS地址
-                if secondary and not DNSTesterApp._is_ip(secondary):
-                    secondary = ""
-
-                # 根据类别过滤地址
-                if is_ipv6_category:
-                    # IPv6类别：过滤掉IPv4地址
-                    if (
-                        primary
-                        and self._is_ip(primary, 4)
-                        and not self._is_ip(primary, 6)
-                    ):
-                        primary = ""
-                        filtered_addresses.append(f"{key} 主DNS(IPv4)")
-                    if (
-                        secondary
-                        and self._is_ip(secondary, 4)
-                        and not self._is_ip(secondary, 6)
-                    ):
-                        secondary = ""
-                        filtered_addresses.append(f"{key} 备用DNS(IPv4)")
-                else:
-                    # IPv4类别：过滤掉IPv6地址
-                    if primary and not self._is_ip(primary, 4):
-                        primary = ""
-                        filtered_addresses.append(f"{key} 主DNS(IPv6)")
-                    if secondary and not self._is_ip(secondary, 4):
-                        secondary = ""
-                        filtered_addresses.append(f"{key} 备用DNS(IPv6)")
-                if primary:  # 只添加有主DNS的服务器
-                    self.dns_servers.append(
-                        {
-                            "name": key,
-                            "primary": primary,
-                            "secondary": secondary,
-                        }
-                    )
+            self.dns_servers, rejected = load_category_servers(
+                self.config_store.config, category
+            )
             self.update_treeview()
             # 显示加载结果通知
-            if filtered_addresses:
-                addr_type = "IPv4" if is_ipv6_category else "IPv6"
-                filtered_msg = f"已加载 {category}，过滤了 {len(filtered_addresses)} 个{addr_type}地址"
+            if rejected:
+                invalid = sum(1 for r in rejected if r.reason == REJECT_INVALID)
+                addr_type = "IPv4" if category.startswith("Ipv6_") else "IPv6"
+                filtered_msg = f"已加载 {category}，过滤了 {len(rejected) - invalid} 个{addr_type}地址"
+                if invalid:
+                    filtered_msg += f"，{invalid} 个无效地址"
                 self.show_notification(filtered_msg, WARNING)
             else:
                 self.show_notification(
@@ -774,6 +1054,7 @@ class DNSTesterApp:
             self.current_category = selected_category
             self.test_results = {}  # 清空测试结果
             self.load_category_dns(selected_category)
+            self._servers_changed()
             # 自动保存当前选择
             self.auto_save_selection()
 
@@ -813,7 +1094,7 @@ class DNSTesterApp:
                 "Treeview",
                 relief="solid",
                 borderwidth=1,
-                rowheight=30,  # 保持30像素的行高
+                rowheight=AppConfig.ROW_HEIGHT,  # 保持行高
             )
             # # 重新配置表头样式
             style.configure(
@@ -827,7 +1108,12 @@ class DNSTesterApp:
             print(f"重新应用Treeview样式失败: {e}")
 
     def refresh_categories(self):
-        """刷新DNS类别列表"""
+        """重新读取配置文件（包括手动修改的内容）并刷新DNS类别列表"""
+        try:
+            self.config_store.reload()
+        except OSError as e:
+            self.show_notification(f"读取配置文件失败: {e}", DANGER)
+            return
         self.load_config()
 
     def manage_categories(self):
@@ -928,16 +1214,13 @@ class DNSTesterApp:
             if new_category and new_category.strip():
                 new_category = new_category.strip()
                 # 确保分类名称格式正确
-                if new_category == "Main":
-                    messagebox.showwarning("警告", "不能使用保留名称 'Main'")
+                if new_category in AppConfig.RESERVED_SECTIONS:
+                    messagebox.showwarning("警告", f"不能使用保留名称 '{new_category}'")
                     return
                 if new_category not in self.dns_categories:
                     # 添加到配置文件
-                    config = self._get_config_parser()
-                    config.read(AppConfig.CONFIG_FILE, encoding="utf-8")
-                    if new_category not in config.sections():
-                        config.add_section(new_category)
-                        self._save_config_file(config)
+                    if not self.config_store.config.has_section(new_category):
+                        self.config_store.section(new_category)
                         self.dns_categories.append(new_category)
                         refresh_category_list()
                         self.category_combo["values"] = self.dns_categories
@@ -961,11 +1244,9 @@ class DNSTesterApp:
                 f"确定要删除分类 '{category_to_delete}' 吗？\n这将删除该分类下的所有DNS服务器。",
             ):
                 # 从配置文件删除
-                config = self._get_config_parser()
-                config.read(AppConfig.CONFIG_FILE, encoding="utf-8")
-                if category_to_delete in config.sections():
-                    config.remove_section(category_to_delete)
-                    self._save_config_file(config)
+                with self.config_store.edit() as config:
+                    removed = config.remove_section(category_to_delete)
+                if removed:
                     self.dns_categories.remove(category_to_delete)
                     refresh_category_list()
                     self.category_combo["values"] = self.dns_categories
@@ -987,16 +1268,16 @@ class DNSTesterApp:
                 new_name = new_name.strip()
                 if new_name not in self.dns_categories:
                     # 重命名配置文件中的分类
-                    config = self._get_config_parser()
-                    config.read(AppConfig.CONFIG_FILE, encoding="utf-8")
-                    if old_category in config.sections():
-                        # 复制旧分类的所有配置到新分类
-                        config.add_section(new_name)
-                        for key, value in config.items(old_category):
-                            config.set(new_name, key, value)
-                        # 删除旧分类
-                        config.remove_section(old_category)
-                        self._save_config_file(config)
+                    with self.config_store.edit() as config:
+                        renamed = old_category in config.sections()
+                        if renamed:
+                            # 复制旧分类的所有配置到新分类
+                            config.add_section(new_name)
+                            for key, value in config.items(old_category):
+                                config.set(new_name, key, value)
+                            # 删除旧分类
+                            config.remove_section(old_category)
+                    if renamed:
                         # 更新内存中的分类列表
                         index = self.dns_categories.index(old_category)
                         self.dns_categories[index] = new_name
@@ -1024,37 +1305,150 @@ class DNSTesterApp:
             bootstyle=SECONDARY,
         ).pack(side=tk.RIGHT, padx=5)
 
+    def manage_domains(self):
+        """管理测试域名集合（[Domains]节）"""
+        domain_dialog = tk.Toplevel(self.root)
+        domain_dialog.title("测试域名")
+        domain_dialog.geometry("500x500")
+        domain_dialog.transient(self.root)
+        domain_dialog.grab_set()
+        # 居中显示
+        domain_dialog.update_idletasks()
+        width = domain_dialog.winfo_width()
+        height = domain_dialog.winfo_height()
+        x = (self.root.winfo_width() // 2) - (width // 2) + self.root.winfo_x()
+        y = (self.root.winfo_height() // 2) - (height // 2) + self.root.winfo_y()
+        domain_dialog.geometry(f"+{x}+{y}")
+        main_frame = tb.Frame(domain_dialog)
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=15)
+        tb.Label(
+            main_frame,
+            text=f"单域名测试: {self.probe_settings.test_domain}",
+            font=(AppConfig.FONT_FAMILY, 10),
+        ).pack(anchor=tk.W)
+        workload_var = tk.BooleanVar(value=self.probe_settings.workload_test)
+
+        def on_workload_changed():
+            self.probe_settings.workload_test = workload_var.get()
+            self.save_workload_preference()
+
+        tb.Checkbutton(
+            main_frame,
+            text="按域名集回放测试（按权重统计延迟）",
+            variable=workload_var,
+            command=on_workload_changed,
+            bootstyle="round-toggle",
+        ).pack(anchor=tk.W, pady=(5, 10))
+        # 域名列表
+        list_frame = tb.Frame(main_frame)
+        list_frame.pack(fill=tk.BOTH, expand=True)
+        domain_listbox = tk.Listbox(list_frame, font=(AppConfig.FONT_FAMILY, 10))
+        domain_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = tb.Scrollbar(
+            list_frame, orient=tk.VERTICAL, command=domain_listbox.yview
+        )
+        domain_listbox.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        def refresh_domain_list():
+            domain_listbox.delete(0, tk.END)
+            for domain, rdtype, weight in self.domain_corpus.workload():
+                domain_listbox.insert(tk.END, f"{domain}  {rdtype}  权重 {weight:g}")
+
+        def import_log():
+            path = filedialog.askopenfilename(
+                parent=domain_dialog,
+                title="导入查询日志",
+                filetypes=[("文本文件", "*.txt *.log"), ("所有文件", "*.*")],
+            )
+            if not path:
+                return
+            try:
+                with open(path, encoding="utf-8", errors="ignore") as f:
+                    imported, skipped = self.domain_corpus.import_hostnames(f)
+                self.domain_corpus.trim(AppConfig.WORKLOAD_MAX_ITEMS)
+                self.save_domain_corpus()
+                refresh_domain_list()
+                self.show_notification(
+                    f"已导入 {imported} 条查询，跳过 {skipped} 条无效记录", SUCCESS
+                )
+            except OSError as e:
+                self.show_notification(f"导入查询日志失败: {str(e)}", DANGER)
+
+        def clear_domains():
+            if messagebox.askyesno("确认", "确定要清空域名集吗?", parent=domain_dialog):
+                self.domain_corpus.clear()
+                self.save_domain_corpus()
+                refresh_domain_list()
+
+        refresh_domain_list()
+        button_frame = tb.Frame(main_frame)
+        button_frame.pack(fill=tk.X, pady=(10, 0))
+        tb.Button(
+            button_frame, text="导入查询日志", command=import_log, bootstyle=SUCCESS
+        ).pack(side=tk.LEFT, padx=5)
+        tb.Button(
+            button_frame, text="清空", command=clear_domains, bootstyle=DANGER
+        ).pack(side=tk.LEFT, padx=5)
+        tb.Button(
+            button_frame,
+            text="关闭",
+            command=domain_dialog.destroy,
+            bootstyle=SECONDARY,
+        ).pack(side=tk.RIGHT, padx=5)
+
+    def save_domain_corpus(self):
+        """保存测试域名集合到配置文件"""
+        try:
+            with self.config_store.edit() as config:
+                self.domain_corpus.write_to_config(config)
+        except Exception as e:
+            print(f"保存测试域名失败: {e}")
+
+    def save_workload_preference(self):
+        """保存域名集回放开关到配置文件"""
+        try:
+            self.config_store.set(
+                "Main", "workload_test", str(self.probe_settings.workload_test)
+            )
+        except Exception as e:
+            print(f"保存域名集回放设置失败: {e}")
+
     def auto_save_selection(self):
         """自动保存当前类别选择"""
         try:
-            config = self._get_config_parser()
-            config.read(AppConfig.CONFIG_FILE, encoding="utf-8")
-            # 确保Main节存在
-            if "Main" not in config.sections():
-                config.add_section("Main")
             # 保存当前选择的类别
-            config.set("Main", "last_category", self.current_category)
-            self._save_config_file(config)
+            self.config_store.set("Main", "last_category", self.current_category)
         except Exception as e:
             print(f"自动保存选择失败: {e}")
 
     def save_theme_preference(self, theme_name):
         """保存主题偏好到配置文件"""
         try:
-            config = self._get_config_parser()
-            config.read(AppConfig.CONFIG_FILE, encoding="utf-8")
-            if "Main" not in config.sections():
-                config.add_section("Main")
-            config.set("Main", "theme", theme_name)
-            self._save_config_file(config)
+            self.config_store.set("Main", "theme", theme_name)
         except Exception as e:
             print(f"保存主题偏好失败: {e}")
 
+    def save_cold_test_preference(self):
+        """保存冷缓存测试开关到配置文件"""
+        try:
+            self.config_store.set("Main", "cold_test", str(self.cold_test_var.get()))
+        except Exception as e:
+            print(f"保存冷缓存测试设置失败: {e}")
+
+    def save_encrypted_test_preference(self):
+        """保存加密DNS测试开关到配置文件"""
+        try:
+            self.config_store.set(
+                "Main", "encrypted_test", str(self.encrypted_test_var.get())
+            )
+        except Exception as e:
+            print(f"保存加密DNS测试设置失败: {e}")
+
     def load_theme_preference(self):
         """从配置文件加载主题偏好"""
         try:
-            config = self._get_config_parser()
-            config.read(AppConfig.CONFIG_FILE, encoding="utf-8")
+            config = self.config_store.config
             if "Main" in config.sections() and config.has_option("Main", "theme"):
                 theme_name = config.get("Main", "theme")
                 # 将主题名称首字母大写
@@ -1078,22 +1472,17 @@ class DNSTesterApp:
     def save_category_order(self):
         """保存分类顺序"""
         try:
-            config = self._get_config_parser()
-            config.read(AppConfig.CONFIG_FILE, encoding="utf-8")
-            # 确保Main节存在
-            if "Main" not in config.sections():
-                config.add_section("Main")
             # 保存分类顺序
-            config.set("Main", "category_order", ",".join(self.dns_categories))
-            self._save_config_file(config)
+            self.config_store.set(
+                "Main", "category_order", ",".join(self.dns_categories)
+            )
         except Exception:
             pass
 
     def load_last_selection(self):
         """加载上次选择的类别"""
         try:
-            config = self._get_config_parser()
-            config.read(AppConfig.CONFIG_FILE, encoding="utf-8")
+            config = self.config_store.config
             if "Main" in config.sections():
                 # 获取上次选择的类别，如果不存在则使用None
                 last_category = config.get("Main", "last_category", fallback=None)
@@ -1116,33 +1505,16 @@ class DNSTesterApp:
     def auto_save_current_category(self):
         """自动保存当前类别的DNS配置"""
         try:
-            config = self._get_config_parser()
-            config_path = os.path.abspath(AppConfig.CONFIG_FILE)
-            print(f"正在保存配置到: {config_path}")
-            # 读取现有配置
-            self._load_existing_config(config, config_path)
-            # 更新当前类别
-            self._update_category_in_config(config)
-            # 保存DNS服务器
-            saved_count = self._save_dns_servers_to_config(config)
-            # 写入文件
-            self._write_config_to_file(config, config_path)
-            print(f"配置保存成功: {saved_count} 个DNS服务器已保存")
+            with self.config_store.edit() as config:
+                # 更新当前类别
+                self._update_category_in_config(config)
+                # 保存DNS服务器
+                saved_count = self._save_dns_servers_to_config(config)
+            # 文件由配置存储在后台合并写入，写入失败时见 _on_config_save_error
             self.show_notification(f"已保存 {saved_count} 个DNS服务器", SUCCESS)
-
-        except PermissionError as e:
-            self._handle_permission_error(e)
         except Exception as e:
             self._handle_save_error(e)
 
-    def _load_existing_config(self, config, config_path):
-        """加载现有配置"""
-        if os.path.exists(config_path):
-            config.read(config_path, encoding="utf-8")
-            print(f"已读取现有配置，包含 {len(config.sections())} 个分类")
-        else:
-            print("配置文件不存在，将创建新文件")
-
     def _update_category_in_config(self, config):
         """更新配置中的类别"""
         if self.current_category not in config.sections():
@@ -1157,22 +1529,12 @@ class DNSTesterApp:
         """保存DNS服务器到配置"""
         saved_count = 0
         for server in self.dns_servers:
-            value = (
-                f"{server['primary']},{server['secondary']}"
-                if server["secondary"]
-                else server["primary"]
-            )
-            config.set(self.current_category, server["name"], value)
+            config.set(self.current_category, server.name, server.config_value())
             saved_count += 1
 
         print(f"准备保存 {saved_count} 个DNS服务器到分类 {self.current_category}")
         return saved_count
 
-    def _write_config_to_file(self, config, config_path):
-        """写入配置到文件"""
-        with open(config_path, "w", encoding="utf-8") as f:
-            config.write(f)
-
     def _handle_permission_error(self, e):
         """处理权限错误"""
         error_msg = f"配置保存失败：没有写入权限 - {e}"
@@ -1187,37 +1549,17 @@ class DNSTesterApp:
 
     def save_config(self):
         """保存当前类别的DNS配置"""
-        config = self._get_config_parser()
         try:
             # 获取配置文件的完整路径
-            config_path = os.path.abspath("dns_servers.ini")
+            config_path = os.path.abspath(self.config_store.path)
             print(f"手动保存配置到: {config_path}")
 
-            # 先读取现有配置
-            if os.path.exists(config_path):
-                config.read(config_path, encoding="utf-8")
-
-            # 确保当前类别存在
-            if self.current_category not in config.sections():
-                config.add_section(self.current_category)
-            else:
-                # 清空当前类别的配置
-                config.remove_section(self.current_category)
-                config.add_section(self.current_category)
-
-            # 保存当前DNS服务器到当前类别
-            saved_count = 0
-            for server in self.dns_servers:
-                if server["secondary"]:
-                    value = f"{server['primary']},{server['secondary']}"
-                else:
-                    value = server["primary"]
-                config.set(self.current_category, server["name"], value)
-                saved_count += 1
+            with self.config_store.edit() as config:
+                self._update_category_in_config(config)
+                saved_count = self._save_dns_servers_to_config(config)
 
-            # 写入配置文件
-            with open(config_path, "w", encoding="utf-8") as f:
-                config.write(f)
+            # 手动保存时立即写入配置文件
+            self.config_store.flush()
 
             print(f"手动保存成功: {saved_count} 个DNS服务器")
             self.show_notification(
@@ -1233,6 +1575,65 @@ class DNSTesterApp:
             print(error_msg)
             self.show_notification(f"保存配置失败: {str(e)}", DANGER)
 
+    def import_dns(self):
+        """从CSV/JSON/文本文件批量导入DNS服务器到当前类别"""
+        path = filedialog.askopenfilename(
+            title=f"导入DNS服务器列表到 {self.current_category}",
+            filetypes=[
+                ("服务器列表", "*.csv *.json *.jsonl *.txt"),
+                ("所有文件", "*.*"),
+            ],
+        )
+        if not path:
+            return
+        category = self.current_category
+        existing = list(self.dns_servers)
+        self.update_status("正在读取服务器列表...")
+
+        def worker():
+            from dns_tester.importer import import_file
+
+            try:
+                result = import_file(path, category_version(category), existing)
+            except (OSError, ValueError) as e:
+                error = str(e)
+                self.root.after(
+                    0,
+                    lambda: self.show_notification(
+                        f"读取服务器列表失败: {error}", DANGER
+                    ),
+                )
+                return
+            self.root.after(0, lambda: self._apply_import(category, result))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _apply_import(self, category, result):
+        """确认后把导入结果一次写入配置"""
+        summary = (
+            f"跳过 {result.duplicates} 个重复地址，过滤 {len(result.rejected)} 个地址"
+        )
+        if not result.servers:
+            self.show_notification(f"没有可导入的DNS服务器（{summary}）", WARNING)
+            return
+        if category != self.current_category or not messagebox.askyesno(
+            "确认",
+            f"将 {len(result.servers)} 个DNS服务器导入到 {category}？\n{summary}",
+        ):
+            self.update_status("已取消导入")
+            return
+        with self.config_store.edit() as config:
+            for server in result.servers:
+                config.set(category, server.name, server.config_value())
+        for server in result.servers:
+            self.dns_servers.add(server)
+        self._servers_changed()
+        self.update_treeview()
+        self.show_notification(
+            f"已导入 {len(result.servers)} 个DNS服务器到 {category}（{summary}）",
+            SUCCESS,
+        )
+
     def add_dns(self):
         dns_dialog = tk.Toplevel(self.root)
         dns_dialog.title("添加DNS服务器")
@@ -1280,6 +1681,16 @@ class DNSTesterApp:
         )
         secondary_entry = tb.Entry(main_frame, width=25)
         secondary_entry.grid(row=3, column=1, padx=10, pady=5, sticky=tk.W + tk.E)
+        tb.Label(main_frame, text="DoH URL:", font=(AppConfig.FONT_FAMILY, 10)).grid(
+            row=4, column=0, padx=5, pady=5, sticky=tk.W
+        )
+        doh_entry = tb.Entry(main_frame, width=25)
+        doh_entry.grid(row=4, column=1, padx=10, pady=5, sticky=tk.W + tk.E)
+        tb.Label(main_frame, text="DoT主机:", font=(AppConfig.FONT_FAMILY, 10)).grid(
+            row=5, column=0, padx=5, pady=5, sticky=tk.W
+        )
+        dot_entry = tb.Entry(main_frame, width=25)
+        dot_entry.grid(row=5, column=1, padx=10, pady=5, sticky=tk.W + tk.E)
         main_frame.columnconfigure(1, weight=1)
 
         def add_and_close():
@@ -1287,6 +1698,8 @@ class DNSTesterApp:
             name = name_entry.get().strip()
             primary = primary_entry.get().strip()
             secondary = secondary_entry.get().strip()
+            doh = doh_entry.get().strip()
+            dot = dot_entry.get().strip()
             if not name or not primary:
                 messagebox.showerror("错误", "名称和主DNS不能为空")
                 return
@@ -1295,20 +1708,15 @@ class DNSTesterApp:
                 self.current_category = selected_category
                 self.category_combo.set(selected_category)
                 self.load_category_dns(selected_category)
-            self.dns_servers.append(
-                {
-                    "name": name,
-                    "primary": primary,
-                    "secondary": secondary,
-                }
-            )
+            self.dns_servers.add(Server(name, primary, secondary, doh, dot))
+            self._servers_changed()
             self.update_treeview()
             self.auto_save_current_category()  # 自动保存
             dns_dialog.destroy()
 
         # 创建按钮
         button_frame = tb.Frame(main_frame)
-        button_frame.grid(row=4, column=0, columnspan=2, pady=15)
+        button_frame.grid(row=6, column=0, columnspan=2, pady=15)
         tb.Button(
             button_frame, text="添加", command=add_and_close, bootstyle=SUCCESS
         ).pack(side=tk.LEFT, padx=10)
@@ -1317,75 +1725,148 @@ class DNSTesterApp:
         ).pack(side=tk.LEFT, padx=10)
         name_entry.focus()
 
+    def _selected_names(self):
+        """列表中选中的服务器名称（包括滚出可见区域的）"""
+        return [server.name for server in self.tree_view.selected_rows()]
+
     def remove_dns(self):
-        selected_items = self.tree.selection()
-        if not selected_items:
+        selected_names = self._selected_names()
+        if not selected_names:
             messagebox.showinfo("提示", "请先选择要删除的DNS服务器")
             return
         if messagebox.askyesno("确认", "确定要删除选中的DNS服务器吗?"):
-            for item in selected_items:
-                name = self.tree.item(item, "values")[0]
-                self.dns_servers = [s for s in self.dns_servers if s["name"] != name]
+            self.dns_servers.remove(selected_names)
+            self._servers_changed()
             self.update_treeview()
             self.auto_save_current_category()  # 自动保存
 
+    def _servers_changed(self):
+        """服务器列表的成员变化后，同步持续监控和转发器的上游地址"""
+        if self.monitor is not None:
+            self.monitor.update_servers(self.dns_servers)
+        self._update_forwarder_upstreams()
+
     def update_treeview(self):
-        # 清空当前所有项
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        # 填充数据
-        for index, server in enumerate(self.dns_servers):
-            name = server["name"]
-            primary = server["primary"]
-            secondary = server["secondary"]
-            # 获取测试结果
-            result = self.test_results.get(name, {})
-            primary_latency = result.get("primary_latency", "未测试")
-            secondary_latency = result.get("secondary_latency", "未测试")
-            status = result.get("status", "")
-            # 格式化延迟显示 (主DNS | 备用DNS)
-            if primary_latency != "未测试" and secondary_latency != "未测试":
-                if primary_latency == float("inf"):
-                    primary_str = "∞"
-                else:
-                    primary_str = f"{primary_latency:.1f}"
-                if secondary_latency == float("inf"):
-                    secondary_str = "∞"
-                else:
-                    secondary_str = f"{secondary_latency:.1f}"
-                latency_display = f"{primary_str} | {secondary_str}"
-            elif primary_latency != "未测试":
-                if primary_latency == float("inf"):
-                    latency_display = "∞ | -"
-                else:
-                    latency_display = f"{primary_latency:.1f} | -"
-            else:
-                latency_display = "未测试"
-            # 设置状态颜色
-            if status == "成功":
-                status_display = "✔ 成功"
-                tag = "success"
-            elif status == "失败":
-                status_display = "✘ 失败"
-                tag = "error"
-            else:
-                status_display = ""
-                tag = ""
-            # 设置交替行颜色和状态标签
-            row_type = "even" if index % 2 == 0 else "odd"
-            # 根据状态和行类型组合标签
-            if tag == "success":
-                final_tag = f"success_{row_type}"
-            elif tag == "error":
-                final_tag = f"error_{row_type}"
-            else:
-                final_tag = f"{row_type}row"
-            self.tree.insert(
-                "",
-                tk.END,
-                values=(name, primary, secondary, latency_display, status_display),
-                tags=(final_tag,),
+        """按 self.dns_servers（经筛选和排序）刷新列表，只生成可见行"""
+        self.tree_view.set_rows(self._view_rows())
+        count = len(self.tree_view)
+        if count != len(self.dns_servers):
+            self.status_var.set(f"显示 {count} / {len(self.dns_servers)} 个DNS服务器")
+
+    def _tree_row(self, server, index):
+        """生成一行的 (显示值, 标签)"""
+        name = server.name
+        primary = server.primary
+        secondary = server.secondary
+        # 获取测试结果
+        result = self.test_results.get(name, {})
+        primary_latency = result.get("primary_latency", "未测试")
+        secondary_latency = result.get("secondary_latency", "未测试")
+        status = result.get("status", "")
+        # 格式化延迟显示 (主DNS | 备用DNS)
+        if primary_latency != "未测试" and secondary_latency != "未测试":
+            primary_str = self._format_latency(
+                primary_latency, result.get("primary_stats")
+            )
+            secondary_str = self._format_latency(
+                secondary_latency, result.get("secondary_stats")
             )
+            latency_display = f"{primary_str} | {secondary_str}"
+        elif primary_latency != "未测试":
+            primary_str = self._format_latency(
+                primary_latency, result.get("primary_stats")
+            )
+            latency_display = f"{primary_str} | -"
+        else:
+            latency_display = "未测试"
+        # 冷缓存延迟 (主DNS | 备用DNS)
+        cold = result.get("cold")
+        if cold:
+            cold_display = "{} | {}".format(
+                self._format_latency(
+                    cold["primary_latency"], cold.get("primary_stats")
+                ),
+                self._format_latency(
+                    cold["secondary_latency"], cold.get("secondary_stats")
+                )
+                if "secondary_latency" in cold
+                else "-",
+            )
+        else:
+            cold_display = "-"
+        # 加密DNS延迟 (DoH | DoT)，括号中为首次握手耗时
+        encrypted_display = " | ".join(
+            self._format_encrypted(result.get(transport))
+            for transport in ("doh", "dot")
+        )
+        # 设置状态颜色
+        if status == "成功":
+            # 按主备切换模型计算的期望延迟，列表按它排序
+            status_display = f"✔ 成功 (预期 {result['latency']:.1f})"
+            tag = "success"
+        elif status == "失败":
+            status_display = "✘ 失败"
+            tag = "error"
+        else:
+            status_display = ""
+            tag = ""
+        # 设置交替行颜色和状态标签
+        row_type = "even" if index % 2 == 0 else "odd"
+        # 根据状态和行类型组合标签
+        if tag == "success":
+            final_tag = f"success_{row_type}"
+        elif tag == "error":
+            final_tag = f"error_{row_type}"
+        else:
+            final_tag = f"{row_type}row"
+        values = (
+            name,
+            primary,
+            secondary,
+            latency_display,
+            status_display,
+            cold_display,
+            encrypted_display,
+        )
+        return values, final_tag
+
+    def _format_encrypted(self, measurement):
+        """格式化一种加密传输的延迟：查询延迟(+握手)，未测试时为 -"""
+        if not measurement:
+            return "-"
+        if measurement["status"] != "成功":
+            return "✘"
+        latency = self._format_latency(measurement["latency"], measurement.get("stats"))
+        return f"{latency} (+{measurement['handshake']:.0f})"
+
+    def _queue_row_update(self, name, status=None):
+        """登记需要刷新的行，在 UI_FLUSH_MS 内合并为一次界面刷新（可在任意线程调用）"""
+        with self._ui_lock:
+            self._pending_rows.add(name)
+            if status is not None:
+                self._pending_status = status
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self.root.after(AppConfig.UI_FLUSH_MS, self._flush_row_updates)
+
+    def _flush_row_updates(self):
+        """原地更新登记过的行"""
+        with self._ui_lock:
+            names, self._pending_rows = self._pending_rows, set()
+            status, self._pending_status = self._pending_status, None
+            self._flush_scheduled = False
+        self.tree_view.refresh(names)
+        if status is not None:
+            self.status_var.set(status)
+
+    def _format_latency(self, latency, stats=None):
+        """格式化单个地址的延迟（中位数，或 P50/P95）"""
+        if latency == float("inf"):
+            return "∞"
+        if self.show_latency_p95 and stats:
+            return f"{stats['p50']:.1f}/{stats['p95']:.1f}"
+        return f"{latency:.1f}"
 
     def start_test(self):
         if not self.dns_servers:
@@ -1398,78 +1879,230 @@ class DNSTesterApp:
         threading.Thread(target=self.run_dns_tests, daemon=True).start()
 
     def run_dns_tests(self):
-        test_domain = "www.baidu.com"  # 测试域名
-        total = len(self.dns_servers)
-        for i, server in enumerate(self.dns_servers):
-            name = server["name"]
-            primary = server["primary"]
-            secondary = server["secondary"]
-            # 更新状态栏
-            self.root.after(
-                0,
-                lambda s=f"正在测试 {name} ({i + 1}/{total})...": self.status_var.set(
-                    s
-                ),
-            )
-            # 测试主DNS
-            latency_primary, status_primary = self.test_dns(primary, test_domain)
-            # 如果主DNS测试失败且有备用DNS，测试备用DNS
-            latency_secondary = None
-            if status_primary == "失败" and secondary:
-                latency_secondary, status_secondary = self.test_dns(
-                    secondary, test_domain
-                )
-            else:
-                latency_secondary, status_secondary = latency_primary, status_primary
-            # 计算平均延迟（如果两个都成功）
-            if status_primary == "成功" and status_secondary == "成功":
-                avg_latency = (latency_primary + latency_secondary) / 2
-            elif status_primary == "成功":
-                avg_latency = latency_primary
-            elif status_secondary == "成功":
-                avg_latency = latency_secondary
-            else:
-                avg_latency = float("inf")
-            # 保存测试结果
-            self.test_results[name] = {
-                "latency": round(avg_latency, 2)
-                if avg_latency != float("inf")
-                else "∞",
-                "status": "成功"
-                if status_primary == "成功" or status_secondary == "成功"
-                else "失败",
-                "primary_latency": latency_primary,
-                "primary_status": status_primary,
-                "secondary_latency": latency_secondary,
-                "secondary_status": status_secondary,
-            }
-            # 更新列表视图
-            self.root.after(0, self.update_treeview)
+        self._probe_servers(list(self.dns_servers), "测试")
         # 排序DNS服务器（延迟低的在前）
-        self.dns_servers.sort(
-            key=lambda s: self.test_results.get(s["name"], {}).get(
-                "latency", float("inf")
-            )
-            if self.test_results.get(s["name"], {}).get("status") == "成功"
-            else float("inf")
-        )
+        self._sort_servers_by_latency()
         # 更新列表视图
         self.root.after(0, self.update_treeview)
         self.root.after(0, lambda: self.status_var.set("测试完成"))
 
-    def test_dns(self, dns_server, domain):
+    def _probe_servers(self, servers, action):
+        """并发探测服务器，完成的结果按批原地刷新到列表中"""
+        total = len(servers)
+        completed = 0
+
+        def on_result(name, result):
+            nonlocal completed
+            completed += 1
+            self.test_results[name] = result
+            # 合并刷新该行和状态栏
+            self._queue_row_update(
+                name, f"正在{action} ({completed}/{total})，{name} 已完成"
+            )
+
+        from dns_tester.benchmark import make_dead_cache, run_benchmark
+
+        if self.dead_cache is None:
+            self.dead_cache = make_dead_cache(self.probe_settings)
+        # 域名集为空时退回单域名测试
+        results = run_benchmark(
+            servers,
+            self.probe_settings,
+            self.domain_corpus,
+            on_result,
+            self.dead_cache,
+        )
+        self._record_history(servers, results)
+
+    def _record_history(self, servers, results):
+        """把测试结果追加到历史记录"""
+        import sqlite3
+
+        from dns_tester.benchmark import record_results
+
+        try:
+            record_results(
+                self._history_store(),
+                servers,
+                results,
+                self.probe_settings,
+                self.domain_corpus,
+            )
+        except sqlite3.Error as e:
+            print(f"保存历史记录失败: {e}")
+
+    def _history_store(self):
+        """获取历史记录，首次调用时创建"""
+        from dns_tester.history import HistoryStore
+
+        if self.history is None:
+            self.history = HistoryStore(AppConfig.HISTORY_FILE, self.history_days)
+        return self.history
+
+    def on_monitor_changed(self):
+        """持续监控开关改变时的回调"""
+        if not self.monitor_var.get():
+            if self.monitor is not None:
+                self.monitor.stop()
+                self.monitor = None
+            self.failover_var.set(False)
+            self.update_status("持续监控已停止")
+            return
+        if not self.dns_servers:
+            self.monitor_var.set(False)
+            messagebox.showinfo("提示", "请先添加DNS服务器")
+            return
+        from dns_tester.monitor import Monitor
+
+        self.monitor = Monitor(
+            self.dns_servers,
+            self.probe_settings,
+            self.domain_corpus,
+            current_dns=lambda: self.get_current_dns_servers(
+                self.adapter_snapshot.get()
+            ),
+            on_update=self._on_monitor_update,
+            on_alert=lambda message: self.root.after(
+                0, lambda: self.show_notification(message, WARNING)
+            ),
+            interval=self.monitor_interval,
+            top_tier=self.monitor_top_tier,
+            history=self._history_store(),
+            on_decision=self._on_failover_decision,
+        )
+        if self.failover_var.get():
+            self.monitor.policy = self._create_failover_policy()
+        self.monitor.start()
+        self.update_status("持续监控中...")
+
+    def on_failover_changed(self):
+        """自动切换开关改变时的回调，开启时同时开启持续监控"""
+        if not self.failover_var.get():
+            if self.monitor is not None:
+                self.monitor.policy = None
+            self.update_status("自动切换已关闭")
+            return
+        if not self.dns_backend.supported:
+            self.failover_var.set(False)
+            self.show_notification(
+                f"不支持在 {platform.system()} 上修改DNS设置", WARNING
+            )
+            return
+        if not self.network_var.get():
+            self.failover_var.set(False)
+            messagebox.showerror("错误", "请先选择网络设备")
+            return
+        if self.monitor is None:
+            self.monitor_var.set(True)
+            self.on_monitor_changed()
+        else:
+            self.monitor.policy = self._create_failover_policy()
+        if self.monitor is None or self.monitor.policy is None:
+            self.failover_var.set(False)
+            return
+        self.update_status(f"自动切换已开启（{self.network_var.get()}）")
+
+    def _create_failover_policy(self):
+        """为当前选择的网络设备创建自动切换策略"""
+        from dns_tester.failover import FailoverPolicy
+
         try:
-            resolver = dns.resolver.Resolver()
-            resolver.nameservers = [dns_server]
-            resolver.timeout = 3  # 设置超时时间为3秒（IPv6可能需要更长时间）
-            resolver.lifetime = 3  # 设置查询生命周期为3秒
-            start_time = time.time()
-            answers = resolver.resolve(domain)  # noqa: F841
-            end_time = time.time()
-            latency = (end_time - start_time) * 1000  # 转换为毫秒
-            return latency, "成功"
-        except:  # noqa: E722
-            return float("inf"), "失败"
+            return FailoverPolicy.from_config(
+                self.dns_backend, self.network_var.get(), self.config_store.config
+            )
+        except ValueError as e:
+            self.failover_var.set(False)
+            self.show_notification(f"自动切换参数无效: {e}", DANGER)
+            return None
+
+    def _on_failover_decision(self, decision):
+        """自动切换评估结果（在监控线程中调用）"""
+        if not decision.switched:
+            return
+        self.root.after(
+            0,
+            lambda: self.show_notification(
+                f"已自动切换到 {decision.target}（{decision.reason}）", SUCCESS
+            ),
+        )
+        self.update_ip_display(invalidate=True)
+
+    def _on_monitor_update(self, results, ranking):
+        """持续监控每轮结束后在界面线程中刷新列表（在监控线程中调用）"""
+
+        def apply():
+            self.test_results.update(results)
+            order = {name: index for index, name in enumerate(ranking)}
+            self.dns_servers.sort(key=lambda s: order.get(s.name, len(order)))
+            self._update_forwarder_upstreams(ranking)
+            self.update_treeview()
+            status = f"持续监控中，{time.strftime('%H:%M:%S')} 探测了 {len(results)} 个服务器"
+            if self.forwarder is not None:
+                status += f"，转发缓存命中率 {self.forwarder.stats.hit_rate:.1f}%"
+            self.status_var.set(status)
+
+        self.root.after(0, apply)
+
+    def on_forwarder_changed(self):
+        """本地转发开关改变时的回调：在本机监听DNS查询，转发给排名靠前的服务器"""
+        if not self.forwarder_var.get():
+            if self.forwarder is not None:
+                self.forwarder.stop()
+                summary = self.forwarder.stats.summary()
+                self.forwarder = None
+                self.update_status(
+                    f"本地转发已停止（转发 {summary['queries']} 次，"
+                    f"缓存命中率 {summary['hit_rate']:.1f}%）"
+                )
+            return
+        from dns_tester.forwarder import Forwarder
+
+        try:
+            settings = ForwarderSettings.from_config(self.config_store.config)
+        except ValueError as e:
+            self.forwarder_var.set(False)
+            self.show_notification(f"转发器参数无效: {e}", DANGER)
+            return
+        forwarder = Forwarder.from_settings(settings)
+        try:
+            forwarder.start(settings.host, settings.port)
+        except OSError as e:
+            self.forwarder_var.set(False)
+            self.show_notification(
+                f"无法在 {settings.host}:{settings.port} 启动转发器: {e}", DANGER
+            )
+            return
+        self.forwarder = forwarder
+        self._update_forwarder_upstreams()
+        if forwarder.upstreams:
+            self.update_status(f"本地转发已启动（{settings.host}:{settings.port}）")
+        else:
+            self.show_notification("本地转发已启动，测试完成后开始转发", INFO)
+
+    def _update_forwarder_upstreams(self, ranking=None):
+        """按测试结果（或持续监控的排名）更新转发器的上游地址"""
+        forwarder = self.forwarder
+        if forwarder is None:
+            return
+        from dns_tester.forwarder import ranked_upstreams
+
+        forwarder.set_upstreams(
+            ranked_upstreams(list(self.dns_servers), self.test_results, ranking)
+        )
+
+    def _sort_servers_by_latency(self):
+        """按延迟排序DNS服务器（失败的排在最后）"""
+        from dns_tester.benchmark import rank_servers
+
+        self.dns_servers = ServerList(rank_servers(self.dns_servers, self.test_results))
+        self.sort_column = None
+        self._update_forwarder_upstreams()
+
+    def test_dns(self, dns_server, domain):
+        """测试单个DNS服务器，返回 (延迟毫秒, 状态)"""
+        from dns_tester.benchmark import make_engine
+
+        return make_engine(self.probe_settings).probe_once(dns_server, domain)
 
     def clear_results(self):
         self.test_results = {}
@@ -1478,46 +2111,26 @@ class DNSTesterApp:
 
     def move_to_category(self, target_category):
         """将选中的DNS服务器移动到其他分类"""
-        selected_items = self.tree.selection()
-        if not selected_items:
+        selected_names = self._selected_names()
+        if not selected_names:
             self.show_notification("请先选择要移动的DNS服务器", WARNING)
             return
-        # 获取选中的DNS服务器信息
-        servers_to_move = []
-        for item in selected_items:
-            name = self.tree.item(item, "values")[0]
-            for server in self.dns_servers:
-                if server["name"] == name:
-                    servers_to_move.append(server.copy())
-                    break
+        # 从内存中取出选中的DNS服务器
+        servers_to_move = self.dns_servers.remove(selected_names)
         if not servers_to_move:
             return
         try:
-            # 读取配置文件
-            config = configparser.ConfigParser()
-            config.read("dns_servers.ini", encoding="utf-8")
-            # 确保目标分类存在
-            if target_category not in config.sections():
-                config.add_section(target_category)
-            # 将DNS服务器添加到目标分类
-            for server in servers_to_move:
-                if server["secondary"]:
-                    value = f"{server['primary']},{server['secondary']}"
-                else:
-                    value = server["primary"]
-                config.set(target_category, server["name"], value)
-            # 从当前分类中删除
-            for server in servers_to_move:
-                if config.has_option(self.current_category, server["name"]):
-                    config.remove_option(self.current_category, server["name"])
-                # 从内存中删除
-                self.dns_servers = [
-                    s for s in self.dns_servers if s["name"] != server["name"]
-                ]
-            # 保存配置文件
-            with open("dns_servers.ini", "w", encoding="utf-8") as f:
-                config.write(f)
+            with self.config_store.edit() as config:
+                # 确保目标分类存在
+                if target_category not in config.sections():
+                    config.add_section(target_category)
+                for server in servers_to_move:
+                    # 将DNS服务器添加到目标分类，并从当前分类中删除
+                    config.set(target_category, server.name, server.config_value())
+                    if config.has_option(self.current_category, server.name):
+                        config.remove_option(self.current_category, server.name)
             # 更新界面
+            self._servers_changed()
             self.update_treeview()
             # 显示通知
             count = len(servers_to_move)
@@ -1528,194 +2141,42 @@ class DNSTesterApp:
             self.show_notification(f"移动DNS服务器失败: {str(e)}", DANGER)
 
     def clear_dns_cache(self):
-        """使用WMI清理系统DNS缓存"""
-        try:
-            # 初始化COM环境
-            pythoncom.CoInitialize()
-            # 连接到WMI服务的网络客户端命名空间
-            wmi = win32com.client.GetObject("winmgmts:\\\\.\\root\\StandardCimv2")
-            # 获取DNS客户端配置对象
-            dns_clients = wmi.ExecQuery("SELECT * FROM MSFT_DNSClientCache")
-            if not dns_clients:
-                self.show_notification("未找到DNS缓存对象", DANGER)
-            # 清理DNS缓存
-            for client in dns_clients:
-                result = client.ClearCache()
-                # 检查结果 (0表示成功)
-                if result == 0:
-                    self.show_notification("DNS缓存已清理", SUCCESS)
-                else:
-                    raise Exception(f"WMI执行失败，错误代码: {result[0]}")
-            return False, "未执行DNS缓存清理操作"
-        except Exception:
-            self.show_notification("清理DNS缓存失败", DANGER)
-        finally:
-            # 释放COM环境
-            pythoncom.CoUninitialize()
+        """清理系统DNS缓存（在后台线程中执行）"""
 
-    def _set_dns_via_wmi(self, adapter_name, dns_servers=None, enable_dhcp=False):
-        """使用WMI设置DNS服务器"""
-        try:
-            pythoncom.CoInitialize()
-            # 使用Dispatch创建WMI对象，这样更可靠
-            wmi_service = win32com.client.Dispatch("WbemScripting.SWbemLocator")
-            wmi = wmi_service.ConnectServer(".", "root\\cimv2")
-
-            # 首先获取所有启用的网络适配器配置
-            configs = wmi.ExecQuery(
-                "SELECT * FROM Win32_NetworkAdapterConfiguration WHERE IPEnabled = True"
-            )
+        def done(cleared):
+            if cleared is None:
+                self.show_notification("清理DNS缓存失败", DANGER)
+            elif cleared:
+                self.show_notification("DNS缓存已清理", SUCCESS)
+            else:
+                self.show_notification("未找到DNS缓存对象", DANGER)
 
-            # 获取网络适配器信息以匹配名称
-            adapters = wmi.ExecQuery(
-                "SELECT * FROM Win32_NetworkAdapter WHERE NetEnabled = True"
-            )
-            adapter_map = {}
-            for adapter in adapters:
-                adapter_map[str(adapter.DeviceID)] = {
-                    "name": adapter.Name,
-                    "net_connection_id": adapter.NetConnectionID,
-                }
-
-            # 查找匹配的适配器配置
-            target_config = None
-            for config in configs:
-                adapter_info = adapter_map.get(str(config.Index), {})
-                # 优先匹配NetConnectionID（友好名称），然后匹配Name
-                friendly_name = adapter_info.get("net_connection_id", "")
-                adapter_full_name = adapter_info.get("name", "")
-
-                if (
-                    friendly_name == adapter_name
-                    or adapter_full_name == adapter_name
-                    or adapter_name in friendly_name
-                    or adapter_name in adapter_full_name
-                ):
-                    target_config = config
-                    print(f"找到匹配的网络适配器: {friendly_name or adapter_full_name}")
-                    break
-
-            if not target_config:
-                print(f"未找到网络适配器: {adapter_name}")
-                return False
-
-            # 调用WMI方法设置DNS
-            try:
-                # 检查对象类型和可用方法
-                print(f"target_config类型: {type(target_config)}")
-
-                # 尝试使用ExecMethod调用
-                if enable_dhcp:
-                    print("设置DNS为DHCP自动获取")
-                    try:
-                        # 创建方法参数对象
-                        method_params = target_config.Methods_(
-                            "SetDNSServerSearchOrder"
-                        ).InParameters.SpawnInstance_()
-                        method_params.DNSServerSearchOrder = None
-                        result = target_config.ExecMethod_(
-                            "SetDNSServerSearchOrder", method_params
-                        )
-                    except Exception as e:
-                        print(f"ExecMethod DHCP调用失败: {e}")
-                        # 尝试直接调用
-                        result = target_config.ExecMethod_("SetDNSServerSearchOrder")
-                else:
-                    if dns_servers:
-                        dns_list = list(dns_servers)
-                        print(f"设置DNS服务器列表: {dns_list}")
-                        try:
-                            # 创建方法参数对象
-                            method_params = target_config.Methods_(
-                                "SetDNSServerSearchOrder"
-                            ).InParameters.SpawnInstance_()
-                            method_params.DNSServerSearchOrder = dns_list
-                            result = target_config.ExecMethod_(
-                                "SetDNSServerSearchOrder", method_params
-                            )
-                        except Exception as e:
-                            print(f"ExecMethod静态DNS调用失败: {e}")
-                            return False
-                    else:
-                        print("DNS服务器列表为空")
-                        return False
-
-                # 处理返回结果
-                print(f"WMI调用原始结果: {result}")
-                print(f"结果类型: {type(result)}")
-
-                # ExecMethod返回的是一个对象，需要获取ReturnValue属性
-                error_code = None
-                try:
-                    # 打印所有可用属性以便调试
-                    print(
-                        f"result对象的属性: {[attr for attr in dir(result) if not attr.startswith('_')]}"
-                    )
+        self._when_done(self.dns_executor.submit(self.dns_backend.flush_cache), done)
 
-                    # 尝试多种方式获取返回值
-                    if hasattr(result, "ReturnValue"):
-                        error_code = result.ReturnValue
-                        print(f"从ReturnValue获取: {error_code}")
-                    elif hasattr(result, "Properties_"):
-                        try:
-                            # 尝试从Properties中获取ReturnValue
-                            return_value_prop = result.Properties_("ReturnValue")
-                            if return_value_prop:
-                                error_code = return_value_prop.Value
-                                print(f"从Properties获取: {error_code}")
-                        except:
-                            # 尝试遍历所有属性
-                            try:
-                                for prop in result.Properties_:
-                                    print(f"属性: {prop.Name} = {prop.Value}")
-                                    if prop.Name == "ReturnValue":
-                                        error_code = prop.Value
-                                        break
-                            except Exception as e2:
-                                print(f"遍历属性失败: {e2}")
-
-                    # 如果还是没有获取到，尝试直接访问
-                    if error_code is None:
-                        try:
-                            error_code = int(result)
-                        except:
-                            error_code = 0  # 假设成功，因为方法调用没有抛出异常
-                            print("无法获取错误代码，假设成功")
-
-                except Exception as e:
-                    print(f"提取错误代码失败: {e}")
-                    error_code = 0  # 假设成功
-
-                print(f"提取的错误代码: {error_code}")
-
-                if error_code == 0:
-                    action = "DHCP DNS" if enable_dhcp else "静态DNS"
-                    print(f"WMI设置{action}成功")
-                    return True
-                else:
-                    action = "DHCP DNS" if enable_dhcp else "静态DNS"
-                    print(f"WMI设置{action}失败，错误代码: {error_code}")
-                    return False
+    def _when_done(self, future, callback):
+        """后台操作完成后在界面线程中调用 callback(结果)，操作出错时结果为 None"""
 
+        def done(f):
+            try:
+                result = f.result()
             except Exception as e:
-                print(f"WMI方法调用失败: {e}")
-                print(f"异常类型: {type(e)}")
-                import traceback
+                print(f"系统DNS操作失败: {e}")
+                result = None
+            self.root.after(0, lambda: callback(result))
 
-                traceback.print_exc()
-                return False
+        future.add_done_callback(done)
 
-        except Exception as e:
-            print(f"WMI设置DNS失败: {e}")
-            import traceback
-
-            traceback.print_exc()
-            return False
-        finally:
-            try:
-                pythoncom.CoUninitialize()
-            except:
-                pass
+    def _set_system_dns(self, adapter_name, dns_servers=None, enable_dhcp=False):
+        """在后台线程中设置DNS服务器，返回 Future（结果为是否成功）"""
+        if enable_dhcp:
+            future = self.dns_executor.submit(self.dns_backend.reset_dns, adapter_name)
+        else:
+            future = self.dns_executor.submit(
+                self.dns_backend.set_dns, adapter_name, dns_servers
+            )
+        # DNS设置可能已经改变，下次读取时重新查询适配器信息
+        future.add_done_callback(lambda f: self.adapter_snapshot.invalidate())
+        return future
 
     def reset_to_dhcp(self):
         """恢复DNS为DHCP自动获取"""
@@ -1726,17 +2187,21 @@ class DNSTesterApp:
                 self.show_notification("请先选择网络连接", WARNING)
                 return
 
-            # 使用WMI设置
-            if self._set_dns_via_wmi(selected_connection, enable_dhcp=True):
-                self.show_notification(
-                    f"已将 {selected_connection} 的DNS设置为自动获取", SUCCESS
-                )
-                # 刷新DNS显示
-                threading.Thread(target=self._refresh_dns_display, daemon=True).start()
-            else:
-                print("WMI设置DHCP失败")
-                self.show_notification("恢复DNS为自动获取失败", DANGER)
+            def done(success):
+                if success:
+                    self.show_notification(
+                        f"已将 {selected_connection} 的DNS设置为自动获取", SUCCESS
+                    )
+                    # 刷新DNS显示
+                    self.update_ip_display(invalidate=True)
+                else:
+                    print("设置DHCP失败")
+                    self.show_notification("恢复DNS为自动获取失败", DANGER)
 
+            # 在后台线程中设置，完成后回到界面线程
+            self._when_done(
+                self._set_system_dns(selected_connection, enable_dhcp=True), done
+            )
         except Exception as e:
             print(f"恢复DHCP DNS失败: {e}")
             self.show_notification("恢复DNS为自动获取失败", DANGER)
@@ -1745,12 +2210,11 @@ class DNSTesterApp:
         # 选中鼠标点击的项
         item = self.tree.identify_row(event.y)
         if item:
-            # 如果点击的项没有被选中，则选中它
+            # 如果点击的项没有被选中，则只选中它
             if item not in self.tree.selection():
-                self.tree.selection_set(item)
+                self.tree_view.select_item(item)
             # 获取当前选中的项数量
-            selected_items = self.tree.selection()
-            selected_count = len(selected_items)
+            selected_count = len(self._selected_names())
             # 清空现有菜单
             self.popup_menu.delete(0, tk.END)
             if selected_count == 1:
@@ -1785,23 +2249,27 @@ class DNSTesterApp:
         item = self.tree.identify_row(event.y)
         if item:
             # 选中该项目
-            self.tree.selection_set(item)
-            self.tree.focus(item)
+            self.tree_view.select_item(item)
             # 调用应用DNS方法
             self.apply_dns()
 
     def apply_dns(self):
         """应用选中的DNS服务器（包括主DNS和备用DNS）"""
-        selected_items = self.tree.selection()
-        if not selected_items:
+        selected_servers = self.tree_view.selected_rows()
+        if not selected_servers:
             messagebox.showinfo("提示", "请先选择DNS服务器")
             return
-        if len(selected_items) > 1:
+        if len(selected_servers) > 1:
             messagebox.showinfo("提示", "一次只能设置一个DNS服务器")
             return
-        item = selected_items[0]
-        name, dns_primary, dns_secondary, _, status = self.tree.item(item, "values")
-        if status != "✔ 成功":
+        server = selected_servers[0]
+        name, dns_primary, dns_secondary = (
+            server.name,
+            server.primary,
+            server.secondary,
+        )
+        status = self.test_results.get(name, {}).get("status")
+        if status != "成功":
             if messagebox.askyesno("警告", f"{name} 测试失败，确定要设置为系统DNS吗?"):
                 pass
             else:
@@ -1815,37 +2283,37 @@ class DNSTesterApp:
             messagebox.showinfo("提示", f"{name} 的主DNS为空")
             return
         # 设置DNS（包括主DNS和备用DNS）
-        result = self.set_network_dns(selected_connection, dns_primary, dns_secondary)
-        if result:
-            dns_info = f"主DNS: {dns_primary}"
-            if dns_secondary and dns_secondary.strip():
-                dns_info += f", 备用DNS: {dns_secondary}"
-            self.show_notification(f"已应用 {name} 的DNS设置 ({dns_info})", SUCCESS)
-            # 刷新DNS显示
-            threading.Thread(target=self._refresh_dns_display, daemon=True).start()
-        else:
-            self.show_notification(f"应用 {name} 的DNS设置失败", DANGER)
+        future = self.set_network_dns(selected_connection, dns_primary, dns_secondary)
+        if future is None:
+            return
 
-    def _refresh_dns_display(self):
-        """在后台线程中刷新DNS显示"""
-        time.sleep(2)  # 等待DNS设置生效
-        self.root.after(0, self.update_ip_display)
+        def done(success):
+            if success:
+                dns_info = f"主DNS: {dns_primary}"
+                if dns_secondary and dns_secondary.strip():
+                    dns_info += f", 备用DNS: {dns_secondary}"
+                self.show_notification(f"已应用 {name} 的DNS设置 ({dns_info})", SUCCESS)
+                # 刷新DNS显示
+                self.update_ip_display(invalidate=True)
+            else:
+                self.show_notification(f"应用 {name} 的DNS设置失败", DANGER)
+
+        self._when_done(future, done)
 
     def delete_selected_rows(self):
         """删除选中的行"""
-        selected_items = self.tree.selection()
-        if not selected_items:
+        selected_names = self._selected_names()
+        if not selected_names:
             messagebox.showinfo("提示", "请先选择要删除的DNS服务器")
             return
         if messagebox.askyesno(
-            "确认", f"确定要删除选中的 {len(selected_items)} 个DNS服务器吗?"
+            "确认", f"确定要删除选中的 {len(selected_names)} 个DNS服务器吗?"
         ):
-            for item in selected_items:
-                name = self.tree.item(item, "values")[0]
-                self.dns_servers = [s for s in self.dns_servers if s["name"] != name]
+            self.dns_servers.remove(selected_names)
+            self._servers_changed()
             self.update_treeview()
             self.auto_save_current_category()  # 自动保存
-            self.show_notification(f"已删除 {len(selected_items)} 个DNS服务器", SUCCESS)
+            self.show_notification(f"已删除 {len(selected_names)} 个DNS服务器", SUCCESS)
 
     def load_network_connections(self):
         """加载网络连接到下拉框"""
@@ -1857,24 +2325,35 @@ class DNSTesterApp:
         connections = self.get_network_connections()
         self.root.after(0, lambda: self._update_network_combo(connections))
 
-    def _update_network_combo(self, connections):
-        """更新网络设备下拉框"""
+    def _update_network_combo(self, connections, announce=True):
+        """更新网络设备下拉框，已选择的设备仍然存在时保持选择"""
         self.network_connections = connections
         self.network_combo["values"] = connections
         if connections:
-            self.network_combo.set(connections[0])
-            self.update_status(f"已加载 {len(connections)} 个网络设备")
+            if self.network_var.get() not in connections:
+                self.network_combo.set(connections[0])
+            if announce:
+                self.update_status(f"已加载 {len(connections)} 个网络设备")
         else:
             self.network_combo.set("")
-            self.update_status("未找到可用的网络设备")
+            if announce:
+                self.update_status("未找到可用的网络设备")
         # 更新IP地址显示
         self.update_ip_display()
 
-    def update_ip_display(self):
-        """更新IP地址、网关和DNS显示"""
-        ip = self.get_local_ip()
-        gateway = self.get_default_gateway()
-        dns_servers = self.get_current_dns_servers()
+    def update_ip_display(self, invalidate=False):
+        """在后台线程读取适配器快照，再更新IP地址、网关和DNS显示"""
+
+        def on_snapshot(adapters):
+            ip = self.get_local_ip(adapters)
+            gateway = default_gateway(adapters) or "无法获取"
+            dns_servers = self.get_current_dns_servers(adapters)
+            self.root.after(0, lambda: self._show_ip_info(ip, gateway, dns_servers))
+
+        self.adapter_snapshot.refresh(on_snapshot, invalidate=invalidate)
+
+    def _show_ip_info(self, ip, gateway, dns_servers):
+        """在界面线程中更新显示"""
         self.current_ip = ip
         self.ip_var.set(ip)
         self.gateway_var.set(gateway)
@@ -1886,28 +2365,21 @@ class DNSTesterApp:
 
     def get_network_connections(self):
         """获取可用的网络连接列表"""
-        if platform.system() == "Windows":
-            try:
-                # 使用WMI获取网络适配器信息
-                adapters = self._get_network_adapters_info()
-                connections = []
-                for adapter in adapters:
-                    # 只添加有IP地址的适配器
-                    if adapter["ipv4_addresses"] or adapter["ipv6_addresses"]:
-                        connections.append(adapter["name"])
-                return connections if connections else ["未找到网络连接"]
-            except Exception as e:
-                print(f"获取网络连接失败: {e}")
-                # 备选方案：返回常见的网络连接名称
-                return ["以太网", "WLAN", "Wi-Fi"]
-        else:
-            return []
+        # 点击刷新或网络变化时重新查询适配器信息
+        self.adapter_snapshot.invalidate()
+        connections = [
+            adapter["name"]
+            for adapter in self.adapter_snapshot.get()
+            # 只添加有IP地址的适配器
+            if adapter["ipv4_addresses"] or adapter["ipv6_addresses"]
+        ]
+        return connections if connections else ["未找到网络连接"]
 
     def set_network_dns(self, connection_name, primary_dns, secondary_dns=None):
-        """设置指定网络连接的DNS服务器"""
-        if platform.system() != "Windows":
-            self.show_notification("此功能仅支持Windows系统", WARNING)
-            return False
+        """设置指定网络连接的DNS服务器
+
+        设置在后台线程中进行，返回 Future（结果为是否成功），出错时返回 None。
+        """
         try:
             print(f"开始设置DNS - 连接: {connection_name}")
             print(f"主DNS: {primary_dns}")
@@ -1919,19 +2391,12 @@ class DNSTesterApp:
             if secondary_dns and secondary_dns.strip():
                 dns_servers.append(secondary_dns)
 
-            # 使用WMI设置DNS
-            if self._set_dns_via_wmi(connection_name, dns_servers):
-                print("WMI设置DNS成功")
-                return True
-            else:
-                print("WMI设置DNS失败")
-                return False
-
+            return self._set_system_dns(connection_name, dns_servers)
         except Exception as e:
             error_msg = f"设置DNS时发生未知错误: {e}"
             print(error_msg)
             self.show_notification("DNS设置失败", DANGER)
-            return False
+            return None
 
     def run_as_admin(self, command):
         """以管理员权限运行命令"""
@@ -1945,19 +2410,10 @@ class DNSTesterApp:
             return False
 
     def refresh_status(self):
-        selected_items = self.tree.selection()
-        if not selected_items:
-            messagebox.showinfo("提示", "请先选择DNS服务器")
-            return
         # 获取选中的服务器
-        selected_servers = []
-        for item in selected_items:
-            name = self.tree.item(item, "values")[0]
-            for server in self.dns_servers:
-                if server["name"] == name:
-                    selected_servers.append(server)
-                    break
+        selected_servers = self.tree_view.selected_rows()
         if not selected_servers:
+            messagebox.showinfo("提示", "请先选择DNS服务器")
             return
         # 启动测试线程
         self.update_status("正在刷新DNS服务器状态...")
@@ -1966,61 +2422,14 @@ class DNSTesterApp:
         ).start()
 
     def refresh_selected_dns(self, servers):
-        test_domain = "www.baidu.com"  # 测试域名
-        total = len(servers)
-        for i, server in enumerate(servers):
-            name = server["name"]
-            # 更新状态栏
-            self.root.after(
-                0,
-                lambda s=f"正在刷新 {name} ({i + 1}/{total})...": self.status_var.set(
-                    s
-                ),
-            )
-            # 测试主DNS
-            latency_primary, status_primary = self.test_dns(
-                server["primary"], test_domain
-            )
-            # 如果主DNS测试失败且有备用DNS，测试备用DNS
-            latency_secondary = None
-            if status_primary == "失败" and server["secondary"]:
-                latency_secondary, status_secondary = self.test_dns(
-                    server["secondary"], test_domain
-                )
-            else:
-                latency_secondary, status_secondary = latency_primary, status_primary
-            # 计算平均延迟（如果两个都成功）
-            if status_primary == "成功" and status_secondary == "成功":
-                avg_latency = (latency_primary + latency_secondary) / 2
-            elif status_primary == "成功":
-                avg_latency = latency_primary
-            elif status_secondary == "成功":
-                avg_latency = latency_secondary
-            else:
-                avg_latency = float("inf")
-            # 保存测试结果
-            self.test_results[name] = {
-                "latency": round(avg_latency, 2)
-                if avg_latency != float("inf")
-                else "∞",
-                "status": "成功"
-                if status_primary == "成功" or status_secondary == "成功"
-                else "失败",
-                "primary_latency": latency_primary,
-                "primary_status": status_primary,
-                "secondary_latency": latency_secondary,
-                "secondary_status": status_secondary,
-            }
-            # 更新列表视图
-            self.root.after(0, self.update_treeview)
+        # 手动检测时重新探测之前判定为无响应的地址
+        if self.dead_cache is not None:
+            for server in servers:
+                self.dead_cache.mark_alive(server.primary)
+                self.dead_cache.mark_alive(server.secondary)
+        self._probe_servers(servers, "刷新")
         # 重新排序DNS服务器（延迟低的在前）
-        self.dns_servers.sort(
-            key=lambda s: self.test_results.get(s["name"], {}).get(
-                "latency", float("inf")
-            )
-            if self.test_results.get(s["name"], {}).get("status") == "成功"
-            else float("inf")
-        )
+        self._sort_servers_by_latency()
         # 更新列表视图
         self.root.after(0, self.update_treeview)
         self.root.after(0, lambda: self.status_var.set("刷新完成"))
@@ -2074,8 +2483,9 @@ def run_as_admin():
 
 
 if __name__ == "__main__":
-    # 强制要求管理员权限运行
-    if not is_admin():
+    windows = platform.system() == "Windows"
+    # Windows上强制要求管理员权限运行；其他系统修改DNS时需要以root运行
+    if windows and not is_admin():
         print("检测到程序未以管理员权限运行")
         print("正在以管理员权限重新启动程序...")
         # 直接以管理员权限重启，不显示选择对话框
@@ -2097,14 +2507,15 @@ if __name__ == "__main__":
             )
             root.destroy()
             sys.exit(1)
-    else:
+    elif windows:
         print("程序已以管理员权限运行")
 
     # 使用默认主题创建窗口
     root = tb.Window(themename="darkly")
-    # 设置窗口标题（只显示管理员权限）
-    root.title("DNS服务器测试工具（管理员权限）")
-    root.iconbitmap("c:/Users/ccy/Documents/vscode/DNS/icon.ico")
+    if windows:
+        # 设置窗口标题（只显示管理员权限）
+        root.title("DNS服务器测试工具（管理员权限）")
+        root.iconbitmap("c:/Users/ccy/Documents/vscode/DNS/icon.ico")
     # 创建应用程序实例
     app = DNSTesterApp(root)
 
@@ -0,0 +1,160 @@
+"""网络适配器快照：缓存时间、失效和后台刷新"""
+
+import threading
+import unittest
+
+from dns_tester.adapters import (
+    AdapterSnapshot,
+    current_dns,
+    default_gateway,
+    local_ipv4,
+)
+from dns_tester.system_dns import FakeSystemBackend
+
+ADAPTERS = [
+    {
+        "name": "lo",
+        "index": 1,
+        "mac": "",
+        "ipv4_addresses": ["127.0.0.1"],
+        "ipv6_addresses": ["::1"],
+        "ipv4_gateways": [],
+        "ipv6_gateways": [],
+        "dns_servers": [],
+        "dhcp_enabled": False,
+    },
+    {
+        "name": "以太网 2",
+        "index": 2,
+        "mac": "00:11:22:33:44:55",
+        "ipv4_addresses": ["169.254.1.1", "192.0.2.10"],
+        "ipv6_addresses": [],
+        "ipv4_gateways": ["192.0.2.1"],
+        "ipv6_gateways": [],
+        "dns_servers": ["192.0.2.53", "198.51.100.53"],
+        "dhcp_enabled": True,
+    },
+]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class AdapterSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = FakeSystemBackend(ADAPTERS)
+        self.clock = FakeClock()
+        self.snapshot = AdapterSnapshot(self.backend, ttl=5.0, clock=self.clock)
+
+    def test_cached_within_ttl(self):
+        first = self.snapshot.get()
+        self.clock.now = 4.9
+        self.assertIs(self.snapshot.get(), first)
+        self.assertEqual(self.backend.queries, 1)
+        self.clock.now = 5.0
+        self.snapshot.get()
+        self.assertEqual(self.backend.queries, 2)
+
+    def test_invalidate_requeries(self):
+        self.snapshot.get()
+        self.backend.set_dns("以太网 2", ["1.1.1.1"])
+        self.assertEqual(
+            current_dns(self.snapshot.get()), ["192.0.2.53", "198.51.100.53"]
+        )
+        self.snapshot.invalidate()
+        self.assertEqual(current_dns(self.snapshot.get()), ["1.1.1.1"])
+        self.assertEqual(self.backend.queries, 2)
+
+    def test_failure_returns_empty_and_is_not_cached(self):
+        self.backend.fail = True
+        self.assertEqual(self.snapshot.get(), [])
+        self.backend.fail = False
+        self.assertEqual(len(self.snapshot.get()), 2)
+        self.assertEqual(self.backend.queries, 2)
+
+    def test_refresh_calls_back_with_snapshot(self):
+        done = threading.Event()
+        received = []
+
+        def callback(adapters):
+            received.append(adapters)
+            done.set()
+
+        self.snapshot.refresh(callback, invalidate=True)
+        self.assertTrue(done.wait(5))
+        self.assertEqual([a["name"] for a in received[0]], ["lo", "以太网 2"])
+
+    def test_concurrent_refreshes_share_one_query(self):
+        gate = threading.Event()
+        list_adapters = self.backend.list_adapters
+
+        def slow_list_adapters():
+            gate.wait(5)
+            return list_adapters()
+
+        self.backend.list_adapters = slow_list_adapters
+        results = []
+        finished = threading.Semaphore(0)
+
+        def callback(adapters):
+            results.append(adapters)
+            finished.release()
+
+        for _ in range(5):
+            self.snapshot.refresh(callback)
+        gate.set()
+        for _ in range(5):
+            self.assertTrue(finished.acquire(timeout=5))
+        self.assertEqual(self.backend.queries, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_refresh_after_invalidate_waits_for_new_query(self):
+        started = threading.Event()
+        gate = threading.Event()
+        list_adapters = self.backend.list_adapters
+
+        def slow_list_adapters():
+            # 查询结果在修改DNS之前就已取得
+            adapters = list_adapters()
+            started.set()
+            gate.wait(5)
+            return adapters
+
+        self.backend.list_adapters = slow_list_adapters
+        received = {}
+        finished = threading.Semaphore(0)
+
+        def callback(key):
+            def deliver(adapters):
+                received[key] = current_dns(adapters)
+                finished.release()
+
+            return deliver
+
+        self.snapshot.refresh(callback("before"))
+        self.assertTrue(started.wait(5))
+        self.backend.set_dns("以太网 2", ["1.1.1.1"])
+        self.snapshot.refresh(callback("after"), invalidate=True)
+        gate.set()
+        for _ in range(2):
+            self.assertTrue(finished.acquire(timeout=5))
+        self.assertEqual(received["before"], ["192.0.2.53", "198.51.100.53"])
+        self.assertEqual(received["after"], ["1.1.1.1"])
+        self.assertEqual(self.backend.queries, 2)
+
+
+class AdapterHelpersTest(unittest.TestCase):
+    def test_helpers_skip_loopback_and_apipa(self):
+        self.assertEqual(local_ipv4(ADAPTERS), "192.0.2.10")
+        self.assertEqual(default_gateway(ADAPTERS), "192.0.2.1")
+        self.assertEqual(current_dns(ADAPTERS, "lo"), [])
+        self.assertEqual(current_dns(ADAPTERS, "missing"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
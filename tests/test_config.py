@@ -0,0 +1,62 @@
+"""配置文件读写：原子替换保留权限，重新读取手动修改"""
+
+import os
+import stat
+import tempfile
+import unittest
+
+from dns_tester.config import ConfigStore, replace_file
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+class ReplaceFileTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "dns_servers.ini")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_keeps_existing_mode(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("[Main]\n")
+        os.chmod(self.path, 0o640)
+        replace_file(self.path, "[Main]\ntheme = flatly\n")
+        self.assertEqual(_mode(self.path), 0o640)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "[Main]\ntheme = flatly\n")
+
+    def test_new_file_is_world_readable(self):
+        replace_file(self.path, "[Main]\n")
+        self.assertEqual(_mode(self.path), 0o644)
+        self.assertEqual(os.listdir(self.tmp.name), ["dns_servers.ini"])
+
+    def test_store_flush_keeps_mode(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("[Main]\n")
+        os.chmod(self.path, 0o664)
+        store = ConfigStore(self.path, delay=60)
+        store.set("Main", "theme", "flatly")
+        self.assertTrue(store.flush())
+        self.assertEqual(_mode(self.path), 0o664)
+
+    def test_reload_reads_hand_edits(self):
+        store = ConfigStore(self.path, delay=60)
+        store.set("Main", "theme", "flatly")
+        # 未保存的修改先写回再重新读取
+        store.reload()
+        self.assertFalse(store.dirty)
+        self.assertEqual(store.config.get("Main", "theme"), "flatly")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n[Ipv4_Test]\nlocal = 192.0.2.1,,True\n")
+        self.assertFalse(store.config.has_section("Ipv4_Test"))
+        store.reload()
+        self.assertTrue(store.config.has_section("Ipv4_Test"))
+        self.assertEqual(store.config.get("Main", "theme"), "flatly")
+
+
+if __name__ == "__main__":
+    unittest.main()
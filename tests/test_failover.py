@@ -0,0 +1,108 @@
+"""自动切换策略：滞回、最短驻留时间和切回"""
+
+import unittest
+
+from dns_tester.failover import FailoverPolicy
+from dns_tester.monitor import RollingStats
+from dns_tester.probe import INFINITY
+from dns_tester.system_dns import FakeSystemBackend
+
+SERVERS = {
+    "a": {"name": "a", "primary": "192.0.2.1", "secondary": "192.0.2.2"},
+    "b": {"name": "b", "primary": "198.51.100.1", "secondary": ""},
+}
+ADAPTER = "eth0"
+
+
+def _stats(*latencies):
+    stats = RollingStats()
+    for latency in latencies:
+        stats.add(latency)
+    return stats
+
+
+class FailoverPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = FakeSystemBackend.with_dns({ADAPTER: ["192.0.2.1"]})
+        self.policy = FailoverPolicy(
+            self.backend, ADAPTER, hysteresis=0.2, min_gain=5, min_dwell=600
+        )
+
+    def evaluate(self, stats, now):
+        return self.policy.evaluate(SERVERS, stats, now=now)
+
+    def test_small_gain_does_not_switch(self):
+        # b 只快 10%，低于滞回比例
+        decision = self.evaluate({"a": _stats(50, 50, 50), "b": _stats(45, 45, 45)}, 0)
+        self.assertFalse(decision.switched)
+        self.assertEqual(decision.current, "a")
+        self.assertEqual(self.backend.calls, [])
+
+    def test_gain_below_min_gain_does_not_switch(self):
+        # 快 50% 但只有 2 毫秒
+        decision = self.evaluate({"a": _stats(4, 4, 4), "b": _stats(2, 2, 2)}, 0)
+        self.assertFalse(decision.switched)
+
+    def test_large_gain_switches(self):
+        decision = self.evaluate({"a": _stats(50, 50, 50), "b": _stats(20, 20, 20)}, 0)
+        self.assertTrue(decision.switched)
+        self.assertEqual((decision.current, decision.target), ("a", "b"))
+        self.assertEqual(self.backend.calls, [(ADAPTER, ["198.51.100.1"])])
+        self.assertEqual(self.backend.get_dns(ADAPTER), ["198.51.100.1"])
+        self.assertEqual(self.policy.last_switch, 0)
+
+    def test_dwell_time_blocks_switching_back(self):
+        self.evaluate({"a": _stats(50, 50, 50), "b": _stats(20, 20, 20)}, 0)
+        # a 变快后，驻留时间内不切回
+        stats = {"a": _stats(5, 5, 5), "b": _stats(20, 20, 20)}
+        decision = self.evaluate(stats, 300)
+        self.assertFalse(decision.switched)
+        self.assertEqual(decision.reason, "未达到最短驻留时间")
+        # 驻留时间过后切回 a，主备地址按顺序设置
+        decision = self.evaluate(stats, 600)
+        self.assertTrue(decision.switched)
+        self.assertEqual(decision.target, "a")
+        self.assertEqual(self.backend.get_dns(ADAPTER), ["192.0.2.1", "192.0.2.2"])
+
+    def test_no_flapping_between_close_servers(self):
+        self.evaluate({"a": _stats(50, 50, 50), "b": _stats(20, 20, 20)}, 0)
+        # 驻留时间过后 a 只比 b 略快，不来回切换
+        decision = self.evaluate(
+            {"a": _stats(18, 18, 18), "b": _stats(20, 20, 20)}, 10_000
+        )
+        self.assertFalse(decision.switched)
+        self.assertEqual(len(self.backend.calls), 1)
+
+    def test_unhealthy_current_switches_immediately(self):
+        self.evaluate({"a": _stats(50, 50, 50), "b": _stats(20, 20, 20)}, 0)
+        # b 不可达时不受驻留时间限制，立即切回 a
+        stats = {"a": _stats(50, 50, 50), "b": _stats(20, INFINITY, INFINITY)}
+        decision = self.evaluate(stats, 1)
+        self.assertTrue(decision.switched)
+        self.assertEqual(decision.target, "a")
+        self.assertEqual(decision.reason, "b 不可用")
+
+    def test_unknown_current_switches_to_best(self):
+        self.backend.set_dns(ADAPTER, ["203.0.113.1"])
+        self.backend.calls.clear()
+        decision = self.evaluate({"a": _stats(50, 50, 50), "b": _stats(20, 20, 20)}, 0)
+        self.assertTrue(decision.switched)
+        self.assertIsNone(decision.current)
+        self.assertEqual(decision.target, "b")
+
+    def test_backend_failure_is_not_a_switch(self):
+        self.backend.fail = True
+        decision = self.evaluate({"a": _stats(50, 50, 50), "b": _stats(20, 20, 20)}, 0)
+        self.assertFalse(decision.switched)
+        self.assertTrue(decision.reason.startswith("设置DNS失败"))
+        self.assertIsNone(self.policy.last_switch)
+        self.assertEqual(self.backend.get_dns(ADAPTER), ["192.0.2.1"])
+
+    def test_too_few_runs_are_not_candidates(self):
+        decision = self.evaluate({"a": _stats(50, 50, 50), "b": _stats(1, 1)}, 0)
+        self.assertFalse(decision.switched)
+        self.assertEqual(decision.target, "a")
+
+
+if __name__ == "__main__":
+    unittest.main()
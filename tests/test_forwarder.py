@@ -0,0 +1,323 @@
+"""本地转发器：应答缓存和缓存键、上游选择、TCP重试和UDP截断"""
+
+import asyncio
+import time
+import unittest
+
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rrset
+
+from dns_tester.forwarder import (
+    MODE_RACE,
+    MODE_ROUND_ROBIN,
+    AnswerCache,
+    Forwarder,
+    _question,
+)
+
+
+def _query(name="example.com", rdtype="A", **kwargs):
+    return dns.message.make_query(name, rdtype, **kwargs)
+
+
+def _answer(wire, ttl=60):
+    """上游应答：A 记录，DO=1 时附带 RRSIG，并像真实服务器一样回显 CD/DO 位"""
+    query = dns.message.from_wire(wire)
+    response = dns.message.make_response(query)
+    response.flags |= query.flags & dns.flags.CD
+    dnssec = bool(query.ednsflags & dns.flags.DO)
+    if dnssec:
+        response.use_edns(0, dns.flags.DO, query.payload)
+    name = query.question[0].name
+    response.answer.append(dns.rrset.from_text(name, ttl, "IN", "A", "192.0.2.1"))
+    if dnssec:
+        response.answer.append(
+            dns.rrset.from_text(
+                name,
+                ttl,
+                "IN",
+                "RRSIG",
+                "A 13 2 60 20300101000000 20200101000000 12345 example.com. dGVzdA==",
+            )
+        )
+    return response.to_wire()
+
+
+def _rcode(wire, rcode):
+    """上游的错误应答（如 SERVFAIL、REFUSED）"""
+    response = dns.message.make_response(dns.message.from_wire(wire))
+    response.set_rcode(rcode)
+    return response.to_wire()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ForwarderCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.forwarder = Forwarder(["192.0.2.53"])
+        self.forwarder.cache = AnswerCache(100, clock=FakeClock())
+        self.upstream_queries = []
+
+        async def forward(wire):
+            self.upstream_queries.append(wire)
+            return _answer(wire)
+
+        self.forwarder._forward = forward
+
+    def resolve(self, query):
+        wire = asyncio.run(self.forwarder.resolve(query.to_wire()))
+        return dns.message.from_wire(wire)
+
+    def test_repeat_query_is_answered_from_cache(self):
+        first = self.resolve(_query())
+        self.forwarder.cache.clock.now = 10
+        second = self.resolve(_query("EXAMPLE.com"))
+        self.assertEqual(len(self.upstream_queries), 1)
+        self.assertEqual(self.forwarder.stats.hits, 1)
+        self.assertEqual(str(second.question[0].name), "EXAMPLE.com.")
+        self.assertEqual(second.answer[0].ttl, 50)
+        self.assertNotEqual(first.id, second.id)
+
+    def test_dnssec_query_is_not_answered_from_plain_cache(self):
+        self.resolve(_query(use_edns=0))
+        response = self.resolve(_query(want_dnssec=True))
+        self.assertEqual(len(self.upstream_queries), 2)
+        self.assertIsNotNone(response.opt)
+        self.assertTrue(response.ednsflags & dns.flags.DO)
+        self.assertEqual(len(response.answer), 2)
+        # DO=1 的缓存应答也不会回给普通查询
+        plain = self.resolve(_query(use_edns=False))
+        self.assertIsNone(plain.opt)
+        self.assertEqual(len(plain.answer), 1)
+        self.assertEqual(len(self.upstream_queries), 3)
+        self.resolve(_query(want_dnssec=True))
+        self.assertEqual(len(self.upstream_queries), 3)
+
+    def test_checking_disabled_is_cached_separately(self):
+        self.resolve(_query())
+        query = _query()
+        query.flags |= dns.flags.CD
+        response = self.resolve(query)
+        self.assertTrue(response.flags & dns.flags.CD)
+        self.assertEqual(len(self.upstream_queries), 2)
+
+    def test_unknown_additional_records_bypass_cache(self):
+        query = _query()
+        query.additional.append(
+            dns.rrset.from_text("extra.example.com.", 0, "IN", "TXT", '"extra"')
+        )
+        self.assertIsNone(_question(query.to_wire())[0])
+        self.resolve(query)
+        self.resolve(query)
+        self.assertEqual(len(self.upstream_queries), 2)
+        self.assertEqual(len(self.forwarder.cache), 0)
+
+    def test_expired_entry_is_refetched(self):
+        self.resolve(_query())
+        self.forwarder.cache.clock.now = 60
+        self.resolve(_query())
+        self.assertEqual(len(self.upstream_queries), 2)
+
+
+UPSTREAMS = ["192.0.2.1", "192.0.2.2", "192.0.2.3"]
+
+
+class ForwarderUpstreamTest(unittest.TestCase):
+    """用替换的 _ask_upstream 驱动上游选择：script 为 {地址: (延迟秒, 应答函数)}"""
+
+    def setUp(self):
+        self.forwarder = Forwarder(UPSTREAMS, mode=MODE_RACE)
+        self.asked = []
+        self.script = {}
+
+        async def ask_upstream(address, query, timeout):
+            self.asked.append(address)
+            delay, reply = self.script[address]
+            await asyncio.sleep(delay)
+            return reply(query) if reply else None
+
+        self.forwarder._ask_upstream = ask_upstream
+
+    def forward(self):
+        wire = asyncio.run(self.forwarder._forward(_query().to_wire()))
+        return None if wire is None else dns.message.from_wire(wire)
+
+    def wins(self):
+        return {
+            address: stats.wins
+            for address, stats in self.forwarder.stats.upstreams.items()
+        }
+
+    def test_race_takes_fastest_usable_answer(self):
+        self.script = {
+            "192.0.2.1": (0.05, _answer),
+            "192.0.2.2": (0.0, None),
+            "192.0.2.3": (0.01, lambda q: _rcode(q, dns.rcode.SERVFAIL)),
+        }
+        response = self.forward()
+        self.assertEqual(response.rcode(), dns.rcode.NOERROR)
+        self.assertEqual(len(self.asked), 3)
+        self.assertEqual(self.wins(), {"192.0.2.1": 1})
+
+    def test_race_falls_back_to_unusable_answer(self):
+        def refused(query):
+            return _rcode(query, dns.rcode.REFUSED)
+
+        self.script = {address: (0.0, refused) for address in UPSTREAMS}
+        self.script["192.0.2.2"] = (0.0, None)
+        self.assertEqual(self.forward().rcode(), dns.rcode.REFUSED)
+        self.assertEqual(self.wins(), {})
+
+    def test_all_failed_returns_none(self):
+        self.script = {address: (0.0, None) for address in UPSTREAMS}
+        self.assertIsNone(self.forward())
+
+    def test_round_robin_rotates_first_upstream(self):
+        self.forwarder.mode = MODE_ROUND_ROBIN
+        self.script = {address: (0.0, _answer) for address in UPSTREAMS}
+        for _ in range(4):
+            self.forward()
+        self.assertEqual(self.asked, [*UPSTREAMS, UPSTREAMS[0]])
+        self.assertEqual(self.wins(), {"192.0.2.1": 2, "192.0.2.2": 1, "192.0.2.3": 1})
+
+    def test_round_robin_moves_past_failed_and_servfail(self):
+        self.forwarder.mode = MODE_ROUND_ROBIN
+        self.script = {
+            "192.0.2.1": (0.0, None),
+            "192.0.2.2": (0.0, lambda q: _rcode(q, dns.rcode.SERVFAIL)),
+            "192.0.2.3": (0.0, _answer),
+        }
+        self.assertEqual(self.forward().rcode(), dns.rcode.NOERROR)
+        self.assertEqual(self.asked, UPSTREAMS)
+        self.assertEqual(self.wins(), {"192.0.2.3": 1})
+
+    def test_round_robin_falls_back_to_servfail(self):
+        self.forwarder.mode = MODE_ROUND_ROBIN
+        self.script = {address: (0.0, None) for address in UPSTREAMS}
+        self.script["192.0.2.2"] = (0.0, lambda q: _rcode(q, dns.rcode.SERVFAIL))
+        self.assertEqual(self.forward().rcode(), dns.rcode.SERVFAIL)
+
+    def test_resolve_answers_servfail_when_all_fail(self):
+        self.script = {address: (0.0, None) for address in UPSTREAMS}
+        query = _query()
+        wire = asyncio.run(self.forwarder.resolve(query.to_wire()))
+        response = dns.message.from_wire(wire)
+        self.assertEqual(response.id, query.id)
+        self.assertEqual(response.rcode(), dns.rcode.SERVFAIL)
+        self.assertEqual(self.forwarder.stats.failures, 1)
+
+
+class ForwarderTransportTest(unittest.TestCase):
+    """用替换的 _ask_udp/_ask_tcp 检查TCP重试、超时和失败计数"""
+
+    def setUp(self):
+        self.forwarder = Forwarder(UPSTREAMS[:2], mode=MODE_ROUND_ROBIN, timeout=0.2)
+        self.tcp = []
+
+    def stats(self, address):
+        return self.forwarder.stats.upstream(address)
+
+    def test_truncated_udp_answer_is_retried_over_tcp(self):
+        async def ask_udp(address, query):
+            response = dns.message.from_wire(_answer(query))
+            response.flags |= dns.flags.TC
+            response.answer = []
+            return response.to_wire()
+
+        async def ask_tcp(address, query):
+            self.tcp.append(address)
+            return _answer(query)
+
+        self.forwarder._ask_udp = ask_udp
+        self.forwarder._ask_tcp = ask_tcp
+        wire = asyncio.run(self.forwarder._forward(_query().to_wire()))
+        response = dns.message.from_wire(wire)
+        self.assertFalse(response.flags & dns.flags.TC)
+        self.assertEqual(len(response.answer), 1)
+        self.assertEqual(self.tcp, ["192.0.2.1"])
+        stats = self.stats("192.0.2.1")
+        self.assertEqual((stats.queries, stats.answers, stats.wins), (1, 1, 1))
+
+    def test_round_robin_shares_one_deadline(self):
+        async def ask_udp(address, query):
+            # 上游不应答，等待 _ask_udp 自己的超时
+            await asyncio.sleep(self.forwarder.timeout)
+            raise TimeoutError
+
+        self.forwarder._ask_udp = ask_udp
+        started = time.monotonic()
+        self.assertIsNone(asyncio.run(self.forwarder._forward(_query().to_wire())))
+        # 两个上游都不应答时，总共只等待一次 timeout
+        self.assertLess(time.monotonic() - started, self.forwarder.timeout * 1.5)
+        for address in UPSTREAMS[:2]:
+            stats = self.stats(address)
+            self.assertEqual((stats.queries, stats.failures), (1, 1))
+
+    def test_invalid_answer_counts_as_failure(self):
+        async def ask_udp(address, query):
+            if address == "192.0.2.1":
+                raise ValueError("无效的DNS响应")
+            return _answer(query)
+
+        self.forwarder._ask_udp = ask_udp
+        self.assertIsNotNone(asyncio.run(self.forwarder._forward(_query().to_wire())))
+        self.assertEqual(self.stats("192.0.2.1").failures, 1)
+        self.assertEqual(self.stats("192.0.2.2").wins, 1)
+
+
+class UdpTruncationTest(unittest.TestCase):
+    """应答超过客户端可接收的UDP长度时只返回头部和问题段，并设置TC位"""
+
+    def setUp(self):
+        self.forwarder = Forwarder(UPSTREAMS[:1])
+
+        async def forward(wire):
+            query = dns.message.from_wire(wire)
+            response = dns.message.make_response(query)
+            name = query.question[0].name
+            response.answer.append(
+                dns.rrset.from_text_list(
+                    name, 60, "IN", "A", [f"192.0.2.{i}" for i in range(1, 61)]
+                )
+            )
+            return response.to_wire()
+
+        self.forwarder._forward = forward
+
+    def resolve(self, query, udp):
+        wire = asyncio.run(self.forwarder.resolve(query.to_wire(), udp=udp))
+        return wire, dns.message.from_wire(wire)
+
+    def test_large_answer_is_truncated_for_plain_udp(self):
+        query = _query(use_edns=False)
+        wire, response = self.resolve(query, udp=True)
+        self.assertLessEqual(len(wire), 512)
+        self.assertTrue(response.flags & dns.flags.TC)
+        self.assertEqual(response.answer, [])
+        self.assertEqual(response.id, query.id)
+        self.assertEqual(response.question, query.question)
+
+    def test_edns_payload_raises_the_limit(self):
+        _, response = self.resolve(_query(use_edns=0, payload=4096), udp=True)
+        self.assertFalse(response.flags & dns.flags.TC)
+        self.assertEqual(len(response.answer[0]), 60)
+
+    def test_tcp_is_not_truncated(self):
+        # 截断的应答不缓存，TCP重试时仍从缓存得到完整应答
+        self.resolve(_query(use_edns=False), udp=True)
+        wire, response = self.resolve(_query(use_edns=False), udp=False)
+        self.assertGreater(len(wire), 512)
+        self.assertEqual(len(response.answer[0]), 60)
+        self.assertEqual(self.forwarder.stats.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""持续监控：出错后继续探测"""
+
+import unittest
+from unittest import mock
+
+from dns_tester import monitor
+from dns_tester.config import ProbeSettings
+from dns_tester.probe import STATUS_SUCCESS, make_result
+
+SERVERS = [{"name": "a", "primary": "192.0.2.1", "secondary": ""}]
+
+
+def _results(servers, settings, corpus=None):
+    return {server["name"]: make_result(5.0, STATUS_SUCCESS) for server in servers}
+
+
+class MonitorErrorTest(unittest.TestCase):
+    def test_callback_error_does_not_stop_monitor(self):
+        calls = []
+
+        def current_dns():
+            calls.append(1)
+            if len(calls) == 2:
+                mon.stop()
+            raise RuntimeError("回调出错")
+
+        mon = monitor.Monitor(
+            SERVERS, ProbeSettings(), current_dns=current_dns, interval=0.04
+        )
+        with mock.patch.object(monitor, "run_benchmark", _results):
+            mon.run()
+        self.assertEqual(len(calls), 2)
+
+    def test_failed_round_is_rescheduled(self):
+        mon = monitor.Monitor(SERVERS, ProbeSettings(), interval=60)
+        mon.update_servers([], now=0)
+        mon.update_servers(SERVERS, now=0)
+        with (
+            mock.patch.object(
+                monitor, "run_benchmark", side_effect=OSError("网络不可用")
+            ),
+            self.assertRaises(OSError),
+        ):
+            mon.run_once(now=0)
+        self.assertIn("a", mon.scheduler)
+        self.assertEqual(mon.scheduler.next_due(), 15)
+        with mock.patch.object(monitor, "run_benchmark", _results):
+            self.assertEqual(mon.run_once(now=15), _results(SERVERS, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
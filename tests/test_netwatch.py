@@ -0,0 +1,92 @@
+"""网络变化通知：监视器回调和快照失效"""
+
+import os
+import platform
+import queue
+import tempfile
+import unittest
+
+from dns_tester.adapters import AdapterSnapshot, current_dns
+from dns_tester.config import replace_file
+from dns_tester.netwatch import (
+    REASON_ADAPTER,
+    REASON_LINK,
+    REASON_RESOLV_CONF,
+    FakeChangeWatcher,
+    LinuxChangeWatcher,
+)
+from dns_tester.system_dns import FakeSystemBackend
+
+
+class FakeChangeWatcherTest(unittest.TestCase):
+    def test_fire_calls_back_until_stopped(self):
+        reasons = []
+        watcher = FakeChangeWatcher()
+        watcher.start(reasons.append)
+        watcher.fire()
+        watcher.fire(REASON_LINK)
+        watcher.stop()
+        watcher.fire()
+        self.assertEqual(reasons, [REASON_ADAPTER, REASON_LINK])
+
+    def test_change_invalidates_snapshot(self):
+        backend = FakeSystemBackend.with_dns({"eth0": ["192.0.2.53"]})
+        snapshot = AdapterSnapshot(backend, ttl=3600)
+        watcher = FakeChangeWatcher()
+        watcher.start(lambda reason: snapshot.invalidate())
+        self.assertEqual(current_dns(snapshot.get()), ["192.0.2.53"])
+        # 外部程序修改了DNS：缓存期内仍是旧值，收到通知后重新查询
+        backend.set_dns("eth0", ["198.51.100.53"])
+        self.assertEqual(current_dns(snapshot.get()), ["192.0.2.53"])
+        watcher.fire()
+        self.assertEqual(current_dns(snapshot.get()), ["198.51.100.53"])
+        self.assertEqual(backend.queries, 2)
+
+
+@unittest.skipUnless(platform.system() == "Linux", "需要inotify")
+class LinuxChangeWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "resolv.conf")
+        replace_file(self.path, "nameserver 192.0.2.53\n")
+        self.reasons = queue.Queue()
+        self.watcher = LinuxChangeWatcher(self.path)
+        self.watcher.start(self.reasons.put)
+
+    def tearDown(self):
+        self.watcher.stop()
+        self.watcher._thread.join(5)
+        self.tmp.cleanup()
+
+    def _wait_for(self, reason):
+        # netlink 可能同时报告本机的其他网络变化
+        while True:
+            try:
+                if self.reasons.get(timeout=5) == reason:
+                    return True
+            except queue.Empty:
+                return False
+
+    def test_replaced_resolv_conf_is_reported(self):
+        # 等待监视线程建立 inotify 监视后再修改
+        for _ in range(50):
+            replace_file(self.path, "nameserver 198.51.100.53\n")
+            try:
+                if self.reasons.get(timeout=0.1) == REASON_RESOLV_CONF:
+                    break
+            except queue.Empty:
+                continue
+        else:
+            self.fail("没有收到 resolv.conf 的变化通知")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("nameserver 203.0.113.53\n")
+        self.assertTrue(self._wait_for(REASON_RESOLV_CONF))
+
+    def test_stop_ends_thread(self):
+        self.watcher.stop()
+        self.watcher._thread.join(5)
+        self.assertFalse(self.watcher._thread.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,19 @@
+"""包的公开名称"""
+
+import unittest
+
+import dns_tester
+
+
+class ExportsTest(unittest.TestCase):
+    def test_all_matches_exports(self):
+        self.assertCountEqual(dns_tester.__all__, dns_tester._EXPORTS)
+
+    def test_exports_resolve(self):
+        for name in dns_tester.__all__:
+            with self.subTest(name=name):
+                self.assertIsNotNone(getattr(dns_tester, name))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""探测引擎：丢包统计"""
+
+import asyncio
+import unittest
+
+from dns_tester.probe import ProbeEngine
+
+REFUSED = 5
+
+
+class ScriptedProber:
+    """按顺序返回预设结果的探测器：数字为延迟，异常类型或响应码元组为失败"""
+
+    def __init__(self, script):
+        self.script = list(script)
+
+    async def query(self, address, domain, timeout, rdtype="A", nonce=False):
+        outcome = self.script.pop(0)
+        if isinstance(outcome, type):
+            raise outcome()
+        if isinstance(outcome, tuple):
+            return outcome
+        return outcome, 0
+
+
+def _sample(script, queries=None):
+    engine = ProbeEngine(samples=len(script))
+    queries = queries or [("example.com", "A", 1.0)] * len(script)
+
+    async def run():
+        return await engine.sample(
+            ScriptedProber(script), "192.0.2.1", queries, asyncio.Semaphore(4)
+        )
+
+    return asyncio.run(run())
+
+
+class SampleTest(unittest.TestCase):
+    def test_first_timeout_counts_as_one_loss(self):
+        samples = _sample([TimeoutError, 10, 11, 12, 13, 14, 15, 16, 17, 18])
+        self.assertEqual(samples.received, 9)
+        self.assertAlmostEqual(samples.loss, 10.0)
+        self.assertEqual(samples.median, 14)
+
+    def test_first_rcode_failure_keeps_sampling(self):
+        # 域名集回放时第一个域名被拒绝，其余域名仍然计入
+        queries = [("refused.test", "A", 1.0), ("example.com", "A", 3.0)]
+        samples = _sample([(1.0, REFUSED), 20], queries)
+        self.assertEqual(samples.received, 1)
+        self.assertAlmostEqual(samples.loss, 25.0)
+
+    def test_all_lost(self):
+        samples = _sample([TimeoutError, TimeoutError, TimeoutError])
+        self.assertEqual(samples.received, 0)
+        self.assertAlmostEqual(samples.loss, 100.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""系统DNS后端：resolv.conf 改写和恢复时保留文件权限，失败时抛出 OSError"""
+
+import os
+import stat
+import tempfile
+import unittest
+
+from dns_tester.system_dns import (
+    ResolvConfBackend,
+    UnsupportedBackend,
+    read_resolv_conf,
+)
+
+ORIGINAL = "search example.com\nnameserver 192.0.2.53\noptions edns0\n"
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+class ResolvConfBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "resolv.conf")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(ORIGINAL)
+        os.chmod(self.path, 0o664)
+        self.backend = ResolvConfBackend(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_set_dns_keeps_mode(self):
+        self.assertTrue(self.backend.set_dns("eth0", ["1.1.1.1", "1.0.0.1"]))
+        self.assertEqual(read_resolv_conf(self.path), ["1.1.1.1", "1.0.0.1"])
+        self.assertEqual(_mode(self.path), 0o664)
+        self.assertEqual(_mode(self.backend.backup_path), 0o664)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(
+                f.read(),
+                "search example.com\nnameserver 1.1.1.1\nnameserver 1.0.0.1\n"
+                "options edns0\n",
+            )
+
+    def test_reset_dns_restores_original(self):
+        self.backend.set_dns("eth0", ["1.1.1.1"])
+        self.backend.set_dns("eth0", ["8.8.8.8"])
+        self.assertTrue(self.backend.reset_dns("eth0"))
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), ORIGINAL)
+        self.assertEqual(_mode(self.path), 0o664)
+        self.assertFalse(os.path.exists(self.backend.backup_path))
+
+    def test_reset_without_backup_fails(self):
+        with self.assertRaises(OSError):
+            self.backend.reset_dns("eth0")
+
+
+class UnsupportedBackendTest(unittest.TestCase):
+    def test_modifications_raise(self):
+        backend = UnsupportedBackend()
+        self.assertEqual(backend.list_adapters(), [])
+        with self.assertRaises(OSError):
+            backend.set_dns("eth0", ["1.1.1.1"])
+        with self.assertRaises(OSError):
+            backend.reset_dns("eth0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+"""虚拟列表：用假的Treeview驱动行渲染、滚动和选中状态"""
+
+import unittest
+
+try:
+    import main
+except ImportError:  # 没有tkinter/ttkbootstrap的环境
+    main = None
+from dns_tester.servers import Server
+
+
+class FakeTree:
+    """只记录条目内容和选中状态的Treeview替身"""
+
+    def __init__(self):
+        self.values = {}
+        self.order = []
+        self._selection = ()
+        self._focus = ""
+
+    def configure(self, **options):
+        pass
+
+    def bind(self, sequence, func, add=None):
+        pass
+
+    def insert(self, parent, index):
+        item = f"I{len(self.values)}"
+        self.values[item] = None
+        return item
+
+    def item(self, item, values, tags):
+        self.values[item] = (values, tags)
+
+    def move(self, item, parent, index):
+        if item in self.order:
+            self.order.remove(item)
+        self.order.insert(index, item)
+
+    def detach(self, item):
+        if item in self.order:
+            self.order.remove(item)
+
+    def selection_set(self, items):
+        self._selection = tuple([items] if isinstance(items, str) else items)
+
+    def selection(self):
+        return self._selection
+
+    def focus(self, item=None):
+        if item is None:
+            return self._focus
+        self._focus = item
+        return None
+
+    def yview_moveto(self, fraction):
+        pass
+
+    def shown(self):
+        """按显示顺序返回各行的名称"""
+        return [self.values[item][0][0] for item in self.order]
+
+
+class FakeScrollbar:
+    def configure(self, **options):
+        pass
+
+    def set(self, first, last):
+        self.range = (first, last)
+
+
+@unittest.skipIf(main is None, "需要tkinter和ttkbootstrap")
+class VirtualTreeviewTest(unittest.TestCase):
+    def setUp(self):
+        # 使用主窗口真正的行渲染函数，参数顺序不一致时这里会失败
+        self.app = main.DNSTesterApp.__new__(main.DNSTesterApp)
+        self.app.test_results = {}
+        self.tree = FakeTree()
+        self.view = main.VirtualTreeview(
+            self.tree,
+            FakeScrollbar(),
+            self.app._tree_row,
+            key=lambda server: server.name,
+            buffer=2,
+        )
+        self.view.visible = 3
+        self.servers = [Server(f"dns{i}", f"192.0.2.{i}") for i in range(20)]
+        self.view.set_rows(self.servers)
+
+    def test_renders_only_visible_rows(self):
+        self.assertEqual(len(self.tree.values), 5)
+        self.assertEqual(self.tree.shown(), ["dns0", "dns1", "dns2", "dns3", "dns4"])
+        values, tags = self.tree.values[self.tree.order[1]]
+        self.assertEqual(values[1], "192.0.2.1")
+        self.assertEqual(tags, ("oddrow",))
+
+    def test_scroll_reuses_items(self):
+        self.view.scroll(10)
+        self.assertEqual(len(self.tree.values), 5)
+        self.assertEqual(self.tree.shown()[0], "dns10")
+        self.view.scroll(100)
+        self.assertEqual(self.tree.shown(), ["dns17", "dns18", "dns19"])
+
+    def test_selection_survives_scrolling(self):
+        self.tree.selection_set(self.tree.order[1])
+        self.view.scroll(10)
+        self.assertEqual(self.tree.selection(), ())
+        self.view.scroll(-10)
+        self.assertEqual([s.name for s in self.view.selected_rows()], ["dns1"])
+        self.assertEqual(self.tree.selection(), (self.tree.order[1],))
+
+    def test_refresh_rerenders_changed_rows(self):
+        self.app.test_results["dns0"] = {
+            "status": "失败",
+            "primary_latency": "未测试",
+        }
+        self.view.refresh({"dns0"})
+        self.assertEqual(self.tree.values[self.tree.order[0]][1], ("error_even",))
+
+
+if __name__ == "__main__":
+    unittest.main()